@@ -0,0 +1,56 @@
+"""
+Memory and build time of the AST for a 100k-statement script.
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import many_statements
+from core.ast_nodes import IfStatement, WhileLoop, BinaryOperation, VarDeclaration, Update, PrintCommand
+from core.lexer import tokenize
+from core.parser import Parser
+
+# many_statements emits 7 statements per block, counting nested ones
+STATEMENTS_PER_BLOCK = 7
+
+
+def count_nodes(node):
+    count = 1
+    if isinstance(node, list):
+        return sum(count_nodes(child) for child in node)
+    if isinstance(node, (VarDeclaration, Update)):
+        count += count_nodes(node.value)
+    elif isinstance(node, PrintCommand):
+        count += count_nodes(node.expression)
+    elif isinstance(node, IfStatement):
+        count += count_nodes(node.condition) + count_nodes(node.then_block) + count_nodes(node.else_block or [])
+    elif isinstance(node, WhileLoop):
+        count += count_nodes(node.condition) + count_nodes(node.body)
+    elif isinstance(node, BinaryOperation):
+        count += count_nodes(node.left) + count_nodes(node.right)
+    return count
+
+
+def main(statements=100000):
+    source = many_statements(statements // STATEMENTS_PER_BLOCK)
+    tokens = tokenize(source)
+    gc.collect()
+    tracemalloc.start()
+    ast = Parser(tokens).parse()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    nodes = count_nodes(ast.statements)
+    started = time.perf_counter()
+    Parser(tokens).parse()
+    elapsed = time.perf_counter() - started
+    print(f"statements      : {statements}")
+    print(f"AST nodes       : {nodes}")
+    print(f"AST memory      : {size / 2**20:.1f} MB ({size / nodes:.0f} bytes/node, lists included)")
+    print(f"parse time      : {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
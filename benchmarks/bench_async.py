@@ -0,0 +1,44 @@
+"""
+Pause-heavy scripts: blocking runs one after another (estimated, they
+would take a second per pause), run_async multiplexing them on one event
+loop, and the virtual clock with which pauses take no time at all.
+"""
+import asyncio
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import pausing_loop
+from core.compiler import compile_source
+from core.vm import VirtualMachine, VirtualClock
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+async def run_all(program, scripts, clock=None):
+    return await asyncio.gather(*(VirtualMachine(clock=clock).run_async(program) for _ in range(scripts)))
+
+
+def main(scripts=1000, pauses=3):
+    program = compile_source(pausing_loop(pauses), opt_level=2).bytecode
+    expected = VirtualMachine(clock=VirtualClock()).run(program)
+    print(f"{scripts} scripts x {pauses} pauses")
+    print(f"{'blocking, sequential':<28}{scripts * pauses:10.2f}s (estimated)")
+    for label, clock in (("run_async", None), ("run_async, virtual clock", VirtualClock())):
+        outputs, elapsed = timed(lambda: asyncio.run(run_all(program, scripts, clock)))
+        assert set(outputs) == {expected}, f"{label} changes the output"
+        print(f"{label:<28}{elapsed:10.2f}s{scripts / elapsed:10.0f} scripts/s")
+    clock = VirtualClock()
+    vm = VirtualMachine(clock=clock)
+    _, elapsed = timed(lambda: [vm.run(program) for _ in range(scripts)])
+    print(f"{'blocking, virtual clock':<28}{elapsed:10.2f}s{scripts / elapsed:10.0f} scripts/s"
+          f"  ({clock.now:.0f}s simulated)")
+
+
+if __name__ == "__main__":
+    main()
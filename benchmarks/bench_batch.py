@@ -0,0 +1,39 @@
+"""
+One scalar VM run per input row vs. a single vectorized batch run over
+all rows (see core.batch), for growing numbers of rows.
+"""
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import scoring_program
+from core.batch import BatchVM
+from core.compiler import compile_source
+from core.vm import VirtualMachine
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main(sizes=(100, 1000, 10000, 100000)):
+    program = compile_source(scoring_program(), opt_level=2).bytecode
+    rng = random.Random(0)
+    print(f"{'rows':>8}{'scalar':>12}{'batch':>12}{'speedup':>10}{'fallback':>10}")
+    for size in sizes:
+        rows = [[str(rng.randrange(40)), rng.choice(["1", "3", "2.5", "7"])] for _ in range(size)]
+        vm = VirtualMachine()
+        scalar, scalar_time = timed(lambda: [vm.run(program, row) for row in rows])
+        batch = BatchVM()
+        results, batch_time = timed(lambda: batch.run(program, rows))
+        assert [result.output for result in results] == scalar, "batch run disagrees with the scalar VM"
+        print(f"{size:>8}{scalar_time * 1000:10.1f}ms{batch_time * 1000:10.1f}ms{scalar_time / batch_time:9.1f}x"
+              f"{batch.stats['fallback']:>10}")
+
+
+if __name__ == "__main__":
+    main()
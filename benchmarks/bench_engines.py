@@ -0,0 +1,41 @@
+"""
+Switch-dispatch interpreter vs. closure-threaded engine on loop-heavy
+programs, with the native Python backend (core.py_backend) for reference.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import counting_loop, string_loop, nested_loops, compile_ast, compile_stack_code
+from core.bytecode import assemble
+from core.py_backend import compile_to_python
+from core.vm import VirtualMachine, ENGINES
+
+WORKLOADS = {
+    "counting_loop(50000)": counting_loop(50000),
+    "string_loop(20000)": string_loop(20000),
+    "nested_loops(200, 200)": nested_loops(200, 200),
+}
+
+
+def main(repeat=5):
+    print(f"{'workload':<26}" + "".join(f"{engine:>12}" for engine in ENGINES) + f"{'speedup':>10}{'python':>12}")
+    for label, source in WORKLOADS.items():
+        program = assemble(compile_stack_code(source))
+        outputs = set()
+        timings = []
+        for engine in ENGINES:
+            vm = VirtualMachine(tiering=False)
+            outputs.add(vm.run(program, engine=engine))
+            timings.append(min(timeit.repeat(lambda: vm.run(program, engine=engine), number=1, repeat=repeat)))
+        native = compile_to_python(compile_ast(source))
+        outputs.add(native.run())
+        assert len(outputs) == 1, f"engines disagree on {label}"
+        python = min(timeit.repeat(native.run, number=1, repeat=repeat))
+        print(f"{label:<26}" + "".join(f"{t * 1000:10.1f}ms" for t in timings) + f"{timings[0] / timings[-1]:9.2f}x"
+              + f"{python * 1000:10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
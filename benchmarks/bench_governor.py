@@ -0,0 +1,43 @@
+"""
+Cost of running under a resource governor: every workload without limits
+and with generous limits on everything (none of which are reached).
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import counting_loop, string_loop, nested_loops, many_statements
+from core.compiler import compile_source
+from core.governor import Limits
+from core.vm import VirtualMachine, ENGINES
+
+WORKLOADS = {
+    "counting_loop(50000)": counting_loop(50000),
+    "string_loop(20000)": string_loop(20000),
+    "nested_loops(200, 200)": nested_loops(200, 200),
+    "many_statements(200)": many_statements(200),
+}
+
+LIMITS = Limits(max_instructions=10 ** 12, max_stack=10 ** 6, max_string=10 ** 9, max_output_lines=10 ** 9,
+                max_output_bytes=10 ** 12, wall_time=3600)
+
+
+def main(repeat=5):
+    print(f"{'workload':<24}" + "".join(f"{engine:>26}" for engine in ENGINES))
+    for label, source in WORKLOADS.items():
+        program = compile_source(source, opt_level=2).bytecode
+        timings = []
+        for engine in ENGINES:
+            times = []
+            for limits in (None, LIMITS):
+                vm = VirtualMachine()
+                assert vm.run(program, engine=engine, limits=limits) == vm.run(program, engine=engine)
+                times.append(min(timeit.repeat(lambda: vm.run(program, engine=engine, limits=limits),
+                                               number=1, repeat=repeat)))
+            timings.append(f"{times[0] * 1000:8.2f} ->{times[1] * 1000:8.2f}ms ({times[1] / times[0]:4.2f}x)")
+        print(f"{label:<24}" + "".join(f"{timing:>26}" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Edit-to-feedback latency of the front end on a large script: a full
+tokenize/parse/analyze against IncrementalFrontEnd after a one-line edit.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import many_statements
+from core.incremental import IncrementalFrontEnd
+from core.lexer import tokenize
+from core.parser import Parser
+from core.semantic_analyzer import SemanticAnalyzer
+
+
+def full_front_end(source):
+    ast = Parser(tokenize(source)).parse()
+    SemanticAnalyzer().analyze(ast)
+    return ast
+
+
+def incremental_front_end(front_end, source):
+    front_end.tokenize(source)
+    ast = front_end.parse()
+    front_end.analyze()
+    return ast
+
+
+def main(repeat=5):
+    print(f"{'blocks':>8}{'lines':>8}{'full':>12}{'incremental':>14}{'speedup':>10}")
+    for blocks in (100, 1000, 5000):
+        source = many_statements(blocks)
+        # Edit one line in the middle of the script, alternating between two versions
+        lines = source.split("\n")
+        middle = len(lines) // 2
+        edited = "\n".join(lines[:middle] + ["speak \"edited\""] + lines[middle:])
+        versions = [source, edited]
+
+        front_end = IncrementalFrontEnd()
+        incremental_front_end(front_end, source)
+        turn = 0
+
+        def edit():
+            nonlocal turn
+            turn ^= 1
+            incremental_front_end(front_end, versions[turn])
+
+        full = min(timeit.repeat(lambda: full_front_end(edited), number=1, repeat=repeat))
+        incremental = min(timeit.repeat(edit, number=1, repeat=repeat))
+        assert front_end.stats["relexed"] <= 2, front_end.stats
+        print(f"{blocks:>8}{len(lines):>8}{full * 1000:10.1f}ms{incremental * 1000:12.2f}ms"
+              f"{full / incremental:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Lexer and parser throughput in tokens per second on large generated scripts.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import many_statements
+from core.lexer import tokenize
+from core.parser import Parser
+
+
+def main(repeat=5):
+    print(f"{'blocks':>8}{'tokens':>10}{'lex':>12}{'lex tok/s':>14}{'parse':>12}{'parse tok/s':>14}")
+    for blocks in (1000, 10000, 50000):
+        source = many_statements(blocks)
+        tokens = tokenize(source)
+        lex = min(timeit.repeat(lambda: tokenize(source), number=1, repeat=repeat))
+        parse = min(timeit.repeat(lambda: Parser(tokens).parse(), number=1, repeat=repeat))
+        print(f"{blocks:>8}{len(tokens):>10}{lex * 1000:10.1f}ms{len(tokens) / lex:14,.0f}"
+              f"{parse * 1000:10.1f}ms{len(tokens) / parse:14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Program size, peephole statistics and run time of each optimization level.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import counting_loop, string_loop, nested_loops
+from core.compiler import compile_source, OPT_LEVELS
+from core.vm import VirtualMachine
+
+WORKLOADS = {
+    "counting_loop(20000)": counting_loop(20000),
+    "string_loop(10000)": string_loop(10000),
+    "nested_loops(100, 100)": nested_loops(100, 100),
+}
+
+
+def main(repeat=5):
+    for label, source in WORKLOADS.items():
+        print(label)
+        outputs = set()
+        for level in OPT_LEVELS:
+            compiled = compile_source(source, opt_level=level)
+            vm = VirtualMachine(tiering=False)
+            outputs.add(vm.run(compiled.bytecode))
+            elapsed = min(timeit.repeat(lambda: vm.run(compiled.bytecode), number=1, repeat=repeat))
+            stats = ", ".join(f"{rule}={count}" for rule, count in compiled.peephole_stats.items() if count)
+            print(f"  O{level}: {len(compiled.stack_code):4d} stack instrs, {len(compiled.bytecode):4d} bytecode,"
+                  f" {elapsed * 1000:8.1f}ms  {stats}")
+        assert len(outputs) == 1, f"optimization levels disagree on {label}"
+
+
+if __name__ == "__main__":
+    main()
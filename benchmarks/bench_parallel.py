@@ -0,0 +1,42 @@
+"""
+Compile time of a large generated script with compile_parallel across
+increasing worker counts, against the sequential compile_source.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import many_statements
+from core.compiler import compile_source
+from core.parallel import compile_parallel
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(blocks=20000):
+    source = many_statements(blocks)
+    sequential = best_of(lambda: compile_source(source))
+    expected = compile_source(source).stack_code
+    print(f"{len(source) / 2**20:.1f}MB script, {os.cpu_count()} CPUs")
+    print(f"{'sequential':>10}{sequential * 1000:10.0f}ms")
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        # The pool is started (and its workers warmed up) outside the timed region
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            assert compile_parallel(source, executor=pool, workers=workers).stack_code == expected
+            elapsed = best_of(lambda: compile_parallel(source, executor=pool, workers=workers))
+        print(f"{workers:>10}{elapsed * 1000:10.0f}ms{sequential / elapsed:8.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
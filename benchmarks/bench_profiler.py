@@ -0,0 +1,40 @@
+"""
+Cost of the source-line profiler.
+
+Runs a nested loop untiered on the threaded engine, then under
+VirtualMachine.profile, and prints the profile's per-line listing. run()
+itself has no profiling code in it, so the first number is the same with
+the profiler present or not.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import nested_loops
+from core.compiler import compile_source
+from core.vm import VirtualMachine
+
+
+def best_of(func, repeat=5):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(outer=100, inner=100):
+    source = nested_loops(outer, inner)
+    program = compile_source(source, opt_level=1).bytecode
+
+    plain = best_of(lambda: VirtualMachine(tiering=False).run(program, engine="threaded"))
+    vm = VirtualMachine()
+    profiled = best_of(lambda: vm.profile(program))
+    profile = vm.last_profile
+
+    print(profile.annotate(source))
+    print()
+    print(f"instructions executed : {profile.instructions}")
+    print(f"threaded, untiered    : {plain * 1000:8.2f} ms  ({plain / profile.instructions * 1e9:6.1f} ns/instr)")
+    print(f"profiled              : {profiled * 1000:8.2f} ms  ({profiled / plain:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,48 @@
+"""
+Peak memory and time of a script printing many lines with each output
+sink: the joined string run() returns, a callback, a buffered file writer,
+a ring buffer of the last lines and the stream() generator.
+"""
+import os
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import string_loop
+from core.compiler import compile_source
+from core.sinks import CallbackSink, RingBufferSink, WriterSink
+from core.vm import VirtualMachine
+
+
+def measure(func):
+    # Timed without tracemalloc, which slows allocation-heavy code down several times
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(lines=(10000, 100000, 1000000)):
+    print(f"{'lines':>9}{'sink':>12}{'time':>12}{'peak memory':>14}")
+    for count in lines:
+        program = compile_source(string_loop(count), opt_level=2).bytecode
+        with open(os.devnull, "w") as devnull:
+            sinks = {
+                "joined": lambda: VirtualMachine().run(program),
+                "callback": lambda: VirtualMachine().run(program, sink=CallbackSink(len)),
+                "writer": lambda: VirtualMachine().run(program, sink=WriterSink(devnull)),
+                "ring(100)": lambda: VirtualMachine().run(program, sink=RingBufferSink(100)),
+                "stream": lambda: sum(1 for _ in VirtualMachine().stream(program)),
+            }
+            for label, run in sinks.items():
+                elapsed, peak = measure(run)
+                print(f"{count:>9}{label:>12}{elapsed * 1000:10.1f}ms{peak / 2**20:12.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Peak memory and time of compiling ever larger scripts to stack code with
+compile_source (whole file in memory) and compile_stream (bounded memory).
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import many_statements
+from core.compiler import compile_source, compile_stream
+
+
+def measure(func):
+    # Timed without tracemalloc, which slows allocation-heavy code down several times
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    print(f"{'blocks':>8}{'source':>10}{'whole file':>24}{'streaming':>24}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "script.ns")
+        for blocks in (500, 2000, 8000):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(many_statements(blocks))
+            size = os.path.getsize(path)
+
+            def whole():
+                with open(path, encoding="utf-8") as f:
+                    compile_source(f.read())
+
+            def streaming():
+                with open(path, encoding="utf-8") as f, open(os.devnull, "w") as out:
+                    for instr in compile_stream(f):
+                        out.write(instr + "\n")
+
+            results = [measure(whole), measure(streaming)]
+            print(f"{blocks:>8}{size / 2**20:8.1f}MB"
+                  + "".join(f"{t * 1000:10.0f}ms{peak / 2**20:10.1f}MB" for t, peak in results))
+
+
+if __name__ == "__main__":
+    main()
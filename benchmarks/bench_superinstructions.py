@@ -0,0 +1,57 @@
+"""
+VM dispatches and run time at -O2 with and without superinstructions,
+plus the straight-line opcode pairs executed most often before fusion
+(the data the fused set in core.superinstructions was chosen from).
+"""
+import os
+import sys
+import timeit
+from collections import Counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import counting_loop, string_loop, nested_loops, many_statements
+from core.bytecode import assemble
+from core.compiler import compile_source
+from core.superinstructions import expand, executed_pcs, sequence_counts
+from core.vm import VirtualMachine, ENGINES
+
+CORPUS = {
+    "counting_loop(2000)": counting_loop(2000),
+    "string_loop(1000)": string_loop(1000),
+    "nested_loops(40, 40)": nested_loops(40, 40),
+    "many_statements(50)": many_statements(50),
+}
+
+
+def main(repeat=5, top=8):
+    print(f"{'program':<24}{'dispatches':>12}{'fused':>10}{'saved':>8}"
+          + "".join(f"{engine:>18}" for engine in ENGINES))
+    pairs = Counter()
+    for label, source in CORPUS.items():
+        fused = compile_source(source, opt_level=2).bytecode
+        plain = assemble(expand(compile_source(source, opt_level=2).stack_code))
+        before = executed_pcs(plain)
+        after = executed_pcs(fused)
+        pairs += sequence_counts(plain, before)
+
+        timings = []
+        for engine in ENGINES:
+            outputs = set()
+            times = []
+            for program in (plain, fused):
+                vm = VirtualMachine(tiering=False)
+                outputs.add(vm.run(program, engine=engine))
+                times.append(min(timeit.repeat(lambda: vm.run(program, engine=engine), number=1, repeat=repeat)))
+            assert len(outputs) == 1, f"superinstructions change the output of {label}"
+            timings.append(f"{times[0] * 1000:6.1f} ->{times[1] * 1000:6.1f}ms")
+        print(f"{label:<24}{len(before):>12}{len(after):>10}{1 - len(after) / len(before):>8.0%}"
+              + "".join(f"{timing:>18}" for timing in timings))
+
+    print("\nMost frequent straight-line opcode pairs before fusion:")
+    total = sum(pairs.values())
+    for sequence, count in pairs.most_common(top):
+        print(f"  {' / '.join(sequence):<24}{count:>8}{count / total:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
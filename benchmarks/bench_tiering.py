@@ -0,0 +1,46 @@
+"""
+Interpreter alone vs. tiered execution (hot loops compiled to Python
+functions, see core.tiering) on loops of very different trip counts: short
+loops must not get slower, long ones should approach the native backend.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import counting_loop, string_loop, nested_loops, many_statements
+from core.compiler import compile_source
+from core.vm import VirtualMachine, ENGINES
+
+WORKLOADS = {
+    "counting_loop(50)": counting_loop(50),
+    "counting_loop(1000)": counting_loop(1000),
+    "counting_loop(50000)": counting_loop(50000),
+    "string_loop(20000)": string_loop(20000),
+    "nested_loops(200, 200)": nested_loops(200, 200),
+    "many_statements(200)": many_statements(200),
+}
+
+
+def main(repeat=5):
+    print(f"{'workload':<24}" + "".join(f"{engine:>24}" for engine in ENGINES) + "  loops compiled")
+    for label, source in WORKLOADS.items():
+        program = compile_source(source, opt_level=2).bytecode
+        outputs = set()
+        timings = []
+        for engine in ENGINES:
+            times = []
+            for tiering in (False, True):
+                # A fresh VM per run, so every run starts cold and pays for its compiles
+                outputs.add(VirtualMachine(tiering=tiering).run(program, engine=engine))
+                times.append(min(timeit.repeat(lambda: VirtualMachine(tiering=tiering).run(program, engine=engine),
+                                               number=1, repeat=repeat)))
+            timings.append(f"{times[0] * 1000:8.2f} ->{times[1] * 1000:8.2f}ms")
+        assert len(outputs) == 1, f"tiering changes the output of {label}"
+        vm = VirtualMachine()
+        vm.run(program)
+        print(f"{label:<24}" + "".join(f"{timing:>24}" for timing in timings) + f"{vm.hot_loops.stats['compiled']:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Cost of the tracing layer in the VM hot loop.
+
+Runs the same loop-heavy program with tracing off, with tracing on into a
+sink that drops everything, and into a ring buffer, and reports the
+per-instruction overhead of the disabled `if trace:` guard.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import counting_loop, compile_stack_code
+from core.bytecode import assemble
+from core.trace import Tracer, RingBufferSink, DEBUG, OFF
+from core.vm import VirtualMachine
+
+
+def best_of(func, repeat=5):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(iterations=20000):
+    program = assemble(compile_stack_code(counting_loop(iterations)))
+
+    counter = RingBufferSink(capacity=1)
+    executed = 0
+
+    def count(stage, message):
+        nonlocal executed
+        executed += 1
+    VirtualMachine(Tracer(level=DEBUG, stages=["vm"], sink=count)).run(program)
+
+    off = best_of(lambda: VirtualMachine(Tracer(level=OFF), tiering=False).run(program))
+    null = best_of(lambda: VirtualMachine(Tracer(level=DEBUG, sink=lambda stage, message: None)).run(program))
+    ring = best_of(lambda: VirtualMachine(Tracer(level=DEBUG, sink=counter)).run(program))
+
+    # The only thing tracing leaves in the disabled path is a truth test of a local
+    guard = min(timeit.repeat("if trace: trace(x)", setup="trace = None; x = 1", number=executed, repeat=5))
+    guard -= min(timeit.repeat("pass", number=executed, repeat=5))
+
+    print(f"instructions executed : {executed}")
+    print(f"tracing off           : {off * 1000:8.2f} ms  ({off / executed * 1e9:6.1f} ns/instr)")
+    print(f"tracing on, null sink : {null * 1000:8.2f} ms  ({null / off:5.1f}x)")
+    print(f"tracing on, ring sink : {ring * 1000:8.2f} ms  ({ring / off:5.1f}x)")
+    print(f"disabled guard cost   : {guard * 1000:8.2f} ms  ({guard / executed * 1e9:6.1f} ns/instr, "
+          f"{guard / off * 100:.1f}% of the untraced run)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
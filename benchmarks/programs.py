@@ -0,0 +1,180 @@
+import os
+import random
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.compiler import compile_source
+
+
+def counting_loop(iterations):
+    """A `think while` loop doing arithmetic, a comparison and a branch per iteration."""
+    return f'''remember i = 0
+remember total = 0
+think while i < {iterations}
+    update total = total + i
+    feel total > 1000000
+        update total = total - 1000000
+    update i = i + 1
+speak total
+sleep
+'''
+
+
+def string_loop(iterations):
+    """A loop that builds output lines by string concatenation."""
+    return f'''remember i = 0
+think while i < {iterations}
+    whisper "Tick " + i
+    update i = i + 1
+shout "done"
+'''
+
+
+def nested_loops(outer, inner):
+    """Two nested `think while` loops with a branch in the inner body."""
+    return f'''remember i = 0
+remember hits = 0
+think while i < {outer}
+    remember j = 0
+    think while j < {inner}
+        feel j >= i
+            update hits = hits + 1
+        update j = j + 1
+    update i = i + 1
+speak hits
+'''
+
+
+def many_statements(blocks):
+    """A long straight-line script: `blocks` copies of a declaration, a loop and a branch."""
+    parts = []
+    for n in range(blocks):
+        parts.append(f'''remember v{n} = {n}
+think while v{n} < {n + 3}
+    update v{n} = v{n} + 1
+feel v{n} > 2
+    speak "big " + v{n}
+otherwise
+    whisper "small"
+''')
+    return "".join(parts) + "sleep\n"
+
+
+def pausing_loop(pauses, work=100):
+    """`pauses` iterations that each do `work` steps of arithmetic and then pause."""
+    return f'''remember i = 0
+remember total = 0
+think while i < {pauses}
+    remember j = 0
+    think while j < {work}
+        update total = total + j
+        update j = j + 1
+    pause
+    update i = i + 1
+speak total
+'''
+
+
+def scoring_program():
+    """A script scored per input row: two `listen` values, a data-dependent loop and branches."""
+    return '''listen "base" base
+listen "rate" rate
+remember score = 0
+remember step = 0
+think while step < base
+    update score = score + 1
+    feel step * rate > 50
+        update score = score + rate
+    update step = step + 1
+feel score > 100
+    shout "high " + score
+otherwise
+    speak score / 2
+'''
+
+
+# Variables a generated program declares up front, numeric and string
+GENERATED_NUMBERS = 6
+GENERATED_STRINGS = 3
+
+PRINT_KEYWORDS = ("speak", "shout", "whisper", "laugh", "murmur")
+
+
+def generated_program(statements=100, depth=2, iterations=5, strings=0.3, expression_length=3, seed=0):
+    """
+    A random but valid and terminating script of about `statements`
+    statements, the same for the same arguments.
+
+    Up to `depth` levels of `feel` / `think while` blocks are nested; each
+    loop runs `iterations` times, so the innermost statements run up to
+    iterations ** depth times per visit. `strings` is the share of
+    assignments and prints that work on strings rather than numbers and
+    `expression_length` the number of operands in every expression.
+    An assignment only reads variables declared before the one it sets
+    (strings only read numbers), so values stay small however long the
+    loops run.
+    """
+    rng = random.Random(seed)
+    numbers = [f"n{i}" for i in range(GENERATED_NUMBERS)]
+    texts = [f"s{i}" for i in range(GENERATED_STRINGS)]
+    lines = [f"remember {name} = {i}" for i, name in enumerate(numbers)]
+    lines += [f'remember {name} = "{name}"' for name in texts]
+    budget = statements
+    loops = 0
+
+    def numeric(readable=numbers):
+        terms = [rng.choice(readable) if readable and rng.random() < 0.6 else str(rng.randint(1, 9))
+                 for _ in range(expression_length)]
+        return terms[0] + "".join(f" {rng.choice('+-')} {term}" for term in terms[1:])
+
+    def text(readable=numbers + texts):
+        terms = [f'"{rng.choice("abcdefgh")}"'] + [rng.choice(readable) for _ in range(expression_length - 1)]
+        return " + ".join(terms)
+
+    def statement(level, indent):
+        nonlocal budget, loops
+        budget -= 1
+        pad = "    " * indent
+        kind = rng.random()
+        if level < depth and kind < 0.3:
+            if kind < 0.15:
+                counter = f"c{loops}"
+                loops += 1
+                lines.append(f"{pad}remember {counter} = 0")
+                lines.append(f"{pad}think while {counter} < {iterations}")
+                block(level + 1, indent + 1)
+                lines.append(f"{pad}    update {counter} = {counter} + 1")
+            else:
+                lines.append(f"{pad}feel {numeric()} > {rng.randint(0, 20)}")
+                block(level + 1, indent + 1)
+                # `otherwise` closes every open block, so only a top-level feel can have one
+                if level == 0 and rng.random() < 0.5:
+                    lines.append("otherwise")
+                    block(level + 1, indent + 1)
+        elif kind < 0.75:
+            if rng.random() < strings:
+                lines.append(f"{pad}update {rng.choice(texts)} = {text(numbers)}")
+            else:
+                target = rng.randrange(len(numbers))
+                lines.append(f"{pad}update {numbers[target]} = {numeric(numbers[:target])}")
+        else:
+            lines.append(f"{pad}{rng.choice(PRINT_KEYWORDS)} {text() if rng.random() < strings else numeric()}")
+
+    def block(level, indent):
+        statement(level, indent)
+        for _ in range(rng.randint(0, 3)):
+            if budget <= 0:
+                break
+            statement(level, indent)
+
+    while budget > 0:
+        statement(0, 0)
+    return "\n".join(lines) + "\n"
+
+
+def compile_ast(source):
+    return compile_source(source).ast
+
+
+def compile_stack_code(source):
+    return compile_source(source).stack_code
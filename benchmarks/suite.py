@@ -0,0 +1,165 @@
+"""
+Every front-end stage and the VM, timed one at a time on generated
+programs of growing size, with regression tracking.
+
+For each size the stages run in pipeline order (tokenize, Parser.parse,
+SemanticAnalyzer.analyze, TACGenerator.generate, CodeGenerator.generate,
+VirtualMachine.execute), each fed the previous stage's result, and each
+is measured for time (best of --repeat) and, in a separate run under
+tracemalloc, for the peak memory it allocates. Results go to a JSON file;
+with --baseline they are compared against an earlier results file and
+the run fails when a stage got slower or bigger by more than --threshold.
+
+    python benchmarks/suite.py -o results.json
+    python benchmarks/suite.py --baseline results.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.programs import generated_program
+from core.code_generator import CodeGenerator
+from core.lexer import tokenize
+from core.parser import Parser
+from core.semantic_analyzer import SemanticAnalyzer
+from core.tac_generator import TACGenerator
+from core.vm import VirtualMachine
+
+RESULTS_VERSION = 1
+SIZES = (100, 1000, 10000)
+METRICS = ("seconds", "peak_bytes")
+
+# Timings below this are too noisy to call a regression on
+MIN_COMPARED_SECONDS = 0.001
+
+
+def analyze(ast):
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(ast)
+    return analyzer.types
+
+
+# (name, function of the earlier results): each stage gets what the ones before it produced
+STAGES = (
+    ("tokenize", lambda r: tokenize(r["source"])),
+    ("parse", lambda r: Parser(r["tokenize"]).parse()),
+    ("analyze", lambda r: analyze(r["parse"])),
+    ("tac", lambda r: TACGenerator(r["analyze"]).generate(r["parse"])),
+    ("codegen", lambda r: CodeGenerator().generate(r["tac"])),
+    ("execute", lambda r: VirtualMachine().execute(r["codegen"])),
+)
+
+
+def best_of(func, repeat):
+    # timeit keeps the garbage collector out of the timed calls
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def peak_memory(func):
+    """Bytes allocated at the peak of one call of `func`, not counting what existed before it."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(sizes=SIZES, repeat=5, **program_options):
+    """Measure every stage at every size; returns the results document that is written as JSON."""
+    results = []
+    for size in sizes:
+        done = {"source": generated_program(size, **program_options)}
+        for name, stage in STAGES:
+            done[name] = stage(done)
+            results.append({"stage": name, "size": size, "seconds": best_of(lambda: stage(done), repeat),
+                            "peak_bytes": peak_memory(lambda: stage(done))})
+        print(f"measured size {size}", file=sys.stderr)
+    return {"version": RESULTS_VERSION, "python": platform.python_version(), "machine": platform.machine(),
+            "program": dict(program_options), "repeat": repeat, "results": results}
+
+
+def compare(current, baseline, threshold):
+    """
+    (stage, size, metric, baseline value, current value, ratio) for every
+    measurement both documents have, and the ones among them that grew by
+    more than `threshold` (0.2 is 20%).
+    """
+    if current["program"] != baseline["program"]:
+        raise ValueError(f"Baseline was measured on other programs: {baseline['program']}")
+    before = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    regressions = []
+    for result in current["results"]:
+        old = before.get((result["stage"], result["size"]))
+        if old is None:
+            continue
+        for metric in METRICS:
+            ratio = result[metric] / old[metric] if old[metric] else 1.0
+            row = (result["stage"], result["size"], metric, old[metric], result[metric], ratio)
+            rows.append(row)
+            noisy = metric == "seconds" and max(old[metric], result[metric]) < MIN_COMPARED_SECONDS
+            if ratio > 1 + threshold and not noisy:
+                regressions.append(row)
+    return rows, regressions
+
+
+def report(document):
+    """Per stage and size: time, peak memory and the time per statement, which stays flat for linear scaling."""
+    lines = [f"{'stage':<10}{'size':>8}{'time':>12}{'per stmt':>12}{'peak':>12}"]
+    for r in document["results"]:
+        lines.append(f"{r['stage']:<10}{r['size']:>8}{r['seconds'] * 1000:10.2f}ms"
+                     f"{r['seconds'] / r['size'] * 1e6:10.2f}us{r['peak_bytes'] / 2**20:10.2f}MB")
+    return "\n".join(lines)
+
+
+def format_value(metric, value):
+    return f"{value * 1000:.2f}ms" if metric == "seconds" else f"{value / 2**20:.2f}MB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time every compiler stage and the VM on generated programs")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed growth before a regression (0.2 = 20%%)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="statement counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=2, help="nesting depth of feel / think while")
+    parser.add_argument("--iterations", type=int, default=5, help="iterations of every loop")
+    parser.add_argument("--strings", type=float, default=0.3, help="share of string assignments and prints")
+    parser.add_argument("--expression-length", type=int, default=3, help="operands per expression")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args(argv)
+
+    document = run_suite(options.sizes, options.repeat, depth=options.depth, iterations=options.iterations,
+                         strings=options.strings, expression_length=options.expression_length, seed=options.seed)
+    print(report(document))
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+    if not options.baseline:
+        return 0
+
+    with open(options.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    try:
+        rows, regressions = compare(document, baseline, options.threshold)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"\nAgainst {options.baseline} (threshold {options.threshold:.0%}):")
+    print(f"{'stage':<10}{'size':>8}{'metric':>12}{'baseline':>12}{'current':>12}{'change':>9}")
+    for stage, size, metric, old, new, ratio in rows:
+        flag = "  REGRESSION" if (stage, size, metric, old, new, ratio) in regressions else ""
+        print(f"{stage:<10}{size:>8}{metric:>12}{format_value(metric, old):>12}{format_value(metric, new):>12}"
+              f"{ratio - 1:>+9.0%}{flag}")
+    print(f"{len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,13 @@
+# Every node declares __slots__: a large script builds millions of nodes and a
+# per-instance __dict__ would make its AST several times bigger.
+#
+# Statements carry `pos`, the source offset of their first token (None for
+# nodes built by hand); the compiler stages pass it down to the bytecode
+# (see Bytecode.positions).
+
 class Program:
+    __slots__ = ("statements",)
+
     def __init__(self, statements):
         self.statements = statements
 
@@ -6,79 +15,106 @@ class Program:
         return "\n".join(str(stmt) for stmt in self.statements)
 
 class VarDeclaration:
-    def __init__(self, name, value):
+    __slots__ = ("name", "value", "pos")
+
+    def __init__(self, name, value, pos=None):
         self.name = name
         self.value = value
+        self.pos = pos
 
     def __str__(self):
         return f"VarDeclaration({self.name} = {self.value})"
 
 class Update:
-    def __init__(self, name, value):
+    __slots__ = ("name", "value", "pos")
+
+    def __init__(self, name, value, pos=None):
         self.name = name
         self.value = value
+        self.pos = pos
 
     def __str__(self):
         return f"Update({self.name} = {self.value})"
 
 class PrintCommand:
-    def __init__(self, command, expression):
+    __slots__ = ("command", "expression", "pos")
+
+    def __init__(self, command, expression, pos=None):
         self.command = command  # 'speak', 'shout', 'whisper', 'laugh', 'murmur'
         self.expression = expression
+        self.pos = pos
 
     def __str__(self):
         return f"PrintCommand({self.command}, {self.expression})"
 
 class Panic:
-    def __init__(self, message):
+    __slots__ = ("message", "pos")
+
+    def __init__(self, message, pos=None):
         self.message = message
+        self.pos = pos
 
     def __str__(self):
         return f"Panic({self.message})"
 
 class Pause:
-    def __init__(self):
-        pass
+    __slots__ = ("pos",)
+
+    def __init__(self, pos=None):
+        self.pos = pos
 
     def __str__(self):
         return "Pause()"
 
 class Sleep:
-    def __init__(self):
-        pass
+    __slots__ = ("pos",)
+
+    def __init__(self, pos=None):
+        self.pos = pos
 
     def __str__(self):
         return "Sleep()"
 
 class InputCommand:
-    def __init__(self, prompt, var):
+    __slots__ = ("prompt", "var", "pos")
+
+    def __init__(self, prompt, var, pos=None):
         self.prompt = prompt
         self.var = var
+        self.pos = pos
 
     def __str__(self):
         return f"InputCommand({self.prompt}, {self.var})"
 
 class IfStatement:
-    def __init__(self, condition, then_block, else_block=None):
+    __slots__ = ("condition", "then_block", "else_block", "pos")
+
+    def __init__(self, condition, then_block, else_block=None, pos=None):
         self.condition = condition
         self.then_block = then_block
         self.else_block = else_block
+        self.pos = pos
 
     def __str__(self):
         else_str = f"\nelse:\n  {self.else_block}" if self.else_block else ""
         return f"If({self.condition}):\n  {self.then_block}{else_str}"
 
 class WhileLoop:
-    def __init__(self, condition, body, spiral=False):
+    __slots__ = ("condition", "body", "spiral", "pos")
+
+    def __init__(self, condition, body, spiral=False, pos=None):
         self.condition = condition
         self.body = body
         self.spiral = spiral
+        self.pos = pos
 
     def __str__(self):
         prefix = "SpiralWhile" if self.spiral else "While"
         return f"{prefix}({self.condition}):\n  {self.body}"
 
 class BinaryOperation:
+    __slots__ = ("left", "op", "right")
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
@@ -88,6 +124,8 @@ class BinaryOperation:
         return f"BinaryOp({self.left} {self.op} {self.right})"
 
 class Literal:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
@@ -95,6 +133,8 @@ class Literal:
         return f"Literal({self.value})"
 
 class Variable:
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
@@ -0,0 +1,412 @@
+import operator
+
+import numpy as np
+
+from core.bytecode import (PUSH, LOAD, STORE, ADD, SUB, MUL, DIV, EQ, NEQ, LT, GT, LE, GE, PRINT, SHOUT, WHISPER,
+                           LAUGH, MURMUR, PANIC, PAUSE, SLEEP, INPUT, JMP, JZ, ADD_NUM, CONCAT, INC, INC_VAR,
+                           LOAD_PUSH, LOAD_LOAD, LT_JZ, GT_JZ, LE_JZ, GE_JZ, EQ_JZ, NEQ_JZ, JUMP_OPS)
+from core.py_backend import RUNTIME
+from core.vm import SystemClock, VirtualMachine, convert_input
+
+# Largest integer magnitude kept in int64 arrays. Every such integer is exact
+# as a float64, so mixed int/float arithmetic and comparisons and true
+# division agree with Python; results outside the range continue as Python
+# ints in object arrays.
+SAFE_INT = 2 ** 53
+
+# Compare-and-branch ops and the comparison they test
+BRANCH_COMPARISONS = {LT_JZ: LT, GT_JZ: GT, LE_JZ: LE, GE_JZ: GE, EQ_JZ: EQ, NEQ_JZ: NEQ}
+
+# Scalar semantics of every binary op, exactly as the VM implements them
+PYTHON_OPS = {
+    ADD: RUNTIME["_add"],
+    ADD_NUM: operator.add,
+    CONCAT: lambda a, b: str(a) + str(b),
+    SUB: operator.sub,
+    MUL: operator.mul,
+    DIV: RUNTIME["_div"],
+    EQ: lambda a, b: 1 if a == b else 0,
+    NEQ: lambda a, b: 1 if a != b else 0,
+    LT: lambda a, b: 1 if a < b else 0,
+    GT: lambda a, b: 1 if a > b else 0,
+    LE: lambda a, b: 1 if a <= b else 0,
+    GE: lambda a, b: 1 if a >= b else 0,
+}
+NUMPY_COMPARISONS = {EQ: np.equal, NEQ: np.not_equal, LT: np.less, GT: np.greater, LE: np.less_equal,
+                     GE: np.greater_equal}
+NUMPY_ARITHMETIC = {ADD: np.add, ADD_NUM: np.add, SUB: np.subtract, MUL: np.multiply}
+
+PRINTERS = {
+    PRINT: str,
+    SHOUT: lambda value: str(value).upper() + "!",
+    WHISPER: lambda value: str(value).lower() + "...",
+    LAUGH: lambda value: str(value) + "😂",
+    MURMUR: RUNTIME["_murmur"],
+}
+
+# Operand stack (pops, pushes) of every op
+STACK_EFFECT = {PUSH: (0, 1), LOAD: (0, 1), STORE: (1, 0), LOAD_PUSH: (0, 2), LOAD_LOAD: (0, 2), INC: (0, 0),
+                INC_VAR: (0, 0), PANIC: (0, 0), PAUSE: (0, 0), SLEEP: (0, 0), INPUT: (0, 0), JMP: (0, 0), JZ: (1, 0)}
+STACK_EFFECT.update(dict.fromkeys(PYTHON_OPS, (2, 1)))
+STACK_EFFECT.update(dict.fromkeys(PRINTERS, (1, 0)))
+STACK_EFFECT.update(dict.fromkeys(BRANCH_COMPARISONS, (2, 0)))
+
+
+class RowResult:
+    """What running the program on one input row produced: its output and the error that stopped it, if any."""
+    def __init__(self, output, error=None):
+        self.output = output
+        self.error = error
+
+    def __eq__(self, other):
+        return (isinstance(other, RowResult) and self.output == other.output
+                and type(self.error) is type(other.error) and str(self.error) == str(other.error))
+
+    def __repr__(self):
+        return f"RowResult({self.output!r}, {self.error!r})"
+
+
+def to_array(values):
+    """Pack Python values into int64, float64 or (mixed, strings, big ints) object arrays."""
+    kinds = set(map(type, values))
+    if kinds == {int} and max(map(abs, values)) <= SAFE_INT:
+        return np.array(values, dtype=np.int64)
+    if kinds == {float}:
+        return np.array(values, dtype=np.float64)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def numbers(values):
+    """
+    An array as float64 values and a mask of the lanes holding ints, or
+    None unless every lane holds an int or float exact as a float64.
+    """
+    if values.dtype == np.int64:
+        return values.astype(np.float64), np.ones(len(values), dtype=bool)
+    if values.dtype == np.float64:
+        return values, np.zeros(len(values), dtype=bool)
+    kinds = np.frompyfunc(type, 1, 1)(values)
+    ints = kinds == int
+    if not (ints | (kinds == float)).all():
+        return None
+    result = values.astype(np.float64)
+    if np.abs(result[ints]).max(initial=0) >= SAFE_INT:
+        return None
+    return result, ints
+
+
+def with_kinds(values, ints):
+    """Turn float64 results back into ints on the lanes in `ints`."""
+    if ints.all():
+        return values.astype(np.int64)
+    if not ints.any():
+        return values
+    result = values.astype(object)
+    result[ints] = values[ints].astype(np.int64).astype(object)
+    return result
+
+
+def flat_stack(program):
+    """
+    True when the operand stack is empty at every jump and jump target,
+    so lanes only ever part or meet with nothing on their stacks.
+    """
+    ops = program.ops
+    args = program.args
+    targets = {args[pc] for pc in range(len(ops)) if ops[pc] in JUMP_OPS}
+    depth = {0: 0}
+    pending = [0]
+    while pending:
+        pc = pending.pop()
+        height = depth[pc]
+        while pc < len(ops):
+            op = ops[pc]
+            if op not in STACK_EFFECT:
+                return False
+            pops, pushes = STACK_EFFECT[op]
+            if height < pops:
+                return False
+            height += pushes - pops
+            if op in JUMP_OPS:
+                if height != 0:
+                    return False
+                if args[pc] not in depth:
+                    depth[args[pc]] = 0
+                    pending.append(args[pc])
+            if op in (JMP, PANIC, SLEEP):
+                break
+            pc += 1
+            if pc in depth:
+                if depth[pc] != height:
+                    return False
+                break
+            if pc in targets and height != 0:
+                return False
+            depth[pc] = height
+    return True
+
+
+class BatchVM:
+    """
+    Runs one program over many input rows at once, one NumPy lane per row.
+
+    Every variable and stack value is an array with an element per lane:
+    int64 or float64 while all lanes hold that kind of number, otherwise
+    an object array of the Python values the scalar VM would hold. Lanes
+    have a PC each; the lanes at the lowest PC run together through one
+    basic block, so rows that take different `feel`/`otherwise` branches
+    or leave a `think while` loop after different trip counts split up and
+    join again where the code comes back together.
+
+    A lane that raises anything (division by zero, PANIC, an unset
+    variable, a string op the scalar VM rejects, running out of input) is
+    dropped and its row is re-run on the scalar VirtualMachine, which
+    produces the exact output and error. Programs whose operand stack is
+    not empty across jumps run on the scalar VM row by row.
+
+    A PAUSE sleeps once on `clock` for all the lanes that reach it together.
+    """
+    def __init__(self, clock=None):
+        self.clock = clock or SystemClock()
+        self.stats = {"rows": 0, "vectorized": 0, "fallback": 0}
+
+    def run(self, program, inputs):
+        """Return one RowResult per row of `inputs`, each row holding the values for its INPUTs in order."""
+        if isinstance(inputs, np.ndarray):
+            inputs = inputs.tolist()
+        rows = [list(row) for row in inputs]
+        self.stats = {"rows": len(rows), "vectorized": 0, "fallback": 0}
+        if not rows:
+            return []
+        if not flat_stack(program):
+            self.stats["fallback"] = len(rows)
+            return [self.run_scalar(program, row) for row in rows]
+
+        self.program = program
+        self.rows = rows
+        n = len(rows)
+        self.pcs = np.zeros(n, dtype=np.int64)
+        self.alive = np.ones(n, dtype=bool)
+        self.failed = np.zeros(n, dtype=bool)
+        self.input_index = np.zeros(n, dtype=np.int64)
+        self.outputs = [[] for _ in range(n)]
+        self.values = [None] * program.frame_size
+        self.assigned = [np.zeros(n, dtype=bool) for _ in range(program.frame_size)]
+        self.targets = {program.args[pc] for pc in range(len(program.ops)) if program.ops[pc] in JUMP_OPS}
+
+        end = len(program.ops)
+        while True:
+            running = np.flatnonzero(self.alive)
+            if not running.size:
+                break
+            pc = int(self.pcs[running].min())
+            if pc >= end:
+                self.alive[running] = False
+                break
+            self.run_block(running[self.pcs[running] == pc], pc)
+
+        results = []
+        for row, (failed, lines) in enumerate(zip(self.failed.tolist(), self.outputs)):
+            if failed:
+                results.append(self.run_scalar(program, rows[row]))
+            else:
+                results.append(RowResult("\n".join(lines)))
+        self.stats["fallback"] = int(self.failed.sum())
+        self.stats["vectorized"] = n - self.stats["fallback"]
+        return results
+
+    def run_scalar(self, program, row):
+        vm = VirtualMachine(clock=self.clock)
+        try:
+            return RowResult(vm.run(program, row))
+        except Exception as e:
+            return RowResult("\n".join(vm.output), e)
+
+    def run_block(self, lanes, pc):
+        """Advance `lanes`, all at `pc`, to the end of their basic block."""
+        program = self.program
+        ops = program.ops
+        args = program.args
+        operands = program.operands
+        stack = []
+        end = len(ops)
+
+        while True:
+            op = ops[pc]
+            arg = args[pc]
+            if op == PUSH:
+                stack.append(self.constant(arg, len(lanes)))
+            elif op == LOAD or op == LOAD_LOAD or op == LOAD_PUSH:
+                for slot in ((arg,) if op == LOAD else (operands[arg],) if op == LOAD_PUSH
+                             else (operands[arg], operands[arg + 1])):
+                    value, unset = self.load(slot, lanes)
+                    lanes, stack = self.drop(lanes, stack, unset)
+                    stack.append(value[~unset])
+                if op == LOAD_PUSH:
+                    stack.append(self.constant(operands[arg + 1], len(lanes)))
+            elif op == STORE:
+                self.store(arg, lanes, stack.pop())
+            elif op == INC or op == INC_VAR:
+                slot = operands[arg]
+                value, unset = self.load(slot, lanes)
+                if op == INC:
+                    other = self.constant(operands[arg + 1], len(lanes))
+                else:
+                    other, other_unset = self.load(operands[arg + 1], lanes)
+                    unset |= other_unset
+                lanes, stack = self.drop(lanes, stack, unset)
+                result, failed = self.binary(ADD_NUM, value[~unset], other[~unset])
+                lanes, stack = self.drop(lanes, stack, failed)
+                self.store(slot, lanes, result[~failed])
+            elif op in PYTHON_OPS:
+                b = stack.pop()
+                result, failed = self.binary(op, stack.pop(), b)
+                lanes, stack = self.drop(lanes, stack, failed)
+                stack.append(result[~failed])
+            elif op in PRINTERS:
+                printer = PRINTERS[op]
+                outputs = self.outputs
+                for lane, value in zip(lanes.tolist(), stack.pop().tolist()):
+                    outputs[lane].append(printer(value))
+            elif op == INPUT:
+                lanes = self.read_input(arg, lanes)
+            elif op == PAUSE:
+                self.clock.sleep(1)
+            elif op == PANIC:
+                self.drop(lanes, stack, np.ones(len(lanes), dtype=bool))
+                return
+            elif op == SLEEP:
+                self.alive[lanes] = False
+                return
+            elif op == JMP:
+                self.pcs[lanes] = arg
+                return
+            elif op == JZ or op in BRANCH_COMPARISONS:
+                if op == JZ:
+                    condition = stack.pop()
+                else:
+                    b = stack.pop()
+                    condition, failed = self.binary(BRANCH_COMPARISONS[op], stack.pop(), b)
+                    lanes, stack = self.drop(lanes, stack, failed)
+                    condition = condition[~failed]
+                taken = np.asarray(condition == 0, dtype=bool)
+                self.pcs[lanes[taken]] = arg
+                self.pcs[lanes[~taken]] = pc + 1
+                return
+            else:
+                raise ValueError(f"Unknown opcode: {op}")
+
+            pc += 1
+            if not lanes.size:
+                return
+            if pc >= end or pc in self.targets:
+                # Wait here for the lanes that reach this block by a jump
+                self.pcs[lanes] = pc
+                return
+
+    def drop(self, lanes, stack, failed):
+        """Hand the lanes flagged in `failed` over to the scalar VM; returns the remaining lanes and stack."""
+        if not failed.any():
+            return lanes, stack
+        self.failed[lanes[failed]] = True
+        self.alive[lanes[failed]] = False
+        keep = ~failed
+        return lanes[keep], [value[keep] for value in stack]
+
+    def constant(self, index, count):
+        value = self.program.constants[index]
+        if isinstance(value, int) and abs(value) <= SAFE_INT:
+            return np.full(count, value, dtype=np.int64)
+        if isinstance(value, float):
+            return np.full(count, value, dtype=np.float64)
+        array = np.empty(count, dtype=object)
+        array[:] = [value] * count
+        return array
+
+    def load(self, slot, lanes):
+        """The values of `slot` in `lanes` and the mask of lanes where it is unset."""
+        unset = ~self.assigned[slot][lanes]
+        values = self.values[slot]
+        if values is None:
+            return np.zeros(len(lanes), dtype=np.int64), unset
+        return values[lanes], unset
+
+    def store(self, slot, lanes, value):
+        current = self.values[slot]
+        if current is None or current.dtype != value.dtype:
+            others = self.assigned[slot].copy()
+            others[lanes] = False
+            if others.any():
+                # Lanes that keep their old value need a common representation
+                current = current.astype(object)
+                value = value.astype(object)
+            else:
+                current = np.zeros(len(self.alive), dtype=value.dtype)
+            self.values[slot] = current
+        current[lanes] = value
+        self.assigned[slot][lanes] = True
+
+    def read_input(self, slot, lanes):
+        rows = self.rows
+        values = []
+        exhausted = []
+        for lane, position in zip(lanes.tolist(), self.input_index[lanes].tolist()):
+            if position < len(rows[lane]):
+                values.append(convert_input(rows[lane][position]))
+            exhausted.append(position >= len(rows[lane]))
+        lanes, _ = self.drop(lanes, [], np.array(exhausted))
+        if lanes.size:
+            self.store(slot, lanes, to_array(values))
+            self.input_index[lanes] += 1
+        return lanes
+
+    def binary(self, op, a, b):
+        """
+        `a <op> b` lane by lane. Returns the result and a mask of the lanes
+        where the scalar VM would raise (their result element is junk).
+        """
+        if op != CONCAT:
+            x = numbers(a)
+            y = numbers(b) if x is not None else None
+            if y is not None:
+                # Float overflow gives inf, as in Python, without NumPy's warnings
+                with np.errstate(all="ignore"):
+                    result = self.numeric(op, *x, *y)
+                if result is not None:
+                    return result
+        return self.elementwise(op, a, b)
+
+    def numeric(self, op, x, x_ints, y, y_ints):
+        """
+        The op on lanes that all hold numbers, computed in float64 with the
+        Python int/float kind of each lane tracked alongside. None when an
+        int result would leave the exact range.
+        """
+        succeeded = np.zeros(len(x), dtype=bool)
+        if op in NUMPY_COMPARISONS:
+            return NUMPY_COMPARISONS[op](x, y).astype(np.int64), succeeded
+        if op == DIV:
+            failed = y == 0
+            return np.true_divide(x, np.where(failed, 1, y)), failed
+        result = NUMPY_ARITHMETIC[op](x, y)
+        ints = x_ints & y_ints
+        if np.abs(result[ints]).max(initial=0) >= SAFE_INT:
+            return None
+        return with_kinds(result, ints), succeeded
+
+    def elementwise(self, op, a, b):
+        function = PYTHON_OPS[op]
+        results = []
+        failed = []
+        for x, y in zip(a.tolist(), b.tolist()):
+            try:
+                results.append(function(x, y))
+                failed.append(False)
+            except Exception:
+                results.append(0)
+                failed.append(True)
+        if not results:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+        return to_array(results), np.array(failed)
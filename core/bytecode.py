@@ -0,0 +1,316 @@
+import re
+
+# Opcodes of the decoded instruction stream. LABEL has no opcode: labels are
+# resolved to absolute PCs by the assembler and never reach the VM.
+PUSH = 0
+LOAD = 1
+STORE = 2
+ADD = 3
+SUB = 4
+MUL = 5
+DIV = 6
+EQ = 7
+NEQ = 8
+LT = 9
+GT = 10
+LE = 11
+GE = 12
+PRINT = 13
+SHOUT = 14
+WHISPER = 15
+LAUGH = 16
+MURMUR = 17
+PANIC = 18
+PAUSE = 19
+SLEEP = 20
+INPUT = 21
+JMP = 22
+JZ = 23
+ADD_NUM = 24  # ADD of two numbers: no string check
+CONCAT = 25   # ADD with a string operand: always concatenates
+# Superinstructions (see core.superinstructions)
+INC = 26        # x = x + c, operands: slot, constant
+INC_VAR = 27    # x = x + y, operands: slot, slot
+LOAD_PUSH = 28  # operands: slot, constant
+LOAD_LOAD = 29  # operands: slot, slot
+LT_JZ = 30      # compare and jump if false
+GT_JZ = 31
+LE_JZ = 32
+GE_JZ = 33
+EQ_JZ = 34
+NEQ_JZ = 35
+
+OPNAMES = ["PUSH", "LOAD", "STORE", "ADD", "SUB", "MUL", "DIV", "EQ", "NEQ", "LT", "GT", "LE", "GE",
+           "PRINT", "SHOUT", "WHISPER", "LAUGH", "MURMUR", "PANIC", "PAUSE", "SLEEP", "INPUT", "JMP", "JZ",
+           "ADD_NUM", "CONCAT", "INC", "INC_VAR", "LOAD_PUSH", "LOAD_LOAD", "LT_JZ", "GT_JZ", "LE_JZ", "GE_JZ",
+           "EQ_JZ", "NEQ_JZ"]
+OPCODES = {name: code for code, name in enumerate(OPNAMES)}
+
+NAME_OPS = (LOAD, STORE, INPUT)
+JUMP_OPS = (JMP, JZ, LT_JZ, GT_JZ, LE_JZ, GE_JZ, EQ_JZ, NEQ_JZ)
+# Ops with two operands; their argument is the index of the first one in Bytecode.operands
+OPERAND_OPS = (INC, INC_VAR, LOAD_PUSH, LOAD_LOAD)
+# Ops whose second operand is a constant rather than a slot
+CONSTANT_OPERAND_OPS = (INC, LOAD_PUSH)
+
+# Names minted by TACGenerator.new_temp
+TEMP_NAME = re.compile(r"t\d+")
+
+# Bytecode.positions entry of an instruction with no known source position
+NO_POSITION = -1
+
+# Numeric PUSH operands. Source literals are plain digits; folded constants
+# can also be negative or floats (str() of a Python float).
+NUMBER_LITERAL = re.compile(r"-?\d+(\.\d*)?([eE][-+]?\d+)?")
+
+
+def parse_number(text):
+    """Return the int or float spelled by `text`, or None if it is not a number literal."""
+    if not NUMBER_LITERAL.fullmatch(text):
+        return None
+    if text.lstrip("-").isdigit():
+        return int(text)
+    return float(text)
+
+
+class Unset:
+    """Marker held by a frame slot whose variable has not been assigned yet."""
+    def __repr__(self):
+        return "<unset>"
+
+
+UNSET = Unset()
+
+
+class Bytecode:
+    """
+    Stack code decoded once into parallel opcode/argument lists.
+    PUSH and PANIC arguments index `constants`, JMP/JZ and compare-and-
+    branch arguments are absolute PCs, and LOAD/STORE/INPUT arguments are
+    frame slots. The two-operand superinstructions (OPERAND_OPS) keep their
+    slot and slot-or-constant operands in the flat `operands` list; their
+    argument is the index of the first one.
+
+    Slots below `global_count` belong to program variables; the rest are a
+    pool shared by temporaries whose lifetimes do not overlap. `names` maps
+    every slot to a printable name.
+
+    `positions` maps every PC to the source offset of the statement it was
+    compiled from, or NO_POSITION (see core.profiler for lines).
+    """
+    def __init__(self, ops, args, constants, names, global_count, source_map, operands=(), positions=None):
+        self.ops = ops
+        self.args = args
+        self.operands = operands
+        self.constants = constants
+        self.names = names
+        self.global_count = global_count
+        self.frame_size = len(names)
+        self.source_map = source_map  # PC -> index of the stack code instruction
+        self.positions = positions if positions is not None else [NO_POSITION] * len(ops)
+
+    def new_frame(self):
+        return [UNSET] * self.frame_size
+
+    def variables(self, frame):
+        """Program variables that hold a value in `frame`, keyed by name."""
+        return {self.names[slot]: frame[slot] for slot in range(self.global_count) if frame[slot] is not UNSET}
+
+    def __len__(self):
+        return len(self.ops)
+
+    def render(self, pc):
+        op = self.ops[pc]
+        arg = self.args[pc]
+        if op == PUSH or op == PANIC:
+            return f"{OPNAMES[op]} {self.constants[arg]!r}"
+        if op in NAME_OPS:
+            return f"{OPNAMES[op]} {self.names[arg]}"
+        if op in JUMP_OPS:
+            return f"{OPNAMES[op]} @{arg}"
+        if op in OPERAND_OPS:
+            first = self.names[self.operands[arg]]
+            second = self.operands[arg + 1]
+            if op in CONSTANT_OPERAND_OPS:
+                return f"{OPNAMES[op]} {first} {self.constants[second]!r}"
+            return f"{OPNAMES[op]} {first} {self.names[second]}"
+        return OPNAMES[op]
+
+    def __str__(self):
+        return "\n".join(f"{pc}: {self.render(pc)}" for pc in range(len(self.ops)))
+
+
+class Assembler:
+    def __init__(self):
+        self.constants = []
+        self.constant_index = {}
+
+    def constant(self, value):
+        # Keyed by type as well so that 1, 1.0 and True never share a slot
+        key = (type(value), value)
+        index = self.constant_index.get(key)
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            self.constant_index[key] = index
+        return index
+
+    def literal(self, text):
+        """Pool the constant spelled by a PUSH operand and return its index."""
+        number = parse_number(text)
+        if number is not None:
+            return self.constant(number)
+        if text.startswith('"') and text.endswith('"') and len(text) >= 2:
+            return self.constant(text[1:-1])
+        raise ValueError(f"Invalid PUSH argument: {text}")
+
+    def decode(self, instr):
+        """Split one stack code instruction into its opcode name and raw argument."""
+        if instr.startswith('PUSH "'):
+            end_quote = instr.rfind('"')
+            if end_quote == -1 or end_quote <= 5:
+                raise ValueError(f"Malformed PUSH instruction: {instr}")
+            return "PUSH", instr[5:end_quote+1]
+        if instr.startswith('INPUT "'):
+            end_quote = instr.rfind('"', 7, len(instr)-1)
+            if end_quote == -1:
+                raise ValueError(f"Malformed INPUT instruction: {instr}")
+            return "INPUT", instr[end_quote+2:].strip()
+        if instr.startswith('PANIC "'):
+            return "PANIC", instr[6:]
+        parts = instr.split(maxsplit=1)
+        return parts[0], parts[1] if len(parts) > 1 else ""
+
+    def assemble(self, instructions, positions=None):
+        decoded = []
+        labels = {}
+        for i, instr in enumerate(instructions):
+            name, args = self.decode(instr)
+            if name == "LABEL":
+                labels[args.split()[0]] = len(decoded)
+            else:
+                decoded.append((name, args, i))
+
+        ops = []
+        arg_list = []
+        operands = []
+        fused = []  # Bytecode.operands, with variable names until slots are allocated
+        source_map = []
+        for name, args, i in decoded:
+            op = OPCODES.get(name)
+            if op is None:
+                raise ValueError(f"Unknown instruction: {instructions[i]}")
+            if op == PUSH:
+                arg = self.literal(args)
+            elif op == PANIC:
+                if args.startswith('"') and args.endswith('"'):
+                    args = args[1:-1]
+                arg = self.constant(args)
+            elif op in NAME_OPS:
+                arg = None  # filled in by allocate_slots
+            elif op in JUMP_OPS:
+                if args not in labels:
+                    raise ValueError(f"Label {args} not found")
+                arg = labels[args]
+            elif op in OPERAND_OPS:
+                variable, _, second = args.partition(" ")
+                if not variable or not second:
+                    raise ValueError(f"Malformed {name} instruction: {instructions[i]}")
+                if op in CONSTANT_OPERAND_OPS:
+                    second = self.literal(second)
+                    args = (variable,)
+                else:
+                    args = (variable, second)
+                arg = len(fused)
+                fused += [variable, second]
+            else:
+                arg = 0
+            ops.append(op)
+            arg_list.append(arg)
+            operands.append(args)
+            source_map.append(i)
+        names, global_count = self.allocate_slots(ops, arg_list, operands)
+        slot_of = {name: slot for slot, name in enumerate(names[:global_count])}
+        fused = [slot_of[operand] if isinstance(operand, str) else operand for operand in fused]
+        if positions is not None:
+            positions = [NO_POSITION if positions[i] is None else positions[i] for i in source_map]
+        return Bytecode(ops, arg_list, self.constants, names, global_count, source_map, fused, positions)
+
+    def allocate_slots(self, ops, args, operands):
+        """
+        Resolve every LOAD/STORE/INPUT operand to a frame slot, in place.
+
+        A liveness pass over basic blocks finds the temporaries that are never
+        live across a block boundary (every TAC temp: each is stored and then
+        consumed inside the statement that created it). Those share a small
+        pool of slots, allocated by a linear scan that frees a slot after the
+        last load of its value in the block. Every other name keeps a slot of
+        its own for the whole run, as does every name a superinstruction
+        refers to (their `operands` entry is the tuple of those names).
+        """
+        leaders = {0}
+        for pc, op in enumerate(ops):
+            if op in JUMP_OPS:
+                leaders.add(args[pc])
+                leaders.add(pc + 1)
+        leaders = sorted(pc for pc in leaders if pc < len(ops))
+        blocks = [(start, leaders[n + 1] if n + 1 < len(leaders) else len(ops)) for n, start in enumerate(leaders)]
+
+        # A name is block-local when no block reads it before writing it
+        exposed = set()
+        last_load = {}
+        for start, stop in blocks:
+            written = set()
+            for pc in range(start, stop):
+                op = ops[pc]
+                if op == LOAD:
+                    if operands[pc] not in written:
+                        exposed.add(operands[pc])
+                    last_load[(start, operands[pc])] = pc
+                elif op == STORE or op == INPUT:
+                    written.add(operands[pc])
+
+        names = []
+        slot_of = {}
+        for pc, op in enumerate(ops):
+            if op in NAME_OPS:
+                name = operands[pc]
+                candidates = (name,) if name in exposed or not TEMP_NAME.fullmatch(name) else ()
+            elif op in OPERAND_OPS:
+                candidates = operands[pc]
+            else:
+                continue
+            for name in candidates:
+                if name not in slot_of:
+                    slot_of[name] = len(names)
+                    names.append(name)
+        global_count = len(names)
+
+        pool = []
+        for start, stop in blocks:
+            free = list(range(len(pool) - 1, -1, -1))
+            assigned = {}
+            for pc in range(start, stop):
+                if ops[pc] not in NAME_OPS:
+                    continue
+                name = operands[pc]
+                if name in slot_of:
+                    args[pc] = slot_of[name]
+                    continue
+                if name not in assigned:
+                    if not free:
+                        free.append(len(pool))
+                        pool.append(f"$t{len(pool)}")
+                    assigned[name] = free.pop()
+                slot = assigned[name]
+                args[pc] = global_count + slot
+                # Release the slot once the value has been consumed for the last time
+                if last_load.get((start, name), -1) <= pc:
+                    del assigned[name]
+                    free.append(slot)
+        return names + pool, global_count
+
+
+def assemble(instructions, positions=None):
+    """Decode CodeGenerator output, with the source `positions` of its instructions if known, into a Bytecode program."""
+    return Assembler().assemble(instructions, positions)
@@ -0,0 +1,123 @@
+import collections
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+from core.compiler import COMPILER_VERSION, compile_source
+
+
+def cache_key(source, opt_level=0):
+    """Content address of a compilation: the source plus everything that changes its output."""
+    digest = hashlib.sha256()
+    digest.update(f"neuroscript:{COMPILER_VERSION}:O{opt_level}\0".encode())
+    digest.update(source.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """
+    Compiled programs keyed by cache_key().
+
+    A bounded in-memory LRU tier sits in front of an optional on-disk tier
+    (`directory`), which holds one pickle per key and survives restarts.
+    Unless `keep_artifacts` is set only the executable parts of a
+    CompiledProgram are kept (see CompiledProgram.without_artifacts).
+    """
+    def __init__(self, capacity=256, directory=None, keep_artifacts=False):
+        self.capacity = capacity
+        self.directory = directory
+        self.keep_artifacts = keep_artifacts
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def compile(self, source, opt_level=0):
+        compiled = self.lookup(source, opt_level)
+        if compiled is None:
+            compiled = self.store(compile_source(source, opt_level))
+        return compiled
+
+    def lookup(self, source, opt_level=0):
+        key = cache_key(source, opt_level)
+        with self.lock:
+            compiled = self.entries.get(key)
+            if compiled is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+        compiled = self.load(key)
+        if compiled is None:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.disk_hits += 1
+        self.remember(key, compiled)
+        return compiled
+
+    def store(self, compiled):
+        if not self.keep_artifacts:
+            compiled = compiled.without_artifacts()
+        key = cache_key(compiled.source, compiled.opt_level)
+        self.remember(key, compiled)
+        self.save(key, compiled)
+        return compiled
+
+    def remember(self, key, compiled):
+        with self.lock:
+            self.entries[key] = compiled
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self.path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or written by an incompatible build: drop it and recompile
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+            return None
+
+    def save(self, key, compiled):
+        if not self.directory:
+            return
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def clear(self, disk=False):
+        with self.lock:
+            self.entries.clear()
+        if disk and self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".pickle"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
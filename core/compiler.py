@@ -0,0 +1,94 @@
+from core.lexer import tokenize, CHUNK_SIZE
+from core.parser import Parser, parse_file
+from core.semantic_analyzer import SemanticAnalyzer, infer_types
+from core.optimizer import Optimizer
+from core.tac_generator import TACGenerator
+from core.code_generator import CodeGenerator
+from core.peephole import PeepholeOptimizer
+from core.superinstructions import SuperinstructionFuser
+from core.bytecode import assemble
+
+# Bump whenever a change to any stage alters what it produces for the same
+# source; cached compilations from other versions are then never reused.
+COMPILER_VERSION = "6"
+
+# 0: no optimization
+# 1: peephole cleanups on the stack code, then superinstruction fusion
+# 2: AST constant folding / dead code elimination + full peephole incl. jump threading + superinstructions
+OPT_LEVELS = (0, 1, 2)
+
+
+class CompiledProgram:
+    """Every artifact of one compilation, from tokens to assembled bytecode."""
+    def __init__(self, source, opt_level, tokens, ast, tac, stack_code, bytecode, peephole_stats):
+        self.source = source
+        self.opt_level = opt_level
+        self.tokens = tokens
+        self.ast = ast
+        self.tac = tac
+        self.stack_code = stack_code
+        self.bytecode = bytecode
+        self.peephole_stats = peephole_stats
+
+    def without_artifacts(self):
+        """A copy that keeps only what is needed to run and inspect the program."""
+        return CompiledProgram(self.source, self.opt_level, None, None, None, self.stack_code, self.bytecode,
+                               self.peephole_stats)
+
+
+def optimize_stack_code(stack_code, opt_level, positions=None):
+    """
+    Run the peephole optimizer and, from level 1, superinstruction fusion
+    over `stack_code`. Returns the new code, the source positions of its
+    instructions (None unless `positions` were given, see
+    CodeGenerator.positions) and the statistics kept in
+    CompiledProgram.peephole_stats.
+    """
+    peephole = PeepholeOptimizer(opt_level)
+    stack_code = peephole.optimize(stack_code, positions)
+    positions = peephole.positions
+    stats = dict(peephole.stats, removed=peephole.removed)
+    if opt_level >= 1:
+        fuser = SuperinstructionFuser()
+        stack_code = fuser.fuse(stack_code, positions)
+        positions = fuser.positions
+        stats["fused"] = sum(fuser.stats.values())
+    return stack_code, positions, stats
+
+
+def compile_source(source, opt_level=0, tracer=None):
+    """Run the whole front end on `source` and assemble the result."""
+    if opt_level not in OPT_LEVELS:
+        raise ValueError(f"Unknown optimization level: {opt_level}")
+    tokens = tokenize(source, tracer)
+    ast = Parser(tokens, tracer).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(ast)
+    types = analyzer.types
+    if opt_level >= 2:
+        ast = Optimizer().optimize(ast)
+        # Folding and pruning can only make the inferred types more precise
+        types = infer_types(ast)
+    tac = TACGenerator(types).generate(ast)
+    generator = CodeGenerator(tracer)
+    stack_code, positions, stats = optimize_stack_code(generator.generate(tac), opt_level, generator.positions)
+    return CompiledProgram(source, opt_level, tokens, ast, tac, stack_code, assemble(stack_code, positions), stats)
+
+
+def compile_stream(file, tracer=None, chunk_size=CHUNK_SIZE):
+    """
+    Compile a NeuroScript text file object to stack code in bounded memory.
+
+    Top-level statements flow through the parser, semantic analysis, TAC
+    and code generation one at a time and the stack code is yielded as it
+    is produced, e.g. to be written straight to disk. Memory use depends on
+    the largest top-level statement and the number of distinct variables,
+    not on the size of the file. The whole-program optimizers and type
+    inference need the entire program, so the result is unoptimized
+    (level 0) stack code using only the generic ADD, without source
+    positions.
+    """
+    statements = parse_file(file, tracer, chunk_size)
+    statements = SemanticAnalyzer().analyze_stream(statements)
+    tac = TACGenerator().generate_stream(statements)
+    return CodeGenerator(tracer).generate_stream(tac)
@@ -0,0 +1,189 @@
+import sys
+import time
+
+from core.bytecode import JUMP_OPS
+
+# Backward jumps between two looks at the wall clock
+DEADLINE_CHECK_EVERY = 256
+
+# Iterations a compiled loop runs before it comes back for its deadline to be checked
+COMPILED_SLICE = 10000
+
+UNLIMITED = sys.maxsize
+
+
+class Limits:
+    """
+    What one governed run may use; None leaves a resource unbounded.
+
+    max_instructions is fuel: every iteration of a loop costs the number
+    of instructions in the loop, charged at its backward jump.
+    max_stack bounds the operand stack depth, max_string the length of a
+    string built by ADD/CONCAT/MUL or of an output line (SHOUT, MURMUR, ...),
+    max_output_lines and max_output_bytes (UTF-8, newlines included) the
+    output, and wall_time the seconds the run may take.
+    """
+    def __init__(self, max_instructions=None, max_stack=None, max_string=None, max_output_lines=None,
+                 max_output_bytes=None, wall_time=None):
+        self.max_instructions = max_instructions
+        self.max_stack = max_stack
+        self.max_string = max_string
+        self.max_output_lines = max_output_lines
+        self.max_output_bytes = max_output_bytes
+        self.wall_time = wall_time
+
+
+def repeated_length(a, b):
+    """Length of the string that `a * b` builds, checked before it is built; 0 if it builds none."""
+    if isinstance(a, str):
+        return len(a) * b if isinstance(b, int) and b > 0 else 0
+    if isinstance(b, str):
+        return len(b) * a if isinstance(a, int) and a > 0 else 0
+    return 0
+
+
+class ResourceLimitExceeded(RuntimeError):
+    """
+    A governed run went over one of its Limits: `limit` names it, `value`
+    is its setting and `counters` the usage when the run was stopped.
+    """
+    def __init__(self, limit, value, counters):
+        self.limit = limit
+        self.value = value
+        self.counters = counters
+        usage = ", ".join(f"{name}={count}" for name, count in counters.items())
+        super().__init__(f"{limit}={value} exceeded ({usage})")
+
+
+class GovernedOutput:
+    """The sink a governed run writes to: counts and checks each line, then passes it on."""
+    def __init__(self, governor):
+        self.governor = governor
+        self.lines = []
+        self.target = self.lines.append
+        self.count = 0
+        self.size = 0
+
+    def reset(self, sink):
+        self.lines = [] if sink is None else sink
+        self.target = self.lines.append
+        self.count = 0
+        self.size = 0
+
+    def append(self, line):
+        length = len(line)
+        self.count += 1
+        self.size += (length if line.isascii() else len(line.encode("utf-8"))) + 1
+        governor = self.governor
+        if length > governor.max_string or self.count > governor.max_output_lines \
+                or self.size > governor.max_output_bytes:
+            if length > governor.max_string:
+                raise governor.exceeded("max_string")
+            if self.count > governor.max_output_lines:
+                raise governor.exceeded("max_output_lines")
+            raise governor.exceeded("max_output_bytes")
+        self.target(line)
+
+
+class Governor:
+    """
+    Enforces Limits on the runs of one program.
+
+    It takes the place of core.tiering.HotLoops on the engines' backward
+    jumps, so straight-line code pays nothing: each jump back to a loop
+    header charges the loop's length as fuel, checks the operand stack
+    depth and every DEADLINE_CHECK_EVERY jumps the clock, and then hands
+    over to `loops` (a metered HotLoops) if the run is tiered. A compiled
+    loop gets the fuel left as a budget of iterations, at most
+    COMPILED_SLICE at a time, and reports back what it used.
+    Output goes through `output`, a GovernedOutput.
+    """
+    def __init__(self, program, loops=None):
+        self.program = program
+        self.loops = loops
+        self.lengths = {}
+        for pc, (op, arg) in enumerate(zip(program.ops, program.args)):
+            if op in JUMP_OPS and arg <= pc:
+                self.lengths[arg] = max(self.lengths.get(arg, 0), pc - arg + 1)
+        self.output = GovernedOutput(self)
+        self.start(Limits(), [], None)
+
+    def start(self, limits, stack, sink, sleep=time.sleep):
+        """
+        Reset the counters for a run under `limits` whose operand stack is
+        `stack`. Returns the output sink for the engine to write to, which
+        passes the lines on to `sink` (a list of its own when None).
+        PAUSE should go through Governor.sleep, which sleeps with `sleep`.
+        """
+        self.limits = limits
+        self.clock_sleep = sleep
+        self.max_instructions = UNLIMITED if limits.max_instructions is None else limits.max_instructions
+        self.max_stack = UNLIMITED if limits.max_stack is None else limits.max_stack
+        self.max_string = UNLIMITED if limits.max_string is None else limits.max_string
+        self.max_output_lines = UNLIMITED if limits.max_output_lines is None else limits.max_output_lines
+        self.max_output_bytes = UNLIMITED if limits.max_output_bytes is None else limits.max_output_bytes
+        self.stack = stack
+        self.instructions = 0
+        self.back_edges = 0
+        self.budget = 0
+        self.pc = 0
+        self.started = time.perf_counter()
+        self.deadline = float("inf") if limits.wall_time is None else self.started + limits.wall_time
+        self.output.reset(sink)
+        return self.output
+
+    def counters(self):
+        return {"pc": self.pc, "instructions": self.instructions, "stack": len(self.stack),
+                "output_lines": self.output.count, "output_bytes": self.output.size,
+                "elapsed": round(time.perf_counter() - self.started, 6)}
+
+    def exceeded(self, limit, pc=None):
+        """The error for going over `limit`, with the counters as they are now."""
+        if pc is not None:
+            self.pc = pc
+        value = self.limits.wall_time if limit == "wall_time" else getattr(self, limit)
+        return ResourceLimitExceeded(limit, value, self.counters())
+
+    def check_deadline(self):
+        if time.perf_counter() > self.deadline:
+            raise self.exceeded("wall_time")
+
+    def sleep(self, seconds):
+        """PAUSE on the run's clock; the deadline is checked as it returns."""
+        self.clock_sleep(seconds)
+        self.check_deadline()
+
+    def string(self, value):
+        """Check a value a compiled loop built by string concatenation."""
+        if isinstance(value, str) and len(value) > self.max_string:
+            raise self.exceeded("max_string")
+        return value
+
+    def repeat(self, a, b):
+        """`a * b` for a compiled loop, checked before a repeated string is built."""
+        if (isinstance(a, str) or isinstance(b, str)) and repeated_length(a, b) > self.max_string:
+            raise self.exceeded("max_string")
+        return a * b
+
+    def enter(self, header, frame, output):
+        """Called on a backward jump to `header`; returns the PC to continue interpreting at."""
+        self.pc = header
+        length = self.lengths[header]
+        self.instructions += length
+        if self.instructions > self.max_instructions:
+            raise self.exceeded("max_instructions")
+        if len(self.stack) > self.max_stack:
+            raise self.exceeded("max_stack")
+        self.back_edges += 1
+        if not self.back_edges % DEADLINE_CHECK_EVERY:
+            self.check_deadline()
+        if self.loops is None:
+            return header
+
+        granted = self.budget = min(COMPILED_SLICE, (self.max_instructions - self.instructions) // length)
+        pc = self.loops.enter(header, frame, output, self)
+        used = granted - self.budget
+        if used:
+            self.instructions += used * length
+            self.check_deadline()
+        return pc
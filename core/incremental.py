@@ -0,0 +1,123 @@
+from core.ast_nodes import Program, VarDeclaration, Update, InputCommand, IfStatement, WhileLoop
+from core.lexer import TokenStream, EOF, split_statements, tokenize
+from core.parser import Parser
+from core.semantic_analyzer import DependencyCollector, SemanticError
+
+
+class Chunk:
+    """One top-level statement of the buffer and everything derived from it so far."""
+    def __init__(self, text, tokens, start):
+        self.text = text
+        self.tokens = tokens        # without the trailing EOF
+        self.start = start          # where the statement was when it was lexed; token offsets count from there
+        self.statements = None      # set by IncrementalFrontEnd.parse
+        self.positioned = None      # the nodes of `statements` that have a position, and
+        self.placed = None          # where the statement was when their positions were last set
+        self.required = None        # set by IncrementalFrontEnd.analyze
+        self.declared = None
+
+
+def positioned_nodes(statements):
+    """Every statement in `statements`, nested blocks included, and the `listen` of a declaration."""
+    for stmt in statements:
+        yield stmt
+        if isinstance(stmt, (VarDeclaration, Update)):
+            if isinstance(stmt.value, InputCommand):
+                yield stmt.value
+        elif isinstance(stmt, IfStatement):
+            yield from positioned_nodes(stmt.then_block)
+            yield from positioned_nodes(stmt.else_block or ())
+        elif isinstance(stmt, WhileLoop):
+            yield from positioned_nodes(stmt.body)
+
+
+class IncrementalFrontEnd:
+    """
+    Lexer, parser and semantic analyzer for a buffer that is edited and
+    recompiled over and over, as in the editor.
+
+    The buffer is cut into top-level statements (see split_statements) and
+    each one keeps its tokens, its parsed statements and a summary of the
+    names it requires and declares (see DependencyCollector). A statement
+    whose text is unchanged since the previous call reuses all three, so
+    after an edit only the edited statements are re-lexed, re-parsed and
+    re-summarized; checking the summaries against the names declared before
+    each statement is a few set lookups per statement. The statements of a
+    reused chunk that has moved get their source positions shifted in place,
+    so an AST returned by parse() changes with later calls: copy it to keep
+    it.
+
+    tokenize(), parse() and analyze() are run in that order for each new
+    buffer and produce the same tokens, AST and errors as running tokenize,
+    Parser and SemanticAnalyzer on the whole buffer.
+    """
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self.chunks = []
+        self.starts = []
+        self.reusable = []
+        self.stats = {"statements": 0, "relexed": 0, "reparsed": 0, "rechecked": 0}
+
+    def tokenize(self, source):
+        previous = {}
+        for chunk in reversed(self.reusable):
+            previous.setdefault(chunk.text, []).append(chunk)
+        self.stats = {"statements": 0, "relexed": 0, "reparsed": 0, "rechecked": 0}
+        chunks = []
+        try:
+            for start, end in split_statements(source):
+                text = source[start:end]
+                candidates = previous.get(text)
+                if candidates:
+                    chunk = candidates.pop()
+                else:
+                    chunk = Chunk(text, tokenize(source, self.tracer, start, end)[:-1], start)
+                    self.stats["relexed"] += 1
+                chunks.append((chunk, start))
+        except RuntimeError:
+            # Keep what was lexed so that fixing the error does not cost a full re-lex
+            self.chunks = []
+            self.starts = []
+            self.reusable = [chunk for chunk, start in chunks]
+            self.reusable.extend(chunk for candidates in previous.values() for chunk in candidates)
+            raise
+        tokens = TokenStream()
+        for chunk, start in chunks:
+            tokens.extend(chunk.tokens, start - chunk.start)
+        tokens.append(EOF, None, len(source))
+        self.chunks = self.reusable = [chunk for chunk, start in chunks]
+        self.starts = [start for chunk, start in chunks]
+        self.stats["statements"] = len(chunks)
+        return tokens
+
+    def parse(self):
+        statements = []
+        for chunk, start in zip(self.chunks, self.starts):
+            if chunk.statements is None:
+                chunk.statements = Parser(chunk.tokens, self.tracer).parse().statements
+                chunk.positioned = list(positioned_nodes(chunk.statements))
+                chunk.placed = chunk.start
+                self.stats["reparsed"] += 1
+            if chunk.placed != start:
+                # The statement moved since it was parsed: so did its positions
+                shift = start - chunk.placed
+                for node in chunk.positioned:
+                    node.pos += shift
+                chunk.placed = start
+            statements.extend(chunk.statements)
+        return Program(statements)
+
+    def analyze(self):
+        declared = set()
+        for chunk in self.chunks:
+            if chunk.required is None:
+                collector = DependencyCollector()
+                for stmt in chunk.statements:
+                    collector.analyze(stmt)
+                chunk.required = collector.required
+                chunk.declared = collector.symbol_table
+                self.stats["rechecked"] += 1
+            for name in chunk.required:
+                if name not in declared:
+                    raise SemanticError(f"Variable {name} not declared")
+            declared |= chunk.declared
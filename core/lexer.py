@@ -1,4 +1,10 @@
 import re
+import sys
+from array import array
+from itertools import repeat
+from operator import add
+
+from core.trace import get_tracer, INFO
 
 KEYWORDS = {
     "remember", "update", "think", "while", "spiral", "feel", "otherwise",
@@ -6,113 +12,275 @@ KEYWORDS = {
     "sleep", "listen"
 }
 
-def tokenize(code):
-    print("Lexer: Starting tokenization")
-    token_spec = [
-        ('NUMBER',     r'\d+'),
-        ('STRING',     r'"[^"\n]*"'),
-        ('OP',         r'==|!=|<=|>=|[+\-*/<>]'),
-        ('ASSIGN',     r'='),
-        ('RANGE',      r'\.\.'),
-        ('IDENT',      r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'),
-        ('NEWLINE',    r'\n'),
-        ('SKIP',       r'[ \t]+'),
-        ('COMMENT',    r'#.*|//.*'),
-        ('MISMATCH',   r'.'),
-    ]
-
-    tok_regex = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in token_spec)
-    get_token = re.compile(tok_regex).match
-
-    pos = 0
-    tokens = []
+# Token kinds, as stored in TokenStream.kinds
+NUMBER = 0
+STRING = 1
+OP = 2
+ASSIGN = 3
+RANGE = 4
+IDENT = 5
+KEYWORD = 6
+NEWLINE = 7
+INDENT = 8
+DEDENT = 9
+EOF = 10
+
+KIND_NAMES = ("NUMBER", "STRING", "OP", "ASSIGN", "RANGE", "IDENT", "KEYWORD", "NEWLINE", "INDENT", "DEDENT", "EOF")
+KIND_CODES = {name: code for code, name in enumerate(KIND_NAMES)}
+
+TOKEN_SPEC = [
+    ('NUMBER',     r'\d+'),
+    ('STRING',     r'"[^"\n]*"'),
+    ('OP',         r'==|!=|<=|>=|[+\-*/<>]'),
+    ('ASSIGN',     r'='),
+    ('RANGE',      r'\.\.'),
+    ('IDENT',      r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'),
+    ('NEWLINE',    r'\n'),
+    ('SKIP',       r'[ \t]+'),
+    ('COMMENT',    r'#.*|//.*'),
+    ('MISMATCH',   r'.'),
+]
+# Tokens up to IDENT also swallow the blanks that follow them, so SKIP only
+# ever matches the indentation at the start of a line and the scan loop
+# runs once per token rather than once per token and gap.
+TRAILING_BLANKS = 6
+TOKEN_REGEX = re.compile(
+    "(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPEC[:TRAILING_BLANKS]) + r")[ \t]*|"
+    + "|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPEC[TRAILING_BLANKS:]))
+
+# Every character matches some alternative (MISMATCH catches the rest), so
+# finditer walks the input without gaps and match.lastindex says which
+# alternative matched: the 1-based position of its entry in TOKEN_SPEC.
+SPEC_NAMES = (None,) + tuple(name for name, pattern in TOKEN_SPEC)
+(M_NUMBER, M_STRING, M_OP, M_ASSIGN, M_RANGE, M_IDENT, M_NEWLINE, M_SKIP, M_COMMENT,
+ M_MISMATCH) = range(1, len(TOKEN_SPEC) + 1)
+
+# A top-level statement starts on a line whose first character begins an
+# identifier. The lexer closes every open block there, so its indentation
+# stack is back to [0] and lexing can restart from scratch at that line.
+# `otherwise` is excluded: it continues the `feel` above it.
+STATEMENT_START = re.compile(r"^(?!otherwise\b)[A-Za-z_]", re.MULTILINE)
+
+# Characters tokenize_file reads from its file per call
+CHUNK_SIZE = 1 << 16
+
+# Keyword values are shared string objects, so comparing them is an identity check
+KEYWORD_VALUES = {keyword: sys.intern(keyword) for keyword in KEYWORDS}
+
+
+class TokenStream:
+    """
+    Tokens stored as parallel arrays instead of one tuple per token:
+    `kinds` holds kind codes (uint8), `values` the token values and
+    `offsets` (uint32) the source position each token was produced at.
+
+    Indexing and iteration still yield (kind name, value) tuples, so a
+    stream prints and compares like the token list it replaces, while the
+    Parser reads the arrays directly.
+    """
+    def __init__(self, kinds=None, values=None, offsets=None):
+        self.kinds = kinds if kinds is not None else array("B")
+        self.values = values if values is not None else []
+        self.offsets = offsets if offsets is not None else array("I")
+
+    @classmethod
+    def from_tuples(cls, tokens):
+        stream = cls()
+        for kind, value in tokens:
+            stream.append(KIND_CODES[kind], value, 0)
+        return stream
+
+    def append(self, kind, value, offset):
+        self.kinds.append(kind)
+        self.values.append(value)
+        self.offsets.append(offset)
+
+    def extend(self, other, shift=0):
+        """Append every token of `other`, moving its offsets `shift` characters on."""
+        self.kinds.extend(other.kinds)
+        self.values.extend(other.values)
+        if shift:
+            self.offsets.extend(map(add, other.offsets, repeat(shift)))
+        else:
+            self.offsets.extend(other.offsets)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TokenStream(self.kinds[index], self.values[index], self.offsets[index])
+        return (KIND_NAMES[self.kinds[index]], self.values[index])
+
+    def __iter__(self):
+        return zip(map(KIND_NAMES.__getitem__, self.kinds), self.values)
+
+    def __eq__(self, other):
+        if isinstance(other, TokenStream):
+            return self.kinds == other.kinds and self.values == other.values
+        return list(self) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def split_statements(source):
+    """(start, end) offsets of the top-level statements of `source`, each with the blank or comment lines after it."""
+    starts = [match.start() for match in STATEMENT_START.finditer(source)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    ends = starts[1:] + [len(source)]
+    return [(start, end) for start, end in zip(starts, ends) if start < end]
+
+
+def tokenize(code, tracer=None, start=0, end=None, base=0):
+    """
+    Split `code` into a TokenStream. Only code[start:end] is scanned, so a
+    caller can re-lex part of a buffer without copying it; error positions
+    and token offsets are still offsets into the whole buffer, plus `base`
+    when the buffer itself starts `base` characters into the source.
+    """
+    tracer = tracer or get_tracer()
+    trace = tracer.channel("lexer")
+    info = tracer.channel("lexer", INFO)
+    end = len(code) if end is None else end
+
+    tokens = TokenStream()
+    kinds = tokens.kinds
+    push_kind = kinds.append
+    push_value = tokens.values.append
+    push_offset = tokens.offsets.append
+    intern = sys.intern
+    keyword_value = KEYWORD_VALUES.get
     indent_stack = [0]  # Stack to track indentation levels, starting at 0
     line_start = True
-    expecting_block = False  # Flag to track if we're expecting an indented block (e.g., after 'feel' or 'otherwise')
-
-    print(f"Lexer: Input code length = {len(code)}")
-    while pos < len(code):
-        match = get_token(code, pos)
-        if not match:
-            raise RuntimeError(f'Illegal character at {pos}')
-        kind = match.lastgroup
-        value = match.group()
-
-        print(f"Lexer: Found token - {kind}: {value}")
-        if kind == 'NEWLINE':
-            tokens.append(('NEWLINE', '\n'))
-            line_start = True
-            expecting_block = False  # Reset after a newline unless a block starter was just seen
-        elif kind == 'SKIP':
+
+    if info: info(f"Starting tokenization, input code length = {end - start}")
+    for match in TOKEN_REGEX.finditer(code, start, end):
+        group = match.lastindex
+        pos = match.start()
+        if trace: trace(f"Found token - {SPEC_NAMES[group]}: {match.group(group)}")
+
+        if group == M_SKIP:
             if line_start:
-                indent_level = len(value) // 4  # Assume 4 spaces per indent level
+                indent_level = (match.end() - pos) // 4  # Assume 4 spaces per indent level
                 current_indent = indent_stack[-1]
 
                 if indent_level > current_indent:
                     indent_stack.append(indent_level)
-                    tokens.append(('INDENT', indent_level))
-                    print(f"Lexer: Added INDENT token, level {indent_level}")
+                    push_kind(INDENT)
+                    push_value(indent_level)
+                    push_offset(pos)
+                    if trace: trace(f"Added INDENT token, level {indent_level}")
                 elif indent_level < current_indent:
                     while indent_level < indent_stack[-1]:
                         indent_stack.pop()
-                        tokens.append(('DEDENT', indent_stack[-1]))
-                        print(f"Lexer: Added DEDENT token, level {indent_stack[-1]}")
+                        push_kind(DEDENT)
+                        push_value(indent_stack[-1])
+                        push_offset(pos)
+                        if trace: trace(f"Added DEDENT token, level {indent_stack[-1]}")
                     if indent_level != indent_stack[-1]:
-                        raise RuntimeError(f'Inconsistent indentation at position {pos}')
-            line_start = False
-        elif kind == 'COMMENT':
-            pass
-        elif kind == 'STRING':
-            tokens.append(('STRING', value.strip('"')))
-            line_start = False
-        elif kind == 'NUMBER':
-            tokens.append(('NUMBER', int(value)))
+                        raise RuntimeError(f'Inconsistent indentation at position {pos + base}')
             line_start = False
-        elif kind == 'IDENT':
-            # Check for dedent when we encounter a token at the start of a line with no indentation
-            if line_start and len(indent_stack) > 1:
-                # This token is at indentation level 0, so we need to dedent
+        elif group == M_IDENT:
+            value = match.group(group)
+            # A token at the start of a line with no indentation closes every open block.
+            # 'otherwise' closes the then block even when it is indented.
+            keyword = keyword_value(value)
+            if len(indent_stack) > 1 and (line_start or keyword == 'otherwise'):
                 while len(indent_stack) > 1:
                     indent_stack.pop()
-                    tokens.append(('DEDENT', indent_stack[-1]))
-                    print(f"Lexer: Added DEDENT for unindented token, level {indent_stack[-1]}")
-
-            if value in KEYWORDS:
-                tokens.append(('KEYWORD', value))
-                # If this keyword starts a block (e.g., 'feel', 'otherwise', 'think', 'while'), expect an indent
-                if value in {'feel', 'otherwise', 'think', 'while'}:
-                    expecting_block = True
-                # Special handling for 'otherwise' - force a DEDENT if we're in an indented block
-                if value == 'otherwise' and len(indent_stack) > 1:
-                    # Add DEDENT to close the then block
-                    while len(indent_stack) > 1:
-                        indent_stack.pop()
-                        tokens.insert(-1, ('DEDENT', indent_stack[-1]))  # Insert before the 'otherwise' token
-                        print(f"Lexer: Added DEDENT for 'otherwise', level {indent_stack[-1]}")
+                    push_kind(DEDENT)
+                    push_value(indent_stack[-1])
+                    push_offset(pos)
+                    if trace: trace(f"Added DEDENT before {value!r}, level {indent_stack[-1]}")
+            if keyword is not None:
+                push_kind(KEYWORD)
+                push_value(keyword)
             else:
-                tokens.append(('IDENT', value))
+                push_kind(IDENT)
+                push_value(intern(value))
+            push_offset(pos)
+            line_start = False
+        elif group == M_NEWLINE:
+            push_kind(NEWLINE)
+            push_value('\n')
+            push_offset(pos)
+            line_start = True
+        elif group == M_NUMBER:
+            push_kind(NUMBER)
+            push_value(int(match.group(group)))
+            push_offset(pos)
+            line_start = False
+        elif group == M_OP:
+            push_kind(OP)
+            push_value(intern(match.group(group)))
+            push_offset(pos)
+            line_start = False
+        elif group == M_STRING:
+            push_kind(STRING)
+            push_value(match.group(group)[1:-1])
+            push_offset(pos)
             line_start = False
-        elif kind == 'MISMATCH':
-            raise RuntimeError(f'Illegal character {value} at position {pos}')
+        elif group == M_COMMENT:
+            pass
+        elif group == M_MISMATCH:
+            raise RuntimeError(f'Illegal character {match.group()} at position {pos + base}')
         else:
-            tokens.append((kind, value))
+            push_kind(ASSIGN if group == M_ASSIGN else RANGE)
+            push_value(match.group(group))
+            push_offset(pos)
             line_start = False
 
-        pos = match.end()
-
     # Ensure a NEWLINE before final DEDENTs and EOF
-    if tokens and tokens[-1][0] != 'NEWLINE':
-        tokens.append(('NEWLINE', '\n'))
-        print("Lexer: Added final NEWLINE token")
+    if kinds and kinds[-1] != NEWLINE:
+        tokens.append(NEWLINE, '\n', end)
+        if trace: trace("Added final NEWLINE token")
 
     # Handle dedents at the end of the file
     while len(indent_stack) > 1:
         indent_stack.pop()
-        tokens.append(('DEDENT', indent_stack[-1]))
-        print(f"Lexer: Added final DEDENT token, level {indent_stack[-1]}")
+        tokens.append(DEDENT, indent_stack[-1], end)
+        if trace: trace(f"Added final DEDENT token, level {indent_stack[-1]}")
 
     # Always append an EOF token
-    tokens.append(('EOF', None))
-    print("Lexer: Added EOF token")
-    print(f"Lexer: Tokenization completed, tokens = {tokens}")
-    return tokens
\ No newline at end of file
+    tokens.append(EOF, None, end)
+    if base:
+        tokens.offsets = array("I", map(add, tokens.offsets, repeat(base)))
+    if trace: trace(f"Tokenization completed, tokens = {tokens}")
+    if info: info(f"Tokenization completed, {len(tokens)} tokens")
+    return tokens
+
+
+def tokenize_file(file, tracer=None, chunk_size=CHUNK_SIZE):
+    """
+    Lex a text file object a piece at a time, yielding one TokenStream per
+    run of complete top-level statements read so far (see STATEMENT_START).
+    Only the last stream ends with EOF; joined together the streams equal
+    tokenize() of the whole file, offsets included.
+
+    At most one chunk plus the top-level statement being read is held in
+    memory, however large the file.
+    """
+    buffer = ""
+    consumed = 0  # characters of the file before buffer[0]
+    scanned = 1   # statement starts before this position of buffer have been looked for
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            break
+        buffer += data
+        # Only whole lines are searched, so a start is never mistaken for a prefix of 'otherwise'
+        complete = buffer.rfind("\n") + 1
+        cut = 0
+        for match in STATEMENT_START.finditer(buffer, scanned, complete):
+            cut = match.start()
+        if cut:
+            yield tokenize(buffer, tracer, 0, cut, consumed)[:-1]
+            buffer = buffer[cut:]
+            consumed += cut
+            complete -= cut
+        scanned = max(complete, 1)
+    yield tokenize(buffer, tracer, base=consumed)
@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+
+from core.bytecode import (Bytecode, OPNAMES, CONSTANT_OPERAND_OPS, JUMP_OPS, NAME_OPS, OPERAND_OPS, PANIC,
+                           PUSH)
+
+# .nsc layout, all integers little-endian, every section 4-byte aligned:
+#
+#   header        MAGIC, format version, opcode count, SHA-256 of the source,
+#                 instruction/constant/name counts, global slot count,
+#                 jump table and operand counts and the byte offset of each section
+#   args          int32[instructions]
+#   source map    uint32[instructions]
+#   positions     int32[instructions]: source offset of each instruction, -1 if unknown
+#   jump table    uint32[jumps]: sorted PCs that some jump lands on
+#   operands      int32[operands]: Bytecode.operands of the superinstructions
+#   ops           uint8[instructions]
+#   constants     per constant: tag byte + payload
+#   names         per slot: uint32 length + UTF-8
+MAGIC = b"NSC\x00"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<4sHH32s6I7I")
+
+CONST_INT = 0
+CONST_BIGINT = 1  # outside int64, stored as decimal text
+CONST_FLOAT = 2
+CONST_STR = 3
+
+
+class NSCFormatError(ValueError):
+    pass
+
+
+def source_hash(source):
+    return hashlib.sha256(source.encode("utf-8")).digest()
+
+
+def _align(buffer):
+    buffer.extend(b"\0" * (-len(buffer) % 4))
+
+
+def _le(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def dumps(program, source=None):
+    """Serialize an assembled Bytecode program to .nsc bytes."""
+    n = len(program.ops)
+    jump_targets = sorted({program.args[pc] for pc in range(n) if program.ops[pc] in JUMP_OPS})
+
+    body = bytearray()
+    offsets = []
+    sections = (array("i", program.args), array("I", program.source_map), array("i", program.positions),
+                array("I", jump_targets), array("i", program.operands))
+    for section in sections:
+        offsets.append(HEADER.size + len(body))
+        body += _le(section)
+    offsets.append(HEADER.size + len(body))
+    body += bytes(program.ops)
+    _align(body)
+
+    offsets.append(HEADER.size + len(body))
+    for value in program.constants:
+        if isinstance(value, str):
+            data = value.encode("utf-8")
+            body += struct.pack("<BI", CONST_STR, len(data)) + data
+        elif isinstance(value, float):
+            body += struct.pack("<Bd", CONST_FLOAT, value)
+        elif -2**63 <= value < 2**63:
+            body += struct.pack("<Bq", CONST_INT, value)
+        else:
+            data = str(value).encode("ascii")
+            body += struct.pack("<BI", CONST_BIGINT, len(data)) + data
+    for name in program.names:
+        data = name.encode("utf-8")
+        body += struct.pack("<I", len(data)) + data
+
+    digest = source_hash(source) if source is not None else b"\0" * 32
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(OPNAMES), digest, n, len(program.constants),
+                         len(program.names), program.global_count, len(jump_targets), len(program.operands),
+                         *offsets)
+    return header + bytes(body)
+
+
+def save(program, path, source=None):
+    with open(path, "wb") as f:
+        f.write(dumps(program, source))
+
+
+def loads(data, expected_source=None):
+    """
+    Build a Bytecode program over `data` (bytes, bytearray or an mmap).
+
+    The opcode, argument, source map, position and operand arrays are memoryviews into `data`,
+    so nothing is copied; only the constant pool and name table are decoded.
+    """
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise NSCFormatError("File too short for an .nsc header")
+    (magic, version, opcode_count, digest, n, n_constants, n_names, global_count, n_jumps, n_operands,
+     args_at, map_at, positions_at, jumps_at, operands_at, ops_at, pool_at) = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise NSCFormatError("Not an .nsc file")
+    if version != FORMAT_VERSION:
+        raise NSCFormatError(f"Unsupported .nsc format version {version}")
+    if opcode_count > len(OPNAMES):
+        raise NSCFormatError("File uses opcodes this VM does not know")
+    if expected_source is not None and digest != source_hash(expected_source):
+        raise NSCFormatError("Compiled program is stale: source hash does not match")
+
+    def ints(offset, count, typecode):
+        if sys.byteorder == "little":
+            return view[offset:offset + 4 * count].cast(typecode)
+        values = array(typecode, view[offset:offset + 4 * count])
+        values.byteswap()
+        return values
+
+    ops = view[ops_at:ops_at + n]
+    args = ints(args_at, n, "i")
+    source_map = ints(map_at, n, "I")
+    positions = ints(positions_at, n, "i")
+    jump_targets = set(ints(jumps_at, n_jumps, "I"))
+    operands = ints(operands_at, n_operands, "i")
+    if (len(ops) != n or len(args) != n or len(source_map) != n or len(positions) != n
+            or len(operands) != n_operands):
+        raise NSCFormatError("Truncated instruction stream")
+
+    constants = []
+    pos = pool_at
+    try:
+        for _ in range(n_constants):
+            tag = view[pos]
+            if tag == CONST_INT:
+                constants.append(struct.unpack_from("<q", view, pos + 1)[0])
+                pos += 9
+            elif tag == CONST_FLOAT:
+                constants.append(struct.unpack_from("<d", view, pos + 1)[0])
+                pos += 9
+            elif tag in (CONST_STR, CONST_BIGINT):
+                size = struct.unpack_from("<I", view, pos + 1)[0]
+                text = bytes(view[pos + 5:pos + 5 + size]).decode("utf-8")
+                constants.append(text if tag == CONST_STR else int(text))
+                pos += 5 + size
+            else:
+                raise NSCFormatError(f"Unknown constant tag {tag}")
+        names = []
+        for _ in range(n_names):
+            size = struct.unpack_from("<I", view, pos)[0]
+            names.append(bytes(view[pos + 4:pos + 4 + size]).decode("utf-8"))
+            pos += 4 + size
+    except (struct.error, IndexError):
+        raise NSCFormatError("Truncated constant pool or name table") from None
+
+    if any(target > n for target in jump_targets):
+        raise NSCFormatError("Jump table lands outside the instruction stream")
+    for pc in range(n):
+        op = ops[pc]
+        arg = args[pc]
+        if op >= opcode_count:
+            raise NSCFormatError(f"Unknown opcode {op} at PC {pc}")
+        if op in JUMP_OPS and arg not in jump_targets:
+            raise NSCFormatError(f"Jump at PC {pc} is missing from the jump table")
+        if (op == PUSH or op == PANIC) and not 0 <= arg < n_constants:
+            raise NSCFormatError(f"Constant of PC {pc} is outside the constant pool")
+        if op in NAME_OPS and not 0 <= arg < n_names:
+            raise NSCFormatError(f"Slot of PC {pc} is outside the frame")
+        if op in OPERAND_OPS:
+            if not 0 <= arg < n_operands - 1:
+                raise NSCFormatError(f"Operands of PC {pc} are outside the operand table")
+            second_limit = n_constants if op in CONSTANT_OPERAND_OPS else n_names
+            if not (0 <= operands[arg] < n_names and 0 <= operands[arg + 1] < second_limit):
+                raise NSCFormatError(f"Operands of PC {pc} are outside the frame or constant pool")
+    return Bytecode(ops, args, constants, names, global_count, source_map, operands, positions)
+
+
+def load(path, expected_source=None):
+    """Memory-map an .nsc file and return a Bytecode program executing straight from the mapping."""
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    program = loads(mapping, expected_source)
+    program.mapping = mapping  # keeps the mapping alive as long as the program
+    return program
+
+
+def main(argv=None):
+    from core.parallel import compile_parallel
+    from core.vm import VirtualMachine
+
+    parser = argparse.ArgumentParser(description="Compile NeuroScript to .nsc or run a compiled program")
+    parser.add_argument("path", help="a .ns source file to compile, or an .nsc file with --run")
+    parser.add_argument("-o", "--output", help="output path (default: source path with .nsc suffix)")
+    parser.add_argument("-O", "--opt-level", type=int, default=1)
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="compile large sources with this many processes")
+    parser.add_argument("--run", action="store_true", help="execute an .nsc file")
+    parser.add_argument("--input", action="append", default=[], help="value for the next listen (repeatable)")
+    options = parser.parse_args(argv)
+
+    if options.run:
+        print(VirtualMachine().run(load(options.path), options.input))
+        return
+    with open(options.path, encoding="utf-8") as f:
+        source = f.read()
+    output = options.output or (options.path.rsplit(".", 1)[0] + ".nsc")
+    save(compile_parallel(source, options.opt_level, workers=options.jobs).bytecode, output, source)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
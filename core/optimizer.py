@@ -0,0 +1,177 @@
+import math
+
+from core.ast_nodes import (Program, VarDeclaration, Update, PrintCommand, Panic, Sleep,
+                           InputCommand, IfStatement, WhileLoop, BinaryOperation, Literal, Variable)
+
+COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def is_number(value):
+    return isinstance(value, (int, float))
+
+
+def fold(op, a, b):
+    """
+    Evaluate `a op b` the way the VM would, or return None when the result
+    must be left to run time (errors such as division by zero or ordering a
+    string against a number, and results we do not want to materialise).
+    """
+    if op == "+":
+        if isinstance(a, str) or isinstance(b, str):
+            return str(a) + str(b)
+        result = a + b
+    elif not (is_number(a) and is_number(b)):
+        # Mixed or string operands: only equality is well defined
+        if op in ("==", "!=") and type(a) is not type(b):
+            return 1 if COMPARISONS[op](a, b) else 0
+        if op in COMPARISONS and isinstance(a, str) and isinstance(b, str):
+            return 1 if COMPARISONS[op](a, b) else 0
+        return None
+    elif op == "-":
+        result = a - b
+    elif op == "*":
+        result = a * b
+    elif op == "/":
+        if b == 0:
+            return None
+        result = a / b
+    elif op in COMPARISONS:
+        return 1 if COMPARISONS[op](a, b) else 0
+    else:
+        return None
+    if isinstance(result, float) and not math.isfinite(result):
+        return None
+    return result
+
+
+def terminates(stmt):
+    """True when control never continues past `stmt`."""
+    if isinstance(stmt, (Sleep, Panic)):
+        return True
+    if isinstance(stmt, IfStatement) and stmt.else_block:
+        return ends_block(stmt.then_block) and ends_block(stmt.else_block)
+    return False
+
+
+def ends_block(statements):
+    return bool(statements) and terminates(statements[-1])
+
+
+def assigned_names(statements):
+    names = set()
+    for stmt in statements:
+        if isinstance(stmt, (VarDeclaration, Update)):
+            names.add(stmt.name)
+            if isinstance(stmt.value, InputCommand):
+                names.add(stmt.value.var)
+        elif isinstance(stmt, InputCommand):
+            names.add(stmt.var)
+        elif isinstance(stmt, IfStatement):
+            names |= assigned_names(stmt.then_block)
+            names |= assigned_names(stmt.else_block or [])
+        elif isinstance(stmt, WhileLoop):
+            names |= assigned_names(stmt.body)
+    return names
+
+
+class Optimizer:
+    """
+    AST-level optimization pass, run after semantic analysis:
+
+    - folds constant arithmetic, comparisons and string concatenation,
+    - propagates variables whose value is a known constant on every path,
+    - prunes `feel` branches and `think while` loops with constant conditions,
+    - drops statements that follow `sleep` or `panic` in the same block.
+
+    Anything that would fail at run time (division by zero, type errors) is
+    left in place so the VM still reports it.
+    """
+    def __init__(self):
+        self.constants = {}
+
+    def optimize(self, program):
+        self.constants = {}
+        return Program(self.block(program.statements))
+
+    def block(self, statements):
+        result = []
+        for stmt in statements:
+            result.extend(self.statement(stmt))
+            if ends_block(result):
+                break
+        return result
+
+    def statement(self, node):
+        if isinstance(node, (VarDeclaration, Update)):
+            if isinstance(node.value, InputCommand):
+                self.constants.pop(node.value.var, None)
+                self.constants.pop(node.name, None)
+                return [node]
+            value = self.expression(node.value)
+            if isinstance(value, Literal):
+                self.constants[node.name] = value.value
+            else:
+                self.constants.pop(node.name, None)
+            return [type(node)(node.name, value, node.pos)]
+        elif isinstance(node, PrintCommand):
+            return [PrintCommand(node.command, self.expression(node.expression), node.pos)]
+        elif isinstance(node, InputCommand):
+            self.constants.pop(node.var, None)
+            return [node]
+        elif isinstance(node, IfStatement):
+            condition = self.expression(node.condition)
+            if isinstance(condition, Literal):
+                # Same test as JZ: only a value equal to 0 takes the else branch
+                taken = node.else_block if condition.value == 0 else node.then_block
+                return self.block(taken or [])
+            before = dict(self.constants)
+            then_block = self.block(node.then_block)
+            after_then = self.constants
+            self.constants = dict(before)
+            else_block = self.block(node.else_block) if node.else_block else None
+            self.constants = self.merge(after_then, self.constants, ends_block(then_block),
+                                        ends_block(else_block or []))
+            return [IfStatement(condition, then_block, else_block, node.pos)]
+        elif isinstance(node, WhileLoop):
+            # Anything the body assigns is unknown at the top of every iteration
+            for name in assigned_names(node.body):
+                self.constants.pop(name, None)
+            condition = self.expression(node.condition)
+            if isinstance(condition, Literal) and condition.value == 0:
+                return []
+            before = dict(self.constants)
+            body = self.block(node.body)
+            self.constants = before
+            return [WhileLoop(condition, body, node.spiral, node.pos)]
+        return [node]
+
+    def merge(self, left, right, left_ends, right_ends):
+        # A branch that ends the program contributes nothing to what follows
+        if left_ends:
+            return right
+        if right_ends:
+            return left
+        return {name: value for name, value in left.items()
+                if name in right and type(right[name]) is type(value) and right[name] == value}
+
+    def expression(self, node):
+        if isinstance(node, Variable):
+            if node.name in self.constants:
+                return Literal(self.constants[node.name])
+            return node
+        elif isinstance(node, BinaryOperation):
+            left = self.expression(node.left)
+            right = self.expression(node.right)
+            if isinstance(left, Literal) and isinstance(right, Literal):
+                value = fold(node.op, left.value, right.value)
+                if value is not None:
+                    return Literal(value)
+            return BinaryOperation(left, node.op, right)
+        return node
@@ -0,0 +1,171 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from core.ast_nodes import Program
+from core.lexer import split_statements, tokenize
+from core.parser import Parser
+from core.semantic_analyzer import DependencyCollector, SemanticError, infer_types
+from core.optimizer import Optimizer
+from core.tac_generator import TACGenerator
+from core.code_generator import CodeGenerator
+from core.bytecode import assemble
+from core.compiler import OPT_LEVELS, CompiledProgram, compile_source, optimize_stack_code
+
+# Sources shorter than this are not worth shipping to other processes
+MIN_PIECE_SIZE = 64 * 1024
+
+# Pieces per worker: more than one evens out pieces that compile slower than others
+PIECES_PER_WORKER = 4
+
+# Temporaries of a piece are spelled with this prefix until they are renumbered;
+# no NeuroScript identifier can start with it, so user variables are never touched.
+PIECE_TEMP = "%"
+
+LABEL_OPS = ("LABEL", "JMP", "JZ")
+
+
+class PieceTACGenerator(TACGenerator):
+    def new_temp(self):
+        temp = f"{PIECE_TEMP}{self.temp_count}"
+        self.temp_count += 1
+        return temp
+
+
+class PieceResult:
+    """What a worker sends back for one piece of the source."""
+    def __init__(self, lex_error=None, syntax_error=None, required=(), declared=(), statements=None,
+                 stack_code=None, positions=None, temp_count=0, label_count=0):
+        self.lex_error = lex_error
+        self.syntax_error = syntax_error
+        self.required = required
+        self.declared = declared
+        self.statements = statements
+        self.stack_code = stack_code
+        self.positions = positions
+        self.temp_count = temp_count
+        self.label_count = label_count
+
+
+def compile_piece(job):
+    """
+    Worker side: lex, parse and summarize one piece of the source, then
+    generate its stack code unless the statements themselves are wanted
+    back (for the AST optimizer). Errors are returned, not raised, so the
+    caller can report them in the same order as a sequential compile.
+    """
+    text, base, want_statements = job
+    try:
+        tokens = tokenize(text, base=base)
+    except RuntimeError as e:
+        return PieceResult(lex_error=e)
+    try:
+        statements = Parser(tokens).parse().statements
+    except SyntaxError as e:
+        return PieceResult(syntax_error=e)
+    collector = DependencyCollector()
+    for stmt in statements:
+        collector.analyze(stmt)
+    if want_statements:
+        return PieceResult(required=collector.required, declared=collector.symbol_table, statements=statements)
+    tac_gen = PieceTACGenerator()
+    generator = CodeGenerator()
+    stack_code = generator.generate(tac_gen.generate(Program(statements)))
+    return PieceResult(required=collector.required, declared=collector.symbol_table, stack_code=stack_code,
+                       positions=generator.positions, temp_count=tac_gen.temp_count,
+                       label_count=tac_gen.label_count)
+
+
+def relocate(stack_code, temp_base, label_base):
+    """Give a piece's temporaries and labels their final numbers: t<n + temp_base> and L<n + label_base>."""
+    result = []
+    for instr in stack_code:
+        opcode, _, arg = instr.partition(" ")
+        if arg.startswith(PIECE_TEMP):
+            instr = f"{opcode} t{int(arg[1:]) + temp_base}"
+        elif opcode in LABEL_OPS:
+            instr = f"{opcode} L{int(arg[1:]) + label_base}"
+        result.append(instr)
+    return result
+
+
+def split_pieces(source, count):
+    """Cut `source` at top-level statement boundaries into at most `count` pieces of similar size."""
+    target = max(len(source) // count, 1)
+    pieces = []
+    piece_start = 0
+    for start, end in split_statements(source):
+        if end - piece_start >= target:
+            pieces.append((piece_start, end))
+            piece_start = end
+    if piece_start < len(source):
+        pieces.append((piece_start, len(source)))
+    return pieces
+
+
+def compile_parallel(source, opt_level=0, workers=None, executor=None):
+    """
+    Compile `source` like compile_source, with the front end spread over a
+    process pool.
+
+    The source is cut at top-level statements (see split_statements), where
+    the lexer starts from a clean indentation stack, and every piece is
+    lexed, parsed and turned into stack code by a worker. Pieces number
+    their temporaries and labels from zero; they are renumbered here so
+    that nothing collides. Declaration order is then checked sequentially
+    from each piece's DependencyCollector summary, and errors are reported
+    exactly as compile_source would report them.
+
+    Type inference needs the whole program, so below opt_level 2 pieces
+    use the generic ADD. At opt_level 2 the AST optimizer needs the whole
+    program too, so workers only lex and parse and the rest, including
+    type-specialized code generation, runs here. Peephole optimization,
+    superinstruction fusion and assembly always run here. Pass an `executor` to reuse a pool across
+    calls; otherwise one with `workers` processes is started for the call.
+    The result carries no token, AST or TAC artifacts.
+    """
+    if opt_level not in OPT_LEVELS:
+        raise ValueError(f"Unknown optimization level: {opt_level}")
+    workers = workers or os.cpu_count() or 1
+    if len(source) < MIN_PIECE_SIZE or (executor is None and workers < 2):
+        return compile_source(source, opt_level).without_artifacts()
+
+    want_statements = opt_level >= 2
+    jobs = [(source[start:end], start, want_statements)
+            for start, end in split_pieces(source, workers * PIECES_PER_WORKER)]
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(compile_piece, jobs))
+    else:
+        results = list(executor.map(compile_piece, jobs))
+
+    # Same error precedence as a sequential compile: every lex error before any syntax error
+    for result in results:
+        if result.lex_error is not None:
+            raise result.lex_error
+    for result in results:
+        if result.syntax_error is not None:
+            raise result.syntax_error
+    declared = set()
+    for result in results:
+        for name in result.required:
+            if name not in declared:
+                raise SemanticError(f"Variable {name} not declared")
+        declared |= result.declared
+
+    if want_statements:
+        program = Optimizer().optimize(Program([stmt for result in results for stmt in result.statements]))
+        generator = CodeGenerator()
+        stack_code = generator.generate(TACGenerator(infer_types(program)).generate(program))
+        positions = generator.positions
+    else:
+        stack_code = []
+        positions = []
+        temp_base = 0
+        label_base = 0
+        for result in results:
+            stack_code.extend(relocate(result.stack_code, temp_base, label_base))
+            positions.extend(result.positions)
+            temp_base += result.temp_count
+            label_base += result.label_count
+    stack_code, positions, stats = optimize_stack_code(stack_code, opt_level, positions)
+    return CompiledProgram(source, opt_level, None, None, None, stack_code, assemble(stack_code, positions), stats)
@@ -1,13 +1,51 @@
 from core.ast_nodes import (Program, VarDeclaration, Update, PrintCommand, Panic, Pause, Sleep,
                            InputCommand, IfStatement, WhileLoop, BinaryOperation, Literal, Variable)
+from core.lexer import (TokenStream, tokenize_file, CHUNK_SIZE, KIND_NAMES, KIND_CODES, NUMBER, STRING, OP, IDENT,
+                        KEYWORD, NEWLINE, INDENT, DEDENT, EOF)
+from core.trace import get_tracer
+
+PRINT_COMMANDS = {"speak", "shout", "whisper", "laugh", "murmur"}
+
+# Tokens that may end a simple statement
+STATEMENT_END = (NEWLINE, DEDENT, EOF)
+
 
 class Parser:
-    def __init__(self, tokens):
+    """
+    Recursive-descent parser over a TokenStream (a plain list of
+    (kind, value) tuples is converted first). Tokens are read straight from
+    the stream's kind and value arrays; running past the end reads as EOF.
+    Every statement records the offset of its first token as its `pos`.
+    """
+    def __init__(self, tokens, tracer=None):
+        if not isinstance(tokens, TokenStream):
+            tokens = TokenStream.from_tuples(tokens)
         self.tokens = tokens
+        self.kinds = tokens.kinds
+        self.values = tokens.values
+        self.offsets = tokens.offsets
+        self.end = len(tokens.kinds)
         self.pos = 0
+        self.trace = (tracer or get_tracer()).channel("parser")
+
+    def kind(self):
+        if self.pos < self.end:
+            return self.kinds[self.pos]
+        return EOF
+
+    def value(self):
+        if self.pos < self.end:
+            return self.values[self.pos]
+        return None
+
+    def offset(self):
+        """Source offset of the current token, recorded on the statement it starts."""
+        if self.pos < self.end:
+            return self.offsets[self.pos]
+        return None
 
     def current_token(self):
-        if self.pos < len(self.tokens):
+        if self.pos < self.end:
             return self.tokens[self.pos]
         return ('EOF', None)
 
@@ -15,35 +53,44 @@ class Parser:
         self.pos += 1
 
     def expect(self, token_type, token_value=None):
-        token = self.current_token()
-        if token[0] != token_type or (token_value is not None and token[1] != token_value):
-            raise SyntaxError(f"Expected {token_type} {token_value or ''}, got {token}")
+        if self.kind() != KIND_CODES[token_type] or (token_value is not None and self.value() != token_value):
+            raise SyntaxError(f"Expected {token_type} {token_value or ''}, got {self.current_token()}")
+        value = self.values[self.pos]
         self.advance()
-        return token
+        return value
+
+    def end_statement(self):
+        if self.kind() in STATEMENT_END:
+            self.advance()
+        else:
+            self.expect('NEWLINE')
 
     def parse(self):
+        return Program(list(self.statements()))
+
+    def statements(self):
+        """Yield the top-level statements one at a time, each as soon as it has been parsed."""
         self.pos = 0
-        program = Program([])
-        while self.pos < len(self.tokens):
-            token = self.current_token()
-            if token[0] == 'EOF':
+        while self.pos < self.end:
+            kind = self.kinds[self.pos]
+            if kind == EOF:
                 break
             # Skip DEDENT tokens at the top level (can happen at the end of the file)
-            if token[0] == 'DEDENT':
+            if kind == DEDENT:
                 self.advance()
                 continue
             stmt = self.parse_statement()
             if stmt:
-                program.statements.append(stmt)
-        return program
+                yield stmt
 
     def parse_statement(self):
-        token = self.current_token()
-        token_type, token_value = token
+        token_type = self.kind()
+        token_value = self.value()
+        offset = self.offset()
 
-        print(f"Current token: {token} at position {self.pos}")  # Debug with position
+        if self.trace: self.trace(f"Current token: {self.current_token()} at position {self.pos}")
 
-        if token_type == 'KEYWORD':
+        if token_type == KEYWORD:
             if token_value == 'remember':
                 return self.parse_variable_declaration()
             elif token_value == 'update':
@@ -52,224 +99,167 @@ class Parser:
                 return self.parse_while_loop()
             elif token_value == 'feel':
                 return self.parse_if_statement()
-            elif token_value == 'speak':
-                self.advance()
-                expr = self.parse_expression()
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return PrintCommand('speak', expr)
-            elif token_value == 'shout':
-                self.advance()
-                expr = self.parse_expression()
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return PrintCommand('shout', expr)
-            elif token_value == 'whisper':
-                self.advance()
-                expr = self.parse_expression()
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return PrintCommand('whisper', expr)
-            elif token_value == 'laugh':
-                self.advance()
-                expr = self.parse_expression()
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return PrintCommand('laugh', expr)
-            elif token_value == 'murmur':
+            elif token_value in PRINT_COMMANDS:
                 self.advance()
                 expr = self.parse_expression()
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return PrintCommand('murmur', expr)
+                self.end_statement()
+                return PrintCommand(token_value, expr, offset)
             elif token_value == 'panic':
                 self.advance()
-                message = self.expect('STRING')[1]
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return Panic(message)
+                message = self.expect('STRING')
+                self.end_statement()
+                return Panic(message, offset)
             elif token_value == 'pause':
                 self.advance()
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return Pause()
+                self.end_statement()
+                return Pause(offset)
             elif token_value == 'sleep':
                 self.advance()
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return Sleep()
+                self.end_statement()
+                return Sleep(offset)
             elif token_value == 'listen':
                 self.advance()
-                prompt = self.expect('STRING')[1]
-                var = self.expect('IDENT')[1]
-                if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                    self.advance()
-                else:
-                    self.expect('NEWLINE')
-                return InputCommand(prompt, var)
+                prompt = self.expect('STRING')
+                var = self.expect('IDENT')
+                self.end_statement()
+                return InputCommand(prompt, var, offset)
             elif token_value == 'otherwise':
                 raise SyntaxError(f"'otherwise' can only be used as part of an if statement")
-        elif token_type == 'NEWLINE':
-            self.advance()
-            return None
-        elif token_type == 'INDENT' or token_type == 'DEDENT':
+        elif token_type == NEWLINE or token_type == INDENT or token_type == DEDENT:
             self.advance()
             return None
 
-        raise SyntaxError(f"Unknown statement: {token_type} {token_value}")
+        raise SyntaxError(f"Unknown statement: {KIND_NAMES[token_type]} {token_value}")
 
     def parse_variable_declaration(self):
+        offset = self.offset()
         self.advance()  # Consume 'remember'
-        name = self.expect('IDENT')[1]
+        name = self.expect('IDENT')
         self.expect('ASSIGN')
         # Check if the right-hand side is a 'listen' command
-        if self.current_token()[0] == 'KEYWORD' and self.current_token()[1] == 'listen':
+        if self.kind() == KEYWORD and self.value() == 'listen':
             self.advance()  # Consume 'listen'
-            prompt = self.expect('STRING')[1]
-            if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-                self.advance()
-            else:
-                self.expect('NEWLINE')
-            return VarDeclaration(name, InputCommand(prompt, name))
+            prompt = self.expect('STRING')
+            self.end_statement()
+            return VarDeclaration(name, InputCommand(prompt, name, offset), offset)
         # Otherwise, parse as a regular expression
         value = self.parse_expression()
-        if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-            self.advance()
-        else:
-            self.expect('NEWLINE')
-        return VarDeclaration(name, value)
+        self.end_statement()
+        return VarDeclaration(name, value, offset)
 
     def parse_update(self):
+        offset = self.offset()
         self.advance()  # Consume 'update'
-        name = self.expect('IDENT')[1]
+        name = self.expect('IDENT')
         self.expect('ASSIGN')
         value = self.parse_expression()
-        if self.current_token()[0] in ('NEWLINE', 'DEDENT', 'EOF'):
-            self.advance()
-        else:
-            self.expect('NEWLINE')
-        return Update(name, value)
+        self.end_statement()
+        return Update(name, value, offset)
 
     def parse_while_loop(self):
+        offset = self.offset()
         self.advance()  # Consume 'think'
         spiral = False
-        if self.current_token()[1] == 'spiral':
+        if self.value() == 'spiral':
             spiral = True
             self.advance()
         self.expect('KEYWORD', 'while')
         condition = self.parse_expression()
         self.expect('NEWLINE')
         body = self.parse_block()
-        return WhileLoop(condition, body, spiral)
+        return WhileLoop(condition, body, spiral, offset)
 
     def parse_if_statement(self):
+        offset = self.offset()
         self.advance()  # Consume 'feel'
-        print(f"Parsing if statement, condition start at position {self.pos}")
+        if self.trace: self.trace(f"Parsing if statement, condition start at position {self.pos}")
         condition = self.parse_expression()
         self.expect('NEWLINE')
-        print(f"Parsing then block at position {self.pos}")
+        if self.trace: self.trace(f"Parsing then block at position {self.pos}")
         then_block = self.parse_block()
-        print(f"Finished then block at position {self.pos}, current token: {self.current_token()}")
+        if self.trace: self.trace(f"Finished then block at position {self.pos}, current token: {self.current_token()}")
         else_block = None
 
         # Skip any NEWLINE tokens before checking for 'otherwise'
-        while self.current_token()[0] == 'NEWLINE':
+        while self.kind() == NEWLINE:
             self.advance()
-            print(f"Skipped NEWLINE before 'otherwise', now at position {self.pos}, token: {self.current_token()}")
+            if self.trace: self.trace(f"Skipped NEWLINE before 'otherwise', now at position {self.pos}, token: {self.current_token()}")
 
         # Check for 'otherwise' and parse the else block
-        if self.current_token()[0] == 'KEYWORD' and self.current_token()[1] == 'otherwise':
+        if self.kind() == KEYWORD and self.value() == 'otherwise':
             self.advance()  # Consume 'otherwise'
-            print(f"Found 'otherwise' at position {self.pos}")
+            if self.trace: self.trace(f"Found 'otherwise' at position {self.pos}")
             self.expect('NEWLINE')
-            print(f"Parsing else block at position {self.pos}")
+            if self.trace: self.trace(f"Parsing else block at position {self.pos}")
             else_block = self.parse_block()
-            print(f"Finished else block at position {self.pos}, current token: {self.current_token()}")
+            if self.trace: self.trace(f"Finished else block at position {self.pos}, current token: {self.current_token()}")
 
         # Consume any trailing NEWLINE after the if-else construct
-        while self.current_token()[0] == 'NEWLINE':
+        while self.kind() == NEWLINE:
             self.advance()
-            print(f"Skipped trailing NEWLINE, now at position {self.pos}, token: {self.current_token()}")
+            if self.trace: self.trace(f"Skipped trailing NEWLINE, now at position {self.pos}, token: {self.current_token()}")
 
-        print(f"Finished if statement at position {self.pos}")
-        return IfStatement(condition, then_block, else_block)
+        if self.trace: self.trace(f"Finished if statement at position {self.pos}")
+        return IfStatement(condition, then_block, else_block, offset)
 
     def parse_block(self):
         statements = []
-        print(f"Starting parse_block at position {self.pos}, token: {self.current_token()}")
+        if self.trace: self.trace(f"Starting parse_block at position {self.pos}, token: {self.current_token()}")
 
-        # Check if we have an INDENT token
-        has_indent = self.current_token()[0] == 'INDENT'
-        if has_indent:
-            self.advance()  # Consume INDENT
-            print(f"Consumed INDENT, now at position {self.pos}")
-        else:
-            # If no INDENT, check if the next statement is indented (for else blocks)
-            # Look ahead to see if there are indented statements
-            if (self.current_token()[0] == 'KEYWORD' and
-                self.pos + 1 < len(self.tokens) and
-                self.tokens[self.pos + 1][0] == 'NEWLINE' and
-                self.pos + 2 < len(self.tokens) and
-                self.tokens[self.pos + 2][0] == 'SKIP'):
-                # This is likely an else block pattern, continue parsing
-                print("No INDENT found but continuing for potential else block")
-            else:
-                print("No INDENT found, returning empty block")
-                return statements
-
-        while self.current_token()[0] not in ('DEDENT', 'EOF'):
+        # A block is the run of statements between an INDENT and its DEDENT
+        if self.kind() != INDENT:
+            if self.trace: self.trace("No INDENT found, returning empty block")
+            return statements
+        self.advance()  # Consume INDENT
+        if self.trace: self.trace(f"Consumed INDENT, now at position {self.pos}")
+
+        while self.kind() not in (DEDENT, EOF):
             # Check for 'otherwise' keyword - this should end the then block
-            if self.current_token()[0] == 'KEYWORD' and self.current_token()[1] == 'otherwise':
-                print(f"Found 'otherwise' at position {self.pos}, ending then block")
+            if self.kind() == KEYWORD and self.value() == 'otherwise':
+                if self.trace: self.trace(f"Found 'otherwise' at position {self.pos}, ending then block")
                 break
             stmt = self.parse_statement()
             if stmt:
                 statements.append(stmt)
 
-        if self.current_token()[0] == 'DEDENT':
+        if self.kind() == DEDENT:
             self.advance()  # Consume DEDENT
-            print(f"Consumed DEDENT, now at position {self.pos}")
+            if self.trace: self.trace(f"Consumed DEDENT, now at position {self.pos}")
 
-        print(f"Finished parse_block at position {self.pos}, token: {self.current_token()}")
+        if self.trace: self.trace(f"Finished parse_block at position {self.pos}, token: {self.current_token()}")
         return statements
 
     def parse_expression(self):
         left = self.parse_term()
-        while self.current_token()[0] == 'OP':
-            op = self.current_token()[1]
+        while self.kind() == OP:
+            op = self.values[self.pos]
             self.advance()
             right = self.parse_term()
             left = BinaryOperation(left, op, right)
         return left
 
     def parse_term(self):
-        token = self.current_token()
-        token_type, token_value = token
+        token_type = self.kind()
+        token_value = self.value()
 
-        if token_type == 'NUMBER':
+        if token_type == NUMBER:
             self.advance()
             return Literal(int(token_value))
-        elif token_type == 'STRING':
+        elif token_type == STRING:
             self.advance()
             return Literal(token_value)
-        elif token_type == 'IDENT':
+        elif token_type == IDENT:
             self.advance()
             return Variable(token_value)
         else:
-            raise SyntaxError(f"Invalid term: {token_type} {token_value}")
\ No newline at end of file
+            raise SyntaxError(f"Invalid term: {KIND_NAMES[token_type]} {token_value}")
+
+
+def parse_file(file, tracer=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield the top-level statements of a NeuroScript text file object.
+    The file is lexed by tokenize_file and each of its token streams is
+    parsed and dropped before the next one is read.
+    """
+    for tokens in tokenize_file(file, tracer, chunk_size):
+        yield from Parser(tokens, tracer).statements()
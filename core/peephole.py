@@ -0,0 +1,180 @@
+from collections import Counter
+
+from core.bytecode import TEMP_NAME
+
+# Optimization levels understood by PeepholeOptimizer
+LEVEL_NONE = 0
+LEVEL_CLEANUP = 1    # redundant STORE/LOAD pairs, jumps to the next instruction, dead labels
+LEVEL_THREADING = 2  # + jump threading, label merging and unreachable code removal
+
+RULES = ("store_load", "jump_to_next", "dead_label", "threaded_jump", "unreachable")
+
+
+def split(instr):
+    parts = instr.split(maxsplit=1)
+    return parts[0], parts[1] if len(parts) > 1 else ""
+
+
+class PeepholeOptimizer:
+    """
+    Rewrites CodeGenerator output in place of a full optimizer:
+
+    - `STORE t / LOAD t` of a temporary read nowhere else is dropped, leaving
+      the value on the stack,
+    - a JMP to a label that immediately follows it is dropped,
+    - labels no jump refers to are dropped,
+    - (level 2) jumps to a label that is itself followed by a JMP are
+      retargeted to the final destination, runs of adjacent labels collapse
+      into one, and code after JMP/SLEEP/PANIC that no label leads to is
+      dropped.
+
+    Rules are applied until nothing changes. `removed` and `stats` report
+    what the last optimize() call did. Given the source `positions` of the
+    instructions (see CodeGenerator.positions), `positions` afterwards
+    holds those of the instructions that are left.
+    """
+    def __init__(self, level=LEVEL_THREADING):
+        self.level = level
+        self.removed = 0
+        self.stats = dict.fromkeys(RULES, 0)
+        self.positions = None
+
+    def optimize(self, instructions, positions=None):
+        code = list(instructions)
+        self.positions = list(positions) if positions is not None else [None] * len(code)
+        self.stats = dict.fromkeys(RULES, 0)
+        if self.level >= LEVEL_CLEANUP:
+            changed = True
+            while changed:
+                size = len(code)
+                code = self.remove_store_load(code)
+                if self.level >= LEVEL_THREADING:
+                    threaded = self.stats["threaded_jump"]
+                    code = self.thread_jumps(code)
+                    changed_targets = self.stats["threaded_jump"] != threaded
+                else:
+                    changed_targets = False
+                code = self.remove_jumps_to_next(code)
+                code = self.remove_dead_labels(code)
+                if self.level >= LEVEL_THREADING:
+                    code = self.remove_unreachable(code)
+                changed = len(code) != size or changed_targets
+        self.removed = len(instructions) - len(code)
+        if positions is None:
+            self.positions = None
+        return code
+
+    def keep(self, code, kept):
+        """The instructions of `code` at the indices `kept`; their positions follow them."""
+        positions = self.positions
+        self.positions = [positions[i] for i in kept]
+        return [code[i] for i in kept]
+
+    def remove_store_load(self, code):
+        loads = Counter(arg for opcode, arg in map(split, code) if opcode == "LOAD")
+        stores = Counter(arg for opcode, arg in map(split, code) if opcode == "STORE")
+        kept = []
+        i = 0
+        while i < len(code):
+            opcode, arg = split(code[i])
+            if (opcode == "STORE" and i + 1 < len(code) and code[i + 1] == f"LOAD {arg}"
+                    and TEMP_NAME.fullmatch(arg) and loads[arg] == 1 and stores[arg] == 1):
+                self.stats["store_load"] += 2
+                i += 2
+                continue
+            kept.append(i)
+            i += 1
+        return self.keep(code, kept)
+
+    def label_runs(self, code):
+        """Map every label to the labels that share its position (its run of adjacent LABELs)."""
+        runs = {}
+        run = []
+        for instr in code + [""]:
+            opcode, arg = split(instr) if instr else ("", "")
+            if opcode == "LABEL":
+                run.append(arg)
+                continue
+            for label in run:
+                runs[label] = run
+            run = []
+        return runs
+
+    def thread_jumps(self, code):
+        runs = self.label_runs(code)
+        position = {}
+        for i, instr in enumerate(code):
+            opcode, arg = split(instr)
+            if opcode == "LABEL":
+                position[arg] = i
+
+        def first_instruction(label):
+            i = position[label]
+            while i < len(code) and code[i].startswith("LABEL "):
+                i += 1
+            return code[i] if i < len(code) else None
+
+        result = []
+        for instr in code:
+            opcode, label = split(instr)
+            if opcode in ("JMP", "JZ") and label in runs:
+                chain = [label]
+                target = first_instruction(label)
+                while target is not None and target.startswith("JMP "):
+                    next_label = split(target)[1]
+                    if next_label not in runs:
+                        break
+                    if next_label in chain:
+                        # A loop made only of jumps: leave it alone
+                        chain = chain[:1]
+                        break
+                    chain.append(next_label)
+                    target = first_instruction(next_label)
+                self.stats["threaded_jump"] += len(chain) - 1
+                label = chain[-1]
+                # Every jump into a run of labels uses the run's first label
+                instr = f"{opcode} {runs[label][0]}"
+            result.append(instr)
+        return result
+
+    def remove_jumps_to_next(self, code):
+        kept = []
+        for i, instr in enumerate(code):
+            opcode, label = split(instr)
+            if opcode == "JMP":
+                j = i + 1
+                following = set()
+                while j < len(code) and code[j].startswith("LABEL "):
+                    following.add(split(code[j])[1])
+                    j += 1
+                if label in following:
+                    self.stats["jump_to_next"] += 1
+                    continue
+            kept.append(i)
+        return self.keep(code, kept)
+
+    def remove_dead_labels(self, code):
+        used = {arg for opcode, arg in map(split, code) if opcode in ("JMP", "JZ")}
+        kept = []
+        for i, instr in enumerate(code):
+            opcode, label = split(instr)
+            if opcode == "LABEL" and label not in used:
+                self.stats["dead_label"] += 1
+                continue
+            kept.append(i)
+        return self.keep(code, kept)
+
+    def remove_unreachable(self, code):
+        kept = []
+        reachable = True
+        for i, instr in enumerate(code):
+            opcode = split(instr)[0]
+            if opcode == "LABEL":
+                reachable = True
+            elif not reachable:
+                self.stats["unreachable"] += 1
+                continue
+            kept.append(i)
+            if opcode in ("JMP", "SLEEP", "PANIC"):
+                reachable = False
+        return self.keep(code, kept)
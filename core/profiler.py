@@ -0,0 +1,116 @@
+import argparse
+import bisect
+
+from core.bytecode import NO_POSITION
+
+
+class SourceLines:
+    """Maps source offsets to 1-based line numbers; lines end at "\\n", as for the lexer."""
+    def __init__(self, source):
+        self.text = source.split("\n")
+        if source.endswith("\n"):
+            self.text.pop()
+        self.starts = [0]
+        for line in self.text:
+            self.starts.append(self.starts[-1] + len(line) + 1)
+
+    def line(self, offset):
+        """The line `offset` falls on, or 0 for NO_POSITION."""
+        if offset == NO_POSITION:
+            return 0
+        return bisect.bisect_right(self.starts, offset)
+
+    def __len__(self):
+        return len(self.text)
+
+
+class LineStats:
+    """What the instructions compiled from one source line cost in a profiled run."""
+    __slots__ = ("line", "text", "instructions", "seconds")
+
+    def __init__(self, line, text, instructions=0, seconds=0.0):
+        self.line = line
+        self.text = text
+        self.instructions = instructions
+        self.seconds = seconds
+
+
+class Profile:
+    """
+    Per-instruction dispatch counts and cumulative seconds of one run of
+    `program` (see VirtualMachine.profile), indexed by PC.
+
+    Each instruction is charged the time from its dispatch to the next
+    one, so a line's time includes its PAUSEs, INPUTs and output.
+    """
+    def __init__(self, program, counts, times):
+        self.program = program
+        self.counts = counts
+        self.times = times
+
+    @property
+    def instructions(self):
+        return sum(self.counts)
+
+    @property
+    def seconds(self):
+        return sum(self.times)
+
+    def by_line(self, source):
+        """
+        One LineStats per line of `source` (the source the program was
+        compiled from), in order; instructions with no source position are
+        collected under line 0, which comes first when there are any.
+        """
+        lines = SourceLines(source)
+        stats = [LineStats(number, text) for number, text in enumerate(lines.text, 1)]
+        unplaced = LineStats(0, "(no source line)")
+        positions = self.program.positions
+        for pc, count in enumerate(self.counts):
+            if not count:
+                continue
+            number = lines.line(positions[pc])
+            entry = stats[number - 1] if 0 < number <= len(stats) else unplaced
+            entry.instructions += count
+            entry.seconds += self.times[pc]
+        if unplaced.instructions:
+            stats.insert(0, unplaced)
+        return stats
+
+    def annotate(self, source):
+        """`source` as a listing with the instructions and time spent on every line."""
+        total = self.seconds or 1.0
+        rows = [f"{'line':>5} {'instructions':>12} {'time (ms)':>10} {'time':>6}  source"]
+        for entry in self.by_line(source):
+            if entry.instructions:
+                rows.append(f"{entry.line:>5} {entry.instructions:>12} {entry.seconds * 1000:>10.3f}"
+                            f" {entry.seconds / total:>6.1%}  {entry.text}")
+            else:
+                rows.append(f"{entry.line:>5} {'':>12} {'':>10} {'':>6}  {entry.text}")
+        rows.append(f"{self.instructions} instructions in {self.seconds * 1000:.3f} ms")
+        return "\n".join(rows)
+
+
+def main(argv=None):
+    from core.compiler import compile_source
+    from core.vm import VirtualClock, VirtualMachine
+
+    parser = argparse.ArgumentParser(description="Run a NeuroScript file and show the cost of each source line")
+    parser.add_argument("path", help="a .ns source file")
+    parser.add_argument("-O", "--opt-level", type=int, default=1)
+    parser.add_argument("--input", action="append", default=[], help="value for the next listen (repeatable)")
+    parser.add_argument("--virtual-clock", action="store_true", help="make pause take no real time")
+    options = parser.parse_args(argv)
+
+    with open(options.path, encoding="utf-8") as f:
+        source = f.read()
+    vm = VirtualMachine(clock=VirtualClock() if options.virtual_clock else None)
+    try:
+        vm.profile(compile_source(source, options.opt_level).bytecode, options.input)
+    finally:
+        if vm.last_profile is not None:
+            print(vm.last_profile.annotate(source))
+
+
+if __name__ == "__main__":
+    main()
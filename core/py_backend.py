@@ -0,0 +1,197 @@
+import ast
+import marshal
+import re
+
+from core.ast_nodes import (Program, VarDeclaration, Update, PrintCommand, Panic, Pause, Sleep,
+                           InputCommand, IfStatement, WhileLoop, BinaryOperation, Literal, Variable)
+from core.vm import SystemClock, convert_input
+
+ENTRY_POINT = "neuroscript_main"
+
+COMPARISONS = {"==": ast.Eq, "!=": ast.NotEq, "<": ast.Lt, ">": ast.Gt, "<=": ast.LtE, ">=": ast.GtE}
+ARITHMETIC = {"-": ast.Sub, "*": ast.Mult}
+
+# An unassigned variable surfaces as UnboundLocalError/NameError on its mangled name
+UNBOUND_NAME = re.compile(r"'v_(\w+)'")
+
+
+# Runtime helpers for the operations whose VM semantics differ from plain Python
+def _add(a, b):
+    if isinstance(a, str) or isinstance(b, str):
+        return str(a) + str(b)
+    return a + b
+
+
+def _div(a, b):
+    if b == 0:
+        raise ValueError("Division by zero")
+    return a / b
+
+
+def _murmur(value):
+    value = str(value).lower()
+    return value + "... " + value
+
+
+RUNTIME = {"_add": _add, "_div": _div, "_murmur": _murmur}
+
+
+class PythonTranslator:
+    """
+    Translates a NeuroScript Program AST into a Python module defining
+
+        def neuroscript_main(_out, _input, _sleep): ...
+
+    Variables become locals of that function (prefixed with `v_` so they can
+    never clash with Python names), `feel`/`think while` become native
+    if/while statements and every operator keeps the VM's semantics: ADD
+    concatenates when either side is a string, comparisons yield 1/0 and
+    conditions test `!= 0` exactly like JZ.
+    """
+    def translate(self, program):
+        function = ast.FunctionDef(
+            name=ENTRY_POINT,
+            args=ast.arguments(posonlyargs=[], args=[ast.arg(arg="_out"), ast.arg(arg="_input"), ast.arg(arg="_sleep")],
+                               kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=self.block(program.statements),
+            decorator_list=[],
+            returns=None,
+        )
+        return ast.fix_missing_locations(ast.Module(body=[function], type_ignores=[]))
+
+    def block(self, statements):
+        body = []
+        for stmt in statements:
+            body.extend(self.statement(stmt))
+        return body or [ast.Pass()]
+
+    def statement(self, node):
+        if isinstance(node, (VarDeclaration, Update)):
+            if isinstance(node.value, InputCommand):
+                return self.statement(node.value)
+            return [ast.Assign(targets=[self.name(node.name, ast.Store())], value=self.expression(node.value))]
+        elif isinstance(node, PrintCommand):
+            value = self.expression(node.expression)
+            text = self.call("str", value)
+            if node.command == "shout":
+                text = ast.BinOp(self.method(text, "upper"), ast.Add(), ast.Constant("!"))
+            elif node.command == "whisper":
+                text = ast.BinOp(self.method(text, "lower"), ast.Add(), ast.Constant("..."))
+            elif node.command == "laugh":
+                text = ast.BinOp(text, ast.Add(), ast.Constant("😂"))
+            elif node.command == "murmur":
+                text = self.call("_murmur", value)
+            return [ast.Expr(self.call("_out", text))]
+        elif isinstance(node, Panic):
+            return [ast.Raise(exc=self.call("ValueError", ast.Constant(f"PANIC: {node.message}")), cause=None)]
+        elif isinstance(node, Pause):
+            return [ast.Expr(self.call("_sleep", ast.Constant(1)))]
+        elif isinstance(node, Sleep):
+            return [ast.Return(value=None)]
+        elif isinstance(node, InputCommand):
+            return [ast.Assign(targets=[self.name(node.var, ast.Store())], value=self.call("_input", ast.Constant(node.var)))]
+        elif isinstance(node, IfStatement):
+            orelse = self.block(node.else_block) if node.else_block else []
+            return [ast.If(test=self.condition(node.condition), body=self.block(node.then_block), orelse=orelse)]
+        elif isinstance(node, WhileLoop):
+            return [ast.While(test=self.condition(node.condition), body=self.block(node.body), orelse=[])]
+        raise ValueError(f"Cannot translate statement: {node}")
+
+    def condition(self, node):
+        # A comparison feeding a branch can be tested directly instead of via its 1/0 value
+        if isinstance(node, BinaryOperation) and node.op in COMPARISONS:
+            return self.compare(node)
+        return ast.Compare(left=self.expression(node), ops=[ast.NotEq()], comparators=[ast.Constant(0)])
+
+    def compare(self, node):
+        return ast.Compare(left=self.expression(node.left), ops=[COMPARISONS[node.op]()],
+                           comparators=[self.expression(node.right)])
+
+    def expression(self, node):
+        if isinstance(node, Literal):
+            return ast.Constant(node.value)
+        elif isinstance(node, Variable):
+            return self.name(node.name, ast.Load())
+        elif isinstance(node, BinaryOperation):
+            if node.op in COMPARISONS:
+                return ast.IfExp(test=self.compare(node), body=ast.Constant(1), orelse=ast.Constant(0))
+            left = self.expression(node.left)
+            right = self.expression(node.right)
+            if node.op in ARITHMETIC:
+                return ast.BinOp(left, ARITHMETIC[node.op](), right)
+            if node.op == "/":
+                return self.call("_div", left, right)
+            if node.op == "+":
+                # Concatenation with a string literal needs no runtime type check
+                if self.is_string(node.left) or self.is_string(node.right):
+                    return ast.BinOp(self.call("str", left), ast.Add(), self.call("str", right))
+                return self.call("_add", left, right)
+            raise ValueError(f"Unknown operator: {node.op}")
+        raise ValueError(f"Cannot translate expression: {node}")
+
+    def is_string(self, node):
+        return isinstance(node, Literal) and isinstance(node.value, str)
+
+    def name(self, name, ctx):
+        return ast.Name(id=f"v_{name}", ctx=ctx)
+
+    def call(self, function, *args):
+        return ast.Call(func=ast.Name(id=function, ctx=ast.Load()), args=list(args), keywords=[])
+
+    def method(self, value, method):
+        return ast.Call(func=ast.Attribute(value=value, attr=method, ctx=ast.Load()), args=[], keywords=[])
+
+
+class PythonProgram:
+    """
+    A NeuroScript program compiled to a Python code object.
+
+    The code object is built once and can be run any number of times, and
+    to_bytes()/from_bytes() let it be cached outside the process.
+    """
+    def __init__(self, code):
+        self.code = code
+        self._main = None
+
+    @property
+    def main(self):
+        if self._main is None:
+            namespace = dict(RUNTIME)
+            exec(self.code, namespace)
+            self._main = namespace[ENTRY_POINT]
+        return self._main
+
+    def run(self, input_value=None, clock=None):
+        """Run the program and return its output; PAUSE sleeps on `clock`, for real (SystemClock) by default."""
+        output = []
+        inputs = input_value if input_value else []
+        position = 0
+
+        def read_input(var):
+            nonlocal position
+            if position >= len(inputs):
+                raise ValueError(f"No input provided for INPUT {var}")
+            position += 1
+            return convert_input(inputs[position - 1])
+
+        try:
+            self.main(output.append, read_input, (clock or SystemClock()).sleep)
+        except NameError as e:  # UnboundLocalError is a NameError
+            unbound = UNBOUND_NAME.search(str(e))
+            if unbound is None:
+                raise
+            raise ValueError(f"Variable {unbound.group(1)} not defined") from None
+        return "\n".join(output)
+
+    def to_bytes(self):
+        return marshal.dumps(self.code)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(marshal.loads(data))
+
+
+def compile_to_python(program, filename="<neuroscript>"):
+    """Compile a Program AST into a reusable PythonProgram."""
+    module = PythonTranslator().translate(program)
+    return PythonProgram(compile(module, filename, "exec"))
@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core import nsc
+from core.compiler import compile_source
+from core.governor import Limits, ResourceLimitExceeded
+from core.vm import VirtualClock, VirtualMachine
+
+# Tasks per worker in one round trip to the pool: more than one evens out scripts that run slower than others
+CHUNKS_PER_WORKER = 4
+
+SCRIPT_SUFFIX = ".ns"
+INPUT_SUFFIX = ".in"
+
+
+class Job:
+    """One run to make: a script and the values for its INPUTs."""
+    def __init__(self, script, inputs=(), input_path=None):
+        self.script = script
+        self.inputs = list(inputs)
+        self.input_path = input_path
+
+
+class ScriptTimeout(Exception):
+    pass
+
+
+def read_inputs(path):
+    """An input file holds the value for each `listen`, one per line, in order."""
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def script_of(name, stems):
+    """
+    The stem of the script that the input file `name` belongs to: the
+    longest of `stems` that `name` is `stem`.in or `stem`.<label>.in of,
+    or None.
+    """
+    if not name.endswith(INPUT_SUFFIX):
+        return None
+    base = name[:-len(INPUT_SUFFIX)]
+    owners = [stem for stem in stems if base == stem or base.startswith(stem + ".")]
+    return max(owners, key=len, default=None)
+
+
+def discover(directory):
+    """
+    Jobs for every .ns script under `directory`: one per input file next to
+    it (`name.in` or `name.<label>.in`), or a single run without input.
+    """
+    jobs = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        stems = [name[:-len(SCRIPT_SUFFIX)] for name in files if name.endswith(SCRIPT_SUFFIX)]
+        inputs_of = {}
+        for name in sorted(files):
+            stem = script_of(name, stems)
+            if stem is not None:
+                inputs_of.setdefault(stem, []).append(name)
+        for name in sorted(files):
+            if not name.endswith(SCRIPT_SUFFIX):
+                continue
+            script = os.path.join(root, name)
+            stem = name[:-len(SCRIPT_SUFFIX)]
+            input_files = inputs_of.get(stem, ())
+            if not input_files:
+                jobs.append(Job(script))
+            for input_name in input_files:
+                input_path = os.path.join(root, input_name)
+                jobs.append(Job(script, read_inputs(input_path), input_path))
+    return jobs
+
+
+def read_manifest(path):
+    """
+    Jobs listed in a JSON Lines manifest, one object per run:
+    {"script": path, "input": path} or {"script": path, "inputs": [values]}.
+    Relative paths are relative to the manifest.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "script" not in entry:
+                raise ValueError(f"{path}:{number}: manifest entry has no script")
+            script = os.path.join(base, entry["script"])
+            if "input" in entry:
+                input_path = os.path.join(base, entry["input"])
+                jobs.append(Job(script, read_inputs(input_path), input_path))
+            else:
+                jobs.append(Job(script, [str(value) for value in entry.get("inputs", ())]))
+    return jobs
+
+
+def compile_script(job):
+    """Worker side of the compile phase: the script as .nsc bytes, or the error that stopped it."""
+    path, opt_level = job
+    try:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        return nsc.dumps(compile_source(source, opt_level).bytecode), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+# State of a run-phase worker process, set up once by init_worker
+_worker = {}
+
+
+def _alarm(signum, frame):
+    raise ScriptTimeout()
+
+
+def new_vm():
+    return VirtualMachine(clock=VirtualClock() if _worker["virtual_clock"] else None)
+
+
+def init_worker(blobs, timeout, virtual_clock=False, limits=None):
+    """Receive every compiled program once; each is decoded on its first task in this worker."""
+    _worker["blobs"] = blobs
+    _worker["programs"] = {}
+    _worker["timeout"] = timeout
+    _worker["limits"] = limits
+    _worker["virtual_clock"] = virtual_clock
+    _worker["vm"] = new_vm()
+    if timeout and hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _alarm)
+
+
+def run_task(task):
+    """Worker side of the run phase: run one program on one input list, never raising."""
+    index, program_index, inputs = task
+    started = time.perf_counter()
+    programs = _worker["programs"]
+    try:
+        program = programs.get(program_index)
+        if program is None:
+            program = programs[program_index] = nsc.loads(_worker["blobs"][program_index])
+    except Exception as e:
+        return index, "error", "", f"{type(e).__name__}: {e}", time.perf_counter() - started, os.getpid()
+    vm = _worker["vm"]
+    timeout = _worker["timeout"]
+    timed = timeout and hasattr(signal, "setitimer")
+    status, output, error = "ok", None, None
+    try:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            output = vm.run(program, inputs, limits=_worker["limits"])
+        finally:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except ResourceLimitExceeded as e:
+        status, output, error = "limit_exceeded", "\n".join(vm.output), str(e)
+    except ScriptTimeout:
+        # An alarm going off after the run returned, before it was disarmed, leaves the result standing
+        if output is None:
+            status, output, error = "timeout", "\n".join(vm.output), f"Timed out after {timeout}s"
+            # The run was cut off at an arbitrary point; later tasks get a VM in a known state
+            _worker["vm"] = new_vm()
+    except Exception as e:
+        status, output, error = "error", "\n".join(vm.output), f"{type(e).__name__}: {e}"
+    return index, status, output, error, time.perf_counter() - started, os.getpid()
+
+
+class RunStats:
+    """Timings of one run_jobs call; `busy` maps a worker's pid to the seconds it spent running scripts."""
+    def __init__(self):
+        self.runs = 0
+        self.scripts = 0
+        self.compile_time = 0.0
+        self.run_time = 0.0
+        self.wall_time = 0.0
+        self.busy = {}
+        self.tasks = {}
+        self.statuses = {}
+
+    def report(self):
+        lines = [f"{self.runs} runs of {self.scripts} scripts in {self.wall_time:.2f}s"
+                 f" (compile {self.compile_time:.2f}s, run {self.run_time:.2f}s),"
+                 f" {self.runs / self.wall_time if self.wall_time else 0.0:.1f} runs/s",
+                 ", ".join(f"{status}: {count}" for status, count in sorted(self.statuses.items())),
+                 f"{'worker':>8}{'tasks':>8}{'busy':>10}{'utilization':>13}"]
+        for pid in sorted(self.busy):
+            utilization = self.busy[pid] / self.run_time if self.run_time else 0.0
+            lines.append(f"{pid:>8}{self.tasks[pid]:>8}{self.busy[pid]:>9.2f}s{utilization:>12.0%}")
+        return "\n".join(lines)
+
+
+def run_jobs(jobs, workers=None, opt_level=1, timeout=None, virtual_clock=False, limits=None, on_result=None):
+    """
+    Compile every distinct script of `jobs` once, then run all jobs across
+    `workers` processes. Returns one result dict per job, in job order,
+    and the RunStats. `on_result(record)` sees each record as soon as it
+    and every record before it are done.
+
+    Timeouts are enforced with SIGALRM inside the workers and so are not
+    available on platforms without signal.setitimer. With `virtual_clock`
+    PAUSE takes no time (see core.vm.VirtualClock). `limits` (a
+    core.governor.Limits) applies to every run.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = RunStats()
+    started = time.perf_counter()
+    scripts = list(dict.fromkeys(job.script for job in jobs))
+    stats.runs = len(jobs)
+    stats.scripts = len(scripts)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        compiled = list(pool.map(compile_script, [(script, opt_level) for script in scripts],
+                                 chunksize=max(1, len(scripts) // (workers * CHUNKS_PER_WORKER))))
+    stats.compile_time = time.perf_counter() - started
+
+    blobs = [blob for blob, error in compiled]
+    program_of = {script: i for i, script in enumerate(scripts)}
+    records = [{"script": job.script, "input": job.input_path, "status": None, "output": "", "error": None,
+                "elapsed": 0.0, "worker": None} for job in jobs]
+    tasks = []
+    for i, job in enumerate(jobs):
+        program_index = program_of[job.script]
+        error = compiled[program_index][1]
+        if error is None:
+            tasks.append((i, program_index, job.inputs))
+        else:
+            records[i].update(status="compile_error", error=error)
+
+    running = time.perf_counter()
+    emitted = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(blobs, timeout, virtual_clock, limits)) as pool:
+        for index, status, output, error, elapsed, pid in pool.map(
+                run_task, tasks, chunksize=max(1, len(tasks) // (workers * CHUNKS_PER_WORKER))):
+            records[index].update(status=status, output=output, error=error, elapsed=elapsed, worker=pid)
+            stats.busy[pid] = stats.busy.get(pid, 0.0) + elapsed
+            stats.tasks[pid] = stats.tasks.get(pid, 0) + 1
+            # Results come back in job order; the compile errors in between have no task
+            if on_result:
+                for record in records[emitted:index + 1]:
+                    on_result(record)
+            emitted = index + 1
+    stats.run_time = time.perf_counter() - running
+    if on_result:
+        for record in records[emitted:]:
+            on_result(record)
+
+    for record in records:
+        stats.statuses[record["status"]] = stats.statuses.get(record["status"], 0) + 1
+    stats.wall_time = time.perf_counter() - started
+    return records, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile and run many NeuroScript scripts across processes")
+    parser.add_argument("path", help="a directory of .ns scripts (with optional .in input files) or a .jsonl manifest")
+    parser.add_argument("-o", "--output", help="JSON Lines results file (default: stdout)")
+    parser.add_argument("-O", "--opt-level", type=int, default=1)
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("-t", "--timeout", type=float, default=None, help="seconds each run may take")
+    parser.add_argument("--virtual-clock", action="store_true", help="make pause take no real time")
+    parser.add_argument("--max-instructions", type=int, help="fuel: loop instructions each run may execute")
+    parser.add_argument("--max-string", type=int, help="longest string or output line a run may build")
+    parser.add_argument("--max-output-lines", type=int)
+    parser.add_argument("--max-output-bytes", type=int)
+    options = parser.parse_args(argv)
+
+    jobs = discover(options.path) if os.path.isdir(options.path) else read_manifest(options.path)
+    limits = None
+    if any(value is not None for value in (options.max_instructions, options.max_string, options.max_output_lines,
+                                           options.max_output_bytes)):
+        limits = Limits(max_instructions=options.max_instructions, max_string=options.max_string,
+                        max_output_lines=options.max_output_lines, max_output_bytes=options.max_output_bytes)
+    out = open(options.output, "w", encoding="utf-8") if options.output else sys.stdout
+    try:
+        _, stats = run_jobs(jobs, options.jobs, options.opt_level, options.timeout, options.virtual_clock, limits,
+                            on_result=lambda record: out.write(json.dumps(record) + "\n"))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(stats.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,115 @@
+import enum
+
 from core.ast_nodes import (Program, VarDeclaration, Update, PrintCommand, Panic, Pause, Sleep,
                            InputCommand, IfStatement, WhileLoop, BinaryOperation, Literal, Variable)
 
+
+class ValueType(enum.Enum):
+    """What is statically known about the values an expression can produce."""
+    INT = "int"
+    FLOAT = "float"
+    STR = "str"
+    NUMBER = "number"    # int or float
+    DYNAMIC = "dynamic"  # anything, e.g. values read by listen
+
+
+NUMERIC = frozenset((ValueType.INT, ValueType.FLOAT, ValueType.NUMBER))
+COMPARISON_OPS = frozenset(("==", "!=", "<", ">", "<=", ">="))
+
+
+def join(a, b):
+    """The least type covering both `a` and `b`; None stands for "no value yet"."""
+    if a is None or a == b:
+        return b
+    if b is None:
+        return a
+    if a in NUMERIC and b in NUMERIC:
+        return ValueType.NUMBER
+    return ValueType.DYNAMIC
+
+
+def numeric_result(a, b):
+    if a == ValueType.FLOAT or b == ValueType.FLOAT:
+        return ValueType.FLOAT
+    if a == ValueType.INT and b == ValueType.INT:
+        return ValueType.INT
+    return ValueType.NUMBER
+
+
+def expression_type(node, variables):
+    """
+    Type of expression `node` given the types of `variables`, mirroring the
+    VM: `+` concatenates as soon as one side is a string, comparisons push
+    1 or 0, `/` is true division. Returns None while a variable it reads has
+    no type yet.
+    """
+    if isinstance(node, Literal):
+        if isinstance(node.value, str):
+            return ValueType.STR
+        return ValueType.FLOAT if isinstance(node.value, float) else ValueType.INT
+    if isinstance(node, Variable):
+        return variables.get(node.name)
+    if isinstance(node, BinaryOperation):
+        left = expression_type(node.left, variables)
+        right = expression_type(node.right, variables)
+        if left is None or right is None:
+            return None
+        if node.op in COMPARISON_OPS:
+            return ValueType.INT
+        if node.op == "+" and (left == ValueType.STR or right == ValueType.STR):
+            return ValueType.STR
+        if left in NUMERIC and right in NUMERIC:
+            return ValueType.FLOAT if node.op == "/" else numeric_result(left, right)
+        return ValueType.DYNAMIC
+    return ValueType.DYNAMIC
+
+
+def assignments(statements, found=None):
+    """Every (name, expression) assignment in `statements`; listen assignments carry None."""
+    found = [] if found is None else found
+    for stmt in statements:
+        if isinstance(stmt, (VarDeclaration, Update)):
+            found.append((stmt.name, None if isinstance(stmt.value, InputCommand) else stmt.value))
+        elif isinstance(stmt, InputCommand):
+            found.append((stmt.var, None))
+        elif isinstance(stmt, IfStatement):
+            assignments(stmt.then_block, found)
+            assignments(stmt.else_block or [], found)
+        elif isinstance(stmt, WhileLoop):
+            assignments(stmt.body, found)
+    return found
+
+
+def infer_types(program):
+    """
+    Map every assigned variable of `program` to a ValueType covering each
+    value it can ever hold. The analysis is flow-insensitive: a variable's
+    type joins the types of all its assignments, iterated to a fixed point
+    so that loops such as `update i = i + 1` settle on a precise type.
+    """
+    found = assignments(program.statements)
+    types = {}
+    changed = True
+    while changed:
+        changed = False
+        for name, value in found:
+            value_type = ValueType.DYNAMIC if value is None else expression_type(value, types)
+            joined = join(types.get(name), value_type)
+            if joined != types.get(name):
+                types[name] = joined
+                changed = True
+    return types
+
 class SemanticAnalyzer:
     def __init__(self):
         self.symbol_table = set()
+        self.types = {}  # variable -> ValueType, filled in when a whole Program is analyzed
 
     def analyze(self, node):
         if isinstance(node, Program):
             for stmt in node.statements:
                 self.analyze(stmt)
+            self.types = infer_types(node)
         elif isinstance(node, VarDeclaration):
             # Analyze the value/expression on the right-hand side
             self.analyze(node.value)
@@ -16,8 +117,7 @@ class SemanticAnalyzer:
             self.symbol_table.add(node.name)
         elif isinstance(node, Update):
             # Check if variable is declared
-            if node.name not in self.symbol_table:
-                raise SemanticError(f"Variable {node.name} not declared")
+            self.require(node.name)
             # Analyze the value/expression
             self.analyze(node.value)
         elif isinstance(node, PrintCommand):
@@ -59,8 +159,37 @@ class SemanticAnalyzer:
             pass
         elif isinstance(node, Variable):
             # Check if variable is declared
-            if node.name not in self.symbol_table:
-                raise SemanticError(f"Variable {node.name} not declared")
+            self.require(node.name)
+
+    def analyze_stream(self, statements):
+        """Check top-level statements as they arrive, passing each one on once it has been checked."""
+        for stmt in statements:
+            self.analyze(stmt)
+            yield stmt
+
+    def require(self, name):
+        if name not in self.symbol_table:
+            raise SemanticError(f"Variable {name} not declared")
+
+
+class DependencyCollector(SemanticAnalyzer):
+    """
+    Summarizes what a statement needs from and adds to the symbol table.
+
+    Instead of rejecting undeclared names it records them in `required`, in
+    the order the analyzer would have checked them; `symbol_table` ends up
+    holding the names the statement declares. A statement passes the real
+    analyzer exactly when every required name was declared before it, and
+    the first one that was not is the one SemanticAnalyzer reports.
+    """
+    def __init__(self):
+        super().__init__()
+        self.required = []
+
+    def require(self, name):
+        if name not in self.symbol_table and name not in self.required:
+            self.required.append(name)
+
 
 class SemanticError(Exception):
     pass
\ No newline at end of file
@@ -0,0 +1,43 @@
+import collections
+
+# Lines a WriterSink collects before it writes them out in one go
+WRITE_BUFFER_LINES = 1024
+
+
+class CallbackSink:
+    """Hands every output line to `callback` as soon as it is produced."""
+    def __init__(self, callback):
+        self.append = callback
+
+
+class WriterSink:
+    """
+    Writes output lines to a text file object, one per line. Up to
+    `buffer_lines` lines are collected and written together; the VM
+    flushes the rest when a run ends.
+    """
+    def __init__(self, file, buffer_lines=WRITE_BUFFER_LINES):
+        self.file = file
+        self.buffer_lines = buffer_lines
+        self.buffer = []
+
+    def append(self, line):
+        buffer = self.buffer
+        buffer.append(line)
+        if len(buffer) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer.clear()
+        self.file.flush()
+
+
+class RingBufferSink(collections.deque):
+    """Keeps only the last `size` output lines."""
+    def __init__(self, size):
+        super().__init__(maxlen=size)
+
+    def text(self):
+        return "\n".join(self)
@@ -0,0 +1,126 @@
+from collections import Counter
+
+from core.bytecode import OPNAMES, TEMP_NAME, parse_number
+from core.peephole import split
+from core.trace import Tracer, DEBUG
+from core.vm import VirtualMachine
+
+# Compare-and-branch: `<CMP> / JZ L` jumps to L unless the comparison holds
+COMPARE_BRANCH = {"LT": "LT_JZ", "GT": "GT_JZ", "LE": "LE_JZ", "GE": "GE_JZ", "EQ": "EQ_JZ", "NEQ": "NEQ_JZ"}
+
+FUSED = ("INC", "INC_VAR", "LOAD_PUSH", "LOAD_LOAD") + tuple(COMPARE_BRANCH.values())
+
+
+def is_variable(name):
+    # Temporaries share pooled slots (see Assembler.allocate_slots), so only
+    # program variables are folded into superinstructions.
+    return name != "" and not TEMP_NAME.fullmatch(name)
+
+
+class SuperinstructionFuser:
+    """
+    Replaces the most frequently executed stack code sequences (see
+    sequence_counts) by one fused instruction each:
+
+    - `LOAD x / PUSH c / ADD_NUM / STORE x`  ->  `INC x c`
+    - `LOAD x / LOAD y / ADD_NUM / STORE x`  ->  `INC_VAR x y`
+    - `<CMP> / JZ L`                         ->  `<CMP>_JZ L`
+    - `LOAD x / PUSH c`                      ->  `LOAD_PUSH x c`
+    - `LOAD x / LOAD y`                      ->  `LOAD_LOAD x y`
+
+    Sequences never span a LABEL, so every jump target stays an instruction
+    boundary, and the result runs exactly like its input with fewer VM
+    dispatches. expand() undoes the rewrite. `stats` counts the fused
+    instructions the last fuse() call produced, by opcode. Given the source
+    `positions` of the instructions, `positions` afterwards holds those of
+    the result; a fused instruction takes the position of its first part.
+    """
+    def __init__(self):
+        self.stats = Counter()
+        self.positions = None
+
+    def fuse(self, instructions, positions=None):
+        code = [split(instr) for instr in instructions]
+        self.stats = Counter()
+        result = []
+        kept = []
+        i = 0
+        while i < len(code):
+            kept.append(i)
+            fused, length = self.match(code, i)
+            if fused is None:
+                result.append(instructions[i])
+                i += 1
+                continue
+            self.stats[split(fused)[0]] += 1
+            result.append(fused)
+            i += length
+        self.positions = [positions[i] for i in kept] if positions is not None else None
+        return result
+
+    def match(self, code, i):
+        """The fused instruction for the sequence starting at code[i] and its length, or (None, 1)."""
+        opcode, arg = code[i]
+        following = code[i + 1:i + 4]
+        if opcode == "LOAD" and is_variable(arg) and following:
+            next_opcode, next_arg = following[0]
+            if len(following) == 3 and following[1] == ("ADD_NUM", "") and following[2] == ("STORE", arg):
+                if next_opcode == "PUSH" and parse_number(next_arg) is not None:
+                    return f"INC {arg} {next_arg}", 4
+                if next_opcode == "LOAD" and is_variable(next_arg):
+                    return f"INC_VAR {arg} {next_arg}", 4
+            if next_opcode == "PUSH":
+                return f"LOAD_PUSH {arg} {next_arg}", 2
+            if next_opcode == "LOAD" and is_variable(next_arg):
+                return f"LOAD_LOAD {arg} {next_arg}", 2
+        elif opcode in COMPARE_BRANCH and i + 1 < len(code) and code[i + 1][0] == "JZ":
+            return f"{COMPARE_BRANCH[opcode]} {code[i + 1][1]}", 2
+        return None, 1
+
+
+def expand(instructions):
+    """Rewrite every superinstruction in `instructions` back into the sequence it replaced."""
+    result = []
+    for instr in instructions:
+        opcode, arg = split(instr)
+        if opcode == "INC" or opcode == "INC_VAR":
+            name, operand = arg.split(maxsplit=1)
+            result += [f"LOAD {name}", f"PUSH {operand}" if opcode == "INC" else f"LOAD {operand}",
+                       "ADD_NUM", f"STORE {name}"]
+        elif opcode == "LOAD_PUSH" or opcode == "LOAD_LOAD":
+            name, operand = arg.split(maxsplit=1)
+            result += [f"LOAD {name}", f"PUSH {operand}" if opcode == "LOAD_PUSH" else f"LOAD {operand}"]
+        elif opcode in FUSED:
+            result += [opcode[:-len("_JZ")], f"JZ {arg}"]
+        else:
+            result.append(instr)
+    return result
+
+
+def fuse(instructions):
+    """Apply SuperinstructionFuser to `instructions`."""
+    return SuperinstructionFuser().fuse(instructions)
+
+
+def executed_pcs(program, input_value=None):
+    """Run an assembled program on the switch engine and return the PC of every instruction it dispatched."""
+    pcs = []
+
+    def sink(stage, message):
+        pcs.append(int(message[3:message.index(":")]))
+    VirtualMachine(Tracer(DEBUG, ["vm"], sink)).run(program, input_value)
+    return pcs
+
+
+def sequence_counts(program, pcs, length=2):
+    """
+    How often each run of `length` opcodes was executed straight through
+    (each one falling through to the next) in the dispatch trace `pcs` of
+    `program`: the candidates for new superinstructions.
+    """
+    counts = Counter()
+    for n in range(len(pcs) - length + 1):
+        window = pcs[n:n + length]
+        if all(b == a + 1 for a, b in zip(window, window[1:])):
+            counts[tuple(OPNAMES[program.ops[pc]] for pc in window)] += 1
+    return counts
@@ -0,0 +1,122 @@
+import enum
+
+
+class TACOp(enum.IntEnum):
+    ASSIGN = 0
+    ADD = 1
+    SUB = 2
+    MUL = 3
+    DIV = 4
+    EQ = 5
+    NEQ = 6
+    LT = 7
+    GT = 8
+    LE = 9
+    GE = 10
+    PRINT = 11
+    SHOUT = 12
+    WHISPER = 13
+    LAUGH = 14
+    MURMUR = 15
+    PANIC = 16
+    PAUSE = 17
+    SLEEP = 18
+    INPUT = 19
+    LABEL = 20
+    JMP = 21
+    JZ = 22
+    ADD_NUM = 23  # ADD with both operands known to be numbers
+    CONCAT = 24   # ADD with an operand known to be a string
+
+
+BINARY_OPS = {
+    "+": TACOp.ADD, "-": TACOp.SUB, "*": TACOp.MUL, "/": TACOp.DIV,
+    "==": TACOp.EQ, "!=": TACOp.NEQ, "<": TACOp.LT, ">": TACOp.GT, "<=": TACOp.LE, ">=": TACOp.GE,
+}
+BINARY_TACOPS = frozenset(BINARY_OPS.values()) | {TACOp.ADD_NUM, TACOp.CONCAT}
+
+PRINT_OPS = {
+    "speak": TACOp.PRINT, "shout": TACOp.SHOUT, "whisper": TACOp.WHISPER, "laugh": TACOp.LAUGH,
+    "murmur": TACOp.MURMUR,
+}
+PRINT_TACOPS = frozenset(PRINT_OPS.values())
+
+
+class OperandKind(enum.IntEnum):
+    TEMP = 0
+    VAR = 1
+    CONST = 2
+
+
+class Operand:
+    __slots__ = ("kind", "value")
+
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value  # name for TEMP/VAR, the literal itself for CONST
+
+    def __eq__(self, other):
+        return isinstance(other, Operand) and self.kind == other.kind and self.value == other.value
+
+    def __hash__(self):
+        return hash((self.kind, self.value))
+
+    def __repr__(self):
+        return f"Operand({self.kind.name}, {self.value!r})"
+
+    def __str__(self):
+        if self.kind == OperandKind.CONST and isinstance(self.value, str):
+            return f'"{self.value}"'
+        return str(self.value)
+
+
+def temp(name):
+    return Operand(OperandKind.TEMP, name)
+
+
+def var(name):
+    return Operand(OperandKind.VAR, name)
+
+
+def const(value):
+    return Operand(OperandKind.CONST, value)
+
+
+class TACInstruction:
+    """
+    One three-address instruction: `result = args[0] op args[1]`.
+
+    `result` is the assigned Operand (ASSIGN, binary ops, INPUT) and `args`
+    holds the Operands read. Non-operand fields are plain strings: the label
+    of LABEL/JMP/JZ (the last arg of JZ), the PANIC message and the INPUT
+    prompt. `pos` is the source offset of the statement it was generated
+    from, if known. str() renders the classic textual TAC.
+    """
+    __slots__ = ("op", "result", "args", "pos")
+
+    def __init__(self, op, result=None, args=(), pos=None):
+        self.op = op
+        self.result = result
+        self.args = args
+        self.pos = pos
+
+    def __repr__(self):
+        return f"TACInstruction({self.op.name}, {self.result!r}, {self.args!r})"
+
+    def __str__(self):
+        op = self.op
+        if op == TACOp.ASSIGN:
+            return f"{self.result} = {self.args[0]}"
+        if op in BINARY_TACOPS:
+            return f"{self.result} = {self.args[0]} {op.name} {self.args[1]}"
+        if op in PRINT_TACOPS:
+            return f"{op.name} {self.args[0]}"
+        if op == TACOp.PANIC:
+            return f'PANIC "{self.args[0]}"'
+        if op == TACOp.INPUT:
+            return f'INPUT "{self.args[0]}" {self.result}'
+        if op == TACOp.JZ:
+            return f"JZ {self.args[0]} {self.args[1]}"
+        if op in (TACOp.LABEL, TACOp.JMP):
+            return f"{op.name} {self.args[0]}"
+        return op.name
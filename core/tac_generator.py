@@ -1,11 +1,26 @@
 from core.ast_nodes import (Program, VarDeclaration, Update, PrintCommand, Panic, Pause, Sleep,
                            InputCommand, IfStatement, WhileLoop, BinaryOperation, Literal, Variable)
+from core.semantic_analyzer import ValueType, NUMERIC, expression_type
+from core.tac import TACInstruction, TACOp, BINARY_OPS, PRINT_OPS, temp, var, const
 
 class TACGenerator:
-    def __init__(self):
+    """
+    Lowers the AST to TAC. Given the variable types inferred by the
+    semantic analyzer, `+` becomes ADD_NUM or CONCAT wherever the operand
+    types decide which of the two ADD performs; without them, or when they
+    are not known, the generic ADD is emitted.
+
+    Every instruction carries the `pos` of the statement it belongs to. The
+    condition test and closing jump of `feel` and `think while` belong to
+    the `feel`/`think while` line itself, so a loop's back edge is charged
+    to its header.
+    """
+    def __init__(self, types=None):
+        self.types = types
         self.instructions = []
         self.temp_count = 0
         self.label_count = 0
+        self.pos = None
 
     def new_temp(self):
         temp = f"t{self.temp_count}"
@@ -17,121 +32,121 @@ class TACGenerator:
         self.label_count += 1
         return label
 
+    def emit(self, op, result=None, *args):
+        self.instructions.append(TACInstruction(op, result, args, self.pos))
+
     def generate(self, node):
         self.instructions = []
         self.temp_count = 0
         self.label_count = 0
+        self.pos = None
         self.visit(node)
         return self.instructions
 
+    def generate_stream(self, statements):
+        """Yield the TAC of each top-level statement as soon as it has been generated."""
+        self.instructions = []
+        self.temp_count = 0
+        self.label_count = 0
+        self.pos = None
+        for stmt in statements:
+            self.visit(stmt)
+            yield from self.instructions
+            self.instructions = []
+
     def visit(self, node):
+        pos = getattr(node, "pos", None)
+        if pos is not None:
+            self.pos = pos
         if isinstance(node, Program):
             for stmt in node.statements:
                 self.visit(stmt)
         elif isinstance(node, VarDeclaration):
             result = self.visit(node.value)
-            self.instructions.append(f"{node.name} = {result}")
-            return node.name
+            self.emit(TACOp.ASSIGN, var(node.name), result)
+            return var(node.name)
         elif isinstance(node, Update):
             result = self.visit(node.value)
-            self.instructions.append(f"{node.name} = {result}")
-            return node.name
+            self.emit(TACOp.ASSIGN, var(node.name), result)
+            return var(node.name)
         elif isinstance(node, PrintCommand):
             result = self.visit(node.expression)
-            if node.command == "speak":
-                self.instructions.append(f"PRINT {result}")
-            elif node.command == "shout":
-                self.instructions.append(f"SHOUT {result}")
-            elif node.command == "whisper":
-                self.instructions.append(f"WHISPER {result}")
-            elif node.command == "laugh":
-                self.instructions.append(f"LAUGH {result}")
-            elif node.command == "murmur":
-                self.instructions.append(f"MURMUR {result}")
+            self.emit(PRINT_OPS[node.command], None, result)
             return result
         elif isinstance(node, Panic):
-            self.instructions.append(f'PANIC "{node.message}"')
+            self.emit(TACOp.PANIC, None, node.message)
         elif isinstance(node, Pause):
-            self.instructions.append("PAUSE")
+            self.emit(TACOp.PAUSE)
         elif isinstance(node, Sleep):
-            self.instructions.append("SLEEP")
+            self.emit(TACOp.SLEEP)
         elif isinstance(node, InputCommand):
-            self.instructions.append(f'INPUT "{node.prompt}" {node.var}')
-            return node.var
+            self.emit(TACOp.INPUT, var(node.var), node.prompt)
+            return var(node.var)
         elif isinstance(node, IfStatement):
             cond_result = self.visit(node.condition)
             else_label = self.new_label()
             end_label = self.new_label()
 
             # If condition is false, jump to else or end
-            self.instructions.append(f"JZ {cond_result} {else_label}")
+            self.emit(TACOp.JZ, None, cond_result, else_label)
 
             # Then block - execute only if condition is true
             for stmt in node.then_block:
                 self.visit(stmt)
 
             # Jump to end after then block (skip else block)
-            self.instructions.append(f"JMP {end_label}")
+            self.pos = pos
+            self.emit(TACOp.JMP, None, end_label)
 
             # Else block (or subsequent statements)
-            self.instructions.append(f"LABEL {else_label}")
+            self.emit(TACOp.LABEL, None, else_label)
             if node.else_block:
                 for stmt in node.else_block:
                     self.visit(stmt)
 
             # End of if statement
-            self.instructions.append(f"LABEL {end_label}")
+            self.emit(TACOp.LABEL, None, end_label)
         elif isinstance(node, WhileLoop):
             start_label = self.new_label()
             end_label = self.new_label()
 
             # Start of loop
-            self.instructions.append(f"LABEL {start_label}")
+            self.emit(TACOp.LABEL, None, start_label)
 
             # Evaluate condition
             cond_result = self.visit(node.condition)
 
             # If condition is false, jump to end
-            self.instructions.append(f"JZ {cond_result} {end_label}")
+            self.emit(TACOp.JZ, None, cond_result, end_label)
 
             # Loop body
             for stmt in node.body:
                 self.visit(stmt)
 
             # Jump back to start
-            self.instructions.append(f"JMP {start_label}")
+            self.pos = pos
+            self.emit(TACOp.JMP, None, start_label)
 
             # End of loop
-            self.instructions.append(f"LABEL {end_label}")
+            self.emit(TACOp.LABEL, None, end_label)
         elif isinstance(node, BinaryOperation):
             left = self.visit(node.left)
             right = self.visit(node.right)
-            temp = self.new_temp()
-
-            if node.op == "+":
-                self.instructions.append(f"{temp} = {left} ADD {right}")
-            elif node.op == "-":
-                self.instructions.append(f"{temp} = {left} SUB {right}")
-            elif node.op == "*":
-                self.instructions.append(f"{temp} = {left} MUL {right}")
-            elif node.op == "/":
-                self.instructions.append(f"{temp} = {left} DIV {right}")
-            elif node.op == "==":
-                self.instructions.append(f"{temp} = {left} EQ {right}")
-            elif node.op == "!=":
-                self.instructions.append(f"{temp} = {left} NEQ {right}")
-            elif node.op == "<":
-                self.instructions.append(f"{temp} = {left} LT {right}")
-            elif node.op == ">":
-                self.instructions.append(f"{temp} = {left} GT {right}")
-            elif node.op == "<=":
-                self.instructions.append(f"{temp} = {left} LE {right}")
-            elif node.op == ">=":
-                self.instructions.append(f"{temp} = {left} GE {right}")
-            return temp
+            result = temp(self.new_temp())
+            self.emit(self.binary_op(node), result, left, right)
+            return result
         elif isinstance(node, Literal):
-            if isinstance(node.value, str):
-                return f'"{node.value}"'
-            return str(node.value)
+            return const(node.value)
         elif isinstance(node, Variable):
-            return node.name
\ No newline at end of file
+            return var(node.name)
+
+    def binary_op(self, node):
+        if node.op != "+" or self.types is None:
+            return BINARY_OPS[node.op]
+        left = expression_type(node.left, self.types)
+        right = expression_type(node.right, self.types)
+        if left == ValueType.STR or right == ValueType.STR:
+            return TACOp.CONCAT
+        if left in NUMERIC and right in NUMERIC:
+            return TACOp.ADD_NUM
+        return TACOp.ADD
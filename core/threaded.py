@@ -0,0 +1,325 @@
+from core.bytecode import (UNSET, PUSH, LOAD, STORE, ADD, SUB, MUL, DIV, EQ, NEQ, LT, GT, LE, GE, PRINT,
+                           SHOUT, WHISPER, LAUGH, MURMUR, PANIC, PAUSE, SLEEP, INPUT, JMP, JZ, ADD_NUM, CONCAT,
+                           INC, INC_VAR, LOAD_PUSH, LOAD_LOAD, LT_JZ, GT_JZ, LE_JZ, GE_JZ, EQ_JZ, NEQ_JZ, JUMP_OPS)
+from core.governor import UNLIMITED, repeated_length
+
+
+class ThreadedCode:
+    """
+    A Bytecode program pre-compiled into one Python closure per instruction.
+
+    Each closure has its operands (constant, slot, jump target, next PC)
+    bound when it is built and returns the PC to run next, so the dispatch
+    loop is just `pc = handlers[pc]()`. The stack, frame and output lists
+    the closures share are cleared in place by reset(), which lets a
+    VirtualMachine build the closures once per program and reuse them.
+    Backward jumps go through `loops` (a core.tiering.HotLoops) when given.
+
+    Output lines go to `sink` (see core.sinks) when given, else to a list
+    of their own that reset() clears.
+
+    With `suspend` set, PAUSE does not sleep but returns a PC past the end,
+    len(program) + 1 + the PC to resume at, so that an async dispatch loop
+    stops and can await the pause itself.
+    """
+    def __init__(self, program, loops=None, suspend=False, sink=None):
+        self.program = program
+        self.loops = loops
+        self.suspend = suspend
+        self.sink = sink
+        self.stack = []
+        self.frame = program.new_frame()
+        self.output = [] if sink is None else sink
+        self.read_input = None  # set by the VM before each run
+        self.sleep = None  # likewise
+        self.governor = None  # likewise, for governed runs
+        self.max_string = UNLIMITED
+        self.handlers = [self.build(pc) for pc in range(len(program.ops))]
+
+    def reset(self):
+        self.stack.clear()
+        self.frame[:] = self.program.new_frame()
+        if self.sink is None:
+            self.output.clear()
+
+    def back_edge(self, handler, header):
+        """Wrap the handler of a jump back to loop header `header` so that taking it goes through `loops`."""
+        enter = self.loops.enter
+        frame = self.frame
+        output = self.output
+
+        def jump():
+            pc = handler()
+            if pc == header:
+                return enter(header, frame, output)
+            return pc
+        return jump
+
+    def build(self, pc):
+        program = self.program
+        op = program.ops[pc]
+        arg = program.args[pc]
+        nxt = pc + 1
+        stack = self.stack
+        frame = self.frame
+        output = self.output
+        push = stack.append
+        pop = stack.pop
+
+        if op == PUSH:
+            value = program.constants[arg]
+
+            def handler():
+                push(value)
+                return nxt
+        elif op == LOAD:
+            name = program.names[arg]
+
+            def handler():
+                value = frame[arg]
+                if value is UNSET:
+                    raise ValueError(f"Variable {name} not defined")
+                push(value)
+                return nxt
+        elif op == STORE:
+            def handler():
+                frame[arg] = pop()
+                return nxt
+        elif op == JZ:
+            def handler():
+                if pop() == 0:
+                    return arg
+                return nxt
+        elif op == JMP:
+            def handler():
+                return arg
+        elif op == ADD_NUM:
+            def handler():
+                b = pop()
+                push(pop() + b)
+                return nxt
+        elif op == CONCAT:
+            def handler():
+                b = pop()
+                value = str(pop()) + str(b)
+                if len(value) > self.max_string:
+                    raise self.governor.exceeded("max_string", pc)
+                push(value)
+                return nxt
+        elif op == ADD:
+            def handler():
+                b = pop()
+                a = pop()
+                if isinstance(a, str) or isinstance(b, str):
+                    value = str(a) + str(b)
+                    if len(value) > self.max_string:
+                        raise self.governor.exceeded("max_string", pc)
+                    push(value)
+                else:
+                    push(a + b)
+                return nxt
+        elif op == SUB:
+            def handler():
+                b = pop()
+                push(pop() - b)
+                return nxt
+        elif op == MUL:
+            def handler():
+                b = pop()
+                a = pop()
+                if (isinstance(a, str) or isinstance(b, str)) and repeated_length(a, b) > self.max_string:
+                    raise self.governor.exceeded("max_string", pc)
+                push(a * b)
+                return nxt
+        elif op == DIV:
+            def handler():
+                b = pop()
+                a = pop()
+                if b == 0:
+                    raise ValueError("Division by zero")
+                push(a / b)
+                return nxt
+        elif op == EQ:
+            def handler():
+                b = pop()
+                push(1 if pop() == b else 0)
+                return nxt
+        elif op == NEQ:
+            def handler():
+                b = pop()
+                push(1 if pop() != b else 0)
+                return nxt
+        elif op == LT:
+            def handler():
+                b = pop()
+                push(1 if pop() < b else 0)
+                return nxt
+        elif op == GT:
+            def handler():
+                b = pop()
+                push(1 if pop() > b else 0)
+                return nxt
+        elif op == LE:
+            def handler():
+                b = pop()
+                push(1 if pop() <= b else 0)
+                return nxt
+        elif op == GE:
+            def handler():
+                b = pop()
+                push(1 if pop() >= b else 0)
+                return nxt
+        elif op == LOAD_PUSH:
+            slot = program.operands[arg]
+            name = program.names[slot]
+            constant = program.constants[program.operands[arg + 1]]
+
+            def handler():
+                value = frame[slot]
+                if value is UNSET:
+                    raise ValueError(f"Variable {name} not defined")
+                push(value)
+                push(constant)
+                return nxt
+        elif op == LOAD_LOAD:
+            first = program.operands[arg]
+            second = program.operands[arg + 1]
+            first_name = program.names[first]
+            second_name = program.names[second]
+
+            def handler():
+                value = frame[first]
+                if value is UNSET:
+                    raise ValueError(f"Variable {first_name} not defined")
+                push(value)
+                value = frame[second]
+                if value is UNSET:
+                    raise ValueError(f"Variable {second_name} not defined")
+                push(value)
+                return nxt
+        elif op == INC:
+            slot = program.operands[arg]
+            name = program.names[slot]
+            constant = program.constants[program.operands[arg + 1]]
+
+            def handler():
+                value = frame[slot]
+                if value is UNSET:
+                    raise ValueError(f"Variable {name} not defined")
+                frame[slot] = value + constant
+                return nxt
+        elif op == INC_VAR:
+            slot = program.operands[arg]
+            other = program.operands[arg + 1]
+            name = program.names[slot]
+            other_name = program.names[other]
+
+            def handler():
+                value = frame[slot]
+                if value is UNSET:
+                    raise ValueError(f"Variable {name} not defined")
+                addend = frame[other]
+                if addend is UNSET:
+                    raise ValueError(f"Variable {other_name} not defined")
+                frame[slot] = value + addend
+                return nxt
+        elif op == LT_JZ:
+            def handler():
+                b = pop()
+                if pop() < b:
+                    return nxt
+                return arg
+        elif op == GT_JZ:
+            def handler():
+                b = pop()
+                if pop() > b:
+                    return nxt
+                return arg
+        elif op == LE_JZ:
+            def handler():
+                b = pop()
+                if pop() <= b:
+                    return nxt
+                return arg
+        elif op == GE_JZ:
+            def handler():
+                b = pop()
+                if pop() >= b:
+                    return nxt
+                return arg
+        elif op == EQ_JZ:
+            def handler():
+                b = pop()
+                if pop() == b:
+                    return nxt
+                return arg
+        elif op == NEQ_JZ:
+            def handler():
+                b = pop()
+                if pop() != b:
+                    return nxt
+                return arg
+        elif op == PRINT:
+            def handler():
+                output.append(str(pop()))
+                return nxt
+        elif op == SHOUT:
+            def handler():
+                output.append(str(pop()).upper() + "!")
+                return nxt
+        elif op == WHISPER:
+            def handler():
+                output.append(str(pop()).lower() + "...")
+                return nxt
+        elif op == LAUGH:
+            def handler():
+                output.append(str(pop()) + "😂")
+                return nxt
+        elif op == MURMUR:
+            def handler():
+                value = str(pop()).lower()
+                output.append(value + "... " + value)
+                return nxt
+        elif op == PANIC:
+            message = program.constants[arg]
+
+            def handler():
+                raise ValueError(f"PANIC: {message}")
+        elif op == PAUSE and self.suspend:
+            resume = len(program.ops) + 1 + nxt
+
+            def handler():
+                return resume
+        elif op == PAUSE:
+            def handler():
+                self.sleep(1)
+                return nxt
+        elif op == SLEEP:
+            end = len(program.ops)
+
+            def handler():
+                return end
+        elif op == INPUT:
+            name = program.names[arg]
+
+            def handler():
+                frame[arg] = self.read_input(name)
+                return nxt
+        else:
+            raise ValueError(f"Unknown opcode: {op}")
+        if arg <= pc and self.loops is not None and op in JUMP_OPS:
+            return self.back_edge(handler, arg)
+        return handler
+
+
+def traced_handlers(code, trace):
+    """Wrap every handler of `code` so it reports itself to `trace` before running."""
+    program = code.program
+    stack = code.stack
+
+    def wrap(pc, handler):
+        def traced():
+            trace(f"PC {pc}: {program.render(pc)}  stack={stack}")
+            return handler()
+        return traced
+    return [wrap(pc, handler) for pc, handler in enumerate(code.handlers)]
@@ -0,0 +1,397 @@
+import math
+import re
+
+from core.bytecode import (UNSET, PUSH, LOAD, STORE, ADD, SUB, MUL, DIV, EQ, NEQ, LT, GT, LE, GE, PRINT, SHOUT,
+                           WHISPER, LAUGH, MURMUR, PANIC, PAUSE, SLEEP, INPUT, JMP, JZ, ADD_NUM, CONCAT, INC,
+                           INC_VAR, LOAD_PUSH, LOAD_LOAD, LT_JZ, GT_JZ, LE_JZ, GE_JZ, EQ_JZ, NEQ_JZ, JUMP_OPS)
+from core.semantic_analyzer import ValueType, NUMERIC, join, numeric_result
+
+# Backward jumps to a loop header before the loop is compiled
+HOT_LOOP_THRESHOLD = 200
+
+# Failed entry guards after which a loop stays in the interpreter for good
+MAX_DEOPTS = 3
+
+# The compiled loop hands these back to the interpreter by returning their PC
+EXIT_OPS = (INPUT, PANIC, PAUSE, SLEEP)
+
+ENTRY_TYPES = {int: ValueType.INT, float: ValueType.FLOAT, str: ValueType.STR}
+GUARDS = {ValueType.INT: "int", ValueType.FLOAT: "float", ValueType.STR: "str"}
+
+COMPARISONS = {EQ: "==", NEQ: "!=", LT: "<", GT: ">", LE: "<=", GE: ">="}
+COMPARE_BRANCHES = {EQ_JZ: "==", NEQ_JZ: "!=", LT_JZ: "<", GT_JZ: ">", LE_JZ: "<=", GE_JZ: ">="}
+ARITHMETIC = {SUB: "-", MUL: "*"}
+
+# Locals holding flushed stack values
+STACK_TEMP = re.compile(r"s\d+")
+
+
+class Uncompilable(Exception):
+    """The loop uses stack code the loop compiler does not translate."""
+
+
+class Value:
+    """A symbolic operand stack entry: a Python expression and what is known about its type."""
+    def __init__(self, expr, type, condition=None):
+        self.expr = expr
+        self.type = type
+        self.condition = condition  # for comparisons: the bare test, so a JZ can branch on it
+
+
+def arithmetic_type(a, b):
+    """Type of `a + b`, `a - b` or `a * b` on two numbers."""
+    if a.type in NUMERIC and b.type in NUMERIC:
+        return numeric_result(a.type, b.type)
+    return ValueType.DYNAMIC
+
+
+class LoopCompiler:
+    """
+    Translates the instructions of one `think while` loop, from its header
+    (the target of a backward jump) to the last jump back to it, into a
+    Python function
+
+        def loop(frame, out): ...
+
+    that runs the loop to completion and returns the PC the interpreter
+    continues at. Program variables become locals loaded from the frame on
+    entry and written back on the way out, constants are inlined, and the
+    operand stack disappears into expressions. Each basic block is one
+    `if pc == ...` arm of a `while True` dispatch.
+
+    Code is specialized on the types the variables hold when the loop is
+    compiled: the types are propagated through the loop to a fixpoint, `+`
+    of two known numbers or strings is emitted as a plain `+`, and the
+    function starts with a guard that returns None, sending the caller back
+    to the interpreter, when a variable arrives with a different type.
+    INPUT, PANIC, PAUSE and SLEEP are left to the interpreter.
+
+    A `metered` loop, for runs under a core.governor.Governor, is
+    `def loop(frame, out, meter)`: it runs at most `meter.budget`
+    iterations before returning the header PC, leaves the iterations it did
+    not use in `meter.budget`, passes every string it concatenates
+    through `meter.string()` and multiplies anything but two known numbers
+    with `meter.repeat()`.
+    """
+    def __init__(self, program, header, frame, metered=False):
+        self.program = program
+        self.metered = metered
+        self.start = header
+        ends = [pc for pc in range(header, len(program.ops))
+                if program.ops[pc] in JUMP_OPS and program.args[pc] == header]
+        if not ends:
+            raise Uncompilable(f"No jump back to PC {header}")
+        self.end = max(ends)
+        self.frame = frame
+        self.constants = {}
+
+    def compile(self):
+        """Return the compiled loop function; raises Uncompilable."""
+        from core.py_backend import RUNTIME
+
+        blocks = self.blocks()
+        globals_used = sorted({slot for lo, hi in blocks for pc in range(lo, hi) for slot in self.slots(pc)
+                               if slot < self.program.global_count})
+        self.entry = {slot: self.entry_type(self.frame[slot]) for slot in globals_used}
+        self.unset = {slot for slot in globals_used if self.frame[slot] is UNSET}
+
+        types = dict(self.entry)
+        while True:
+            self.stored = {}
+            code = [self.block(lo, hi, types) for lo, hi in blocks]
+            widened = {slot: join(types[slot], self.stored.get(slot)) for slot in types}
+            if widened == types:
+                break
+            types = widened
+
+        read = sorted({slot for lo, hi in blocks for pc in range(lo, hi) for slot in self.slots(pc, reads=True)
+                       if slot in self.entry})
+        written = sorted(slot for slot in self.stored if slot in self.entry)
+        lines = ["def loop(frame, out, meter):" if self.metered else "def loop(frame, out):"]
+        lines += [f"    v{slot} = frame[{slot}]" for slot in globals_used]
+        guards = []
+        for slot in read:
+            if slot in self.unset:
+                guards.append(f"v{slot} is not UNSET")
+            elif self.entry[slot] in GUARDS:
+                guards.append(f"type(v{slot}) is not {GUARDS[self.entry[slot]]}")
+        if guards:
+            lines += [f"    if {' or '.join(guards)}:", "        return None"]
+        if self.metered:
+            lines.append("    budget = meter.budget")
+        lines += ["    try:", f"        pc = {self.start}", "        while True:"]
+        for n, ((lo, hi), body) in enumerate(zip(blocks, code)):
+            if body[-2:] == [f"pc = {hi}", "continue"] and n + 1 < len(blocks):
+                body = body[:-1]  # fall into the next arm, whose test holds
+            if self.metered and lo == self.start:
+                body = ["if budget <= 0:", f"    return {lo}", "budget -= 1"] + body
+            lines.append(f"            if pc == {lo}:")
+            lines += [f"                {line}" for line in body]
+        lines.append("    finally:")
+        lines += [f"        frame[{slot}] = v{slot}" for slot in written]
+        if self.metered:
+            lines.append("        meter.budget = budget")
+        if lines[-1] == "    finally:":
+            lines.append("        pass")
+
+        namespace = dict(RUNTIME, UNSET=UNSET, **self.constants)
+        exec(compile("\n".join(lines), f"<loop @{self.start}>", "exec"), namespace)
+        loop = namespace["loop"]
+        loop.source = "\n".join(lines)
+        return loop
+
+    def entry_type(self, value):
+        if value is UNSET:
+            return None
+        return ENTRY_TYPES.get(type(value), ValueType.DYNAMIC)
+
+    def blocks(self):
+        ops = self.program.ops
+        args = self.program.args
+        leaders = {self.start}
+        for pc in range(self.start, self.end + 1):
+            if ops[pc] in JUMP_OPS:
+                if self.start <= args[pc] <= self.end:
+                    leaders.add(args[pc])
+                leaders.add(pc + 1)
+            elif ops[pc] in EXIT_OPS:
+                leaders.add(pc + 1)
+        leaders = sorted(pc for pc in leaders if pc <= self.end)
+        return list(zip(leaders, leaders[1:] + [self.end + 1]))
+
+    def slots(self, pc, reads=False):
+        """Frame slots instruction `pc` reads (and, unless `reads`, writes)."""
+        op = self.program.ops[pc]
+        arg = self.program.args[pc]
+        operands = self.program.operands
+        if op == LOAD or (op == STORE and not reads):
+            return (arg,)
+        if op == INC or op == LOAD_PUSH:
+            return (operands[arg],)
+        if op == INC_VAR or op == LOAD_LOAD:
+            return (operands[arg], operands[arg + 1])
+        return ()
+
+    def constant(self, index):
+        value = self.program.constants[index]
+        if isinstance(value, float) and not math.isfinite(value):
+            self.constants[f"k{index}"] = value
+            return Value(f"k{index}", ValueType.FLOAT)
+        if isinstance(value, str):
+            return Value(repr(value), ValueType.STR)
+        return Value(repr(value), ValueType.FLOAT if isinstance(value, float) else ValueType.INT)
+
+    def block(self, lo, hi, types):
+        """Python statements for the instructions lo..hi-1, under the variable types `types`."""
+        program = self.program
+        names = program.names
+        operands = program.operands
+        local = dict(types)
+        stack = []
+        lines = []
+        temps = [0]
+
+        def push(value):
+            stack.append(value)
+
+        def pop():
+            if not stack:
+                raise Uncompilable(f"Operand stack crosses the block starting at PC {lo}")
+            return stack.pop()
+
+        def flush():
+            # Pending expressions are evaluated before any side effect, in push order
+            for n, value in enumerate(stack):
+                if not STACK_TEMP.fullmatch(value.expr):
+                    temp = f"s{temps[0]}"
+                    temps[0] += 1
+                    lines.append(f"{temp} = {value.expr}")
+                    stack[n] = Value(temp, value.type)
+
+        def load(slot):
+            if slot in self.unset:
+                lines.append(f"if v{slot} is UNSET: raise ValueError({f'Variable {names[slot]} not defined'!r})")
+            value_type = local.get(slot)
+            return Value(f"v{slot}", value_type if value_type is not None else ValueType.DYNAMIC)
+
+        def store(slot, value):
+            flush()
+            lines.append(f"v{slot} = {value.expr}")
+            local[slot] = value.type
+            self.stored[slot] = join(self.stored.get(slot), value.type)
+
+        def goto(target):
+            if stack:
+                raise Uncompilable(f"Operand stack not empty at the jump to PC {target}")
+            if self.start <= target <= self.end:
+                return [f"pc = {target}", "continue"]
+            return [f"return {target}"]
+
+        def add(a, b):
+            if a.type in NUMERIC and b.type in NUMERIC:
+                return Value(f"({a.expr} + {b.expr})", arithmetic_type(a, b))
+            if a.type == ValueType.STR or b.type == ValueType.STR:
+                return concat(a, b)
+            return metered(Value(f"_add({a.expr}, {b.expr})", ValueType.DYNAMIC))
+
+        def concat(a, b):
+            left = a.expr if a.type == ValueType.STR else f"str({a.expr})"
+            right = b.expr if b.type == ValueType.STR else f"str({b.expr})"
+            return metered(Value(f"({left} + {right})", ValueType.STR))
+
+        def metered(value):
+            if self.metered:
+                return Value(f"meter.string({value.expr})", value.type)
+            return value
+
+        def text(value):
+            return value.expr if value.type == ValueType.STR else f"str({value.expr})"
+
+        for pc in range(lo, hi):
+            op = program.ops[pc]
+            arg = program.args[pc]
+            if op == PUSH:
+                push(self.constant(arg))
+            elif op == LOAD:
+                push(load(arg))
+            elif op == STORE:
+                store(arg, pop())
+            elif op == LOAD_PUSH:
+                push(load(operands[arg]))
+                push(self.constant(operands[arg + 1]))
+            elif op == LOAD_LOAD:
+                push(load(operands[arg]))
+                push(load(operands[arg + 1]))
+            elif op == INC or op == INC_VAR:
+                slot = operands[arg]
+                value = load(slot)
+                other = self.constant(operands[arg + 1]) if op == INC else load(operands[arg + 1])
+                store(slot, Value(f"v{slot} + {other.expr}", arithmetic_type(value, other)))
+            elif op == ADD:
+                b = pop()
+                push(add(pop(), b))
+            elif op == ADD_NUM:
+                b = pop()
+                a = pop()
+                push(Value(f"({a.expr} + {b.expr})", arithmetic_type(a, b)))
+            elif op == CONCAT:
+                b = pop()
+                push(concat(pop(), b))
+            elif op in ARITHMETIC:
+                b = pop()
+                a = pop()
+                if op == MUL and self.metered and not (a.type in NUMERIC and b.type in NUMERIC):
+                    # Might repeat a string: the meter checks its length before building it
+                    push(Value(f"meter.repeat({a.expr}, {b.expr})", ValueType.DYNAMIC))
+                else:
+                    push(Value(f"({a.expr} {ARITHMETIC[op]} {b.expr})", arithmetic_type(a, b)))
+            elif op == DIV:
+                b = pop()
+                a = pop()
+                result_type = ValueType.FLOAT if a.type in NUMERIC and b.type in NUMERIC else ValueType.DYNAMIC
+                push(Value(f"_div({a.expr}, {b.expr})", result_type))
+            elif op in COMPARISONS:
+                b = pop()
+                test = f"{pop().expr} {COMPARISONS[op]} {b.expr}"
+                push(Value(f"(1 if {test} else 0)", ValueType.INT, test))
+            elif op == PRINT:
+                value = pop()
+                flush()
+                lines.append(f"out({text(value)})")
+            elif op == SHOUT:
+                value = pop()
+                flush()
+                lines.append(f"out({text(value)}.upper() + '!')")
+            elif op == WHISPER:
+                value = pop()
+                flush()
+                lines.append(f"out({text(value)}.lower() + '...')")
+            elif op == LAUGH:
+                value = pop()
+                flush()
+                lines.append(f"out({text(value)} + '😂')")
+            elif op == MURMUR:
+                value = pop()
+                flush()
+                lines.append(f"out(_murmur({value.expr}))")
+            elif op == JZ:
+                condition = pop()
+                test = f"not ({condition.condition})" if condition.condition else f"{condition.expr} == 0"
+                flush()
+                lines.append(f"if {test}:")
+                lines += [f"    {line}" for line in goto(arg)]
+            elif op in COMPARE_BRANCHES:
+                b = pop()
+                a = pop()
+                flush()
+                lines.append(f"if not ({a.expr} {COMPARE_BRANCHES[op]} {b.expr}):")
+                lines += [f"    {line}" for line in goto(arg)]
+            elif op == JMP:
+                lines += goto(arg)
+                return lines
+            elif op in EXIT_OPS:
+                if stack:
+                    raise Uncompilable(f"Operand stack not empty at PC {pc}")
+                lines.append(f"return {pc}")
+                return lines
+            else:
+                raise Uncompilable(f"Unknown opcode {op} at PC {pc}")
+        return lines + goto(hi)
+
+
+class HotLoops:
+    """
+    Tiered execution of one program: counts the backward jumps that reach
+    each loop header and, once a loop has come round HOT_LOOP_THRESHOLD
+    times, runs it as a LoopCompiler function instead of instruction by
+    instruction. Loops that never get hot are never compiled, so short
+    scripts pay nothing but the counting.
+
+    When a compiled loop's entry guard fails (a variable changed type) the
+    interpreter runs the loop again; the loop becomes a candidate for a
+    fresh compile under the new types, until it has failed MAX_DEOPTS
+    times and stays interpreted.
+    """
+    def __init__(self, program, threshold=HOT_LOOP_THRESHOLD, metered=False):
+        self.program = program
+        self.threshold = threshold
+        self.metered = metered
+        self.counts = {}
+        self.compiled = {}
+        self.deopts = {}
+        self.rejected = set()
+        self.stats = {"compiled": 0, "entries": 0, "deopts": 0, "rejected": 0}
+
+    def enter(self, header, frame, output, meter=None):
+        """
+        Called on a backward jump to `header`; returns the PC to continue
+        interpreting at. Metered loops get `meter`, see LoopCompiler.
+        """
+        loop = self.compiled.get(header)
+        if loop is not None:
+            exit_pc = loop(frame, output.append) if meter is None else loop(frame, output.append, meter)
+            if exit_pc is not None:
+                self.stats["entries"] += 1
+                return exit_pc
+            self.deoptimize(header)
+            return header
+        count = self.counts.get(header, 0) + 1
+        self.counts[header] = count
+        if count >= self.threshold and header not in self.rejected:
+            try:
+                self.compiled[header] = LoopCompiler(self.program, header, frame, self.metered).compile()
+            except Uncompilable:
+                self.rejected.add(header)
+                self.stats["rejected"] += 1
+                return header
+            self.stats["compiled"] += 1
+            return self.enter(header, frame, output, meter)
+        return header
+
+    def deoptimize(self, header):
+        del self.compiled[header]
+        self.counts[header] = 0
+        self.deopts[header] = self.deopts.get(header, 0) + 1
+        self.stats["deopts"] += 1
+        if self.deopts[header] >= MAX_DEOPTS:
+            self.rejected.add(header)
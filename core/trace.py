@@ -0,0 +1,74 @@
+import collections
+
+# Trace levels, from least to most verbose
+OFF = 0
+INFO = 1    # one message per stage run (counts, completion)
+DEBUG = 2   # one message per token / statement / instruction
+
+STAGES = ("lexer", "parser", "codegen", "vm")
+
+
+def print_sink(stage, message):
+    print(f"[{stage}] {message}")
+
+
+class RingBufferSink:
+    """Keep only the most recent `capacity` trace messages in memory."""
+    def __init__(self, capacity=1000):
+        self.records = collections.deque(maxlen=capacity)
+
+    def __call__(self, stage, message):
+        self.records.append((stage, message))
+
+    def __len__(self):
+        return len(self.records)
+
+    def messages(self, stage=None):
+        return [message for s, message in self.records if stage is None or s == stage]
+
+    def clear(self):
+        self.records.clear()
+
+
+class Tracer:
+    """
+    Routes trace messages from the compiler stages and the VM to a sink.
+    A sink is any callable taking (stage, message), e.g. print_sink, a
+    RingBufferSink or a user callback.
+
+    Stages ask for a channel once, before their hot loop. A disabled stage
+    gets None instead of a function, so call sites written as
+    `if trace: trace(f"...")` never build the message and cost a single
+    truth test of a local when tracing is off.
+    """
+    def __init__(self, level=OFF, stages=None, sink=None):
+        self.level = level
+        self.stages = set(STAGES if stages is None else stages)
+        self.sink = sink if sink is not None else print_sink
+
+    def enabled(self, stage, level=DEBUG):
+        return self.level >= level and stage in self.stages
+
+    def channel(self, stage, level=DEBUG):
+        if not self.enabled(stage, level):
+            return None
+        sink = self.sink
+
+        def emit(message):
+            sink(stage, message)
+        return emit
+
+
+_default_tracer = Tracer()
+
+
+def get_tracer():
+    return _default_tracer
+
+
+def set_tracer(tracer):
+    """Install `tracer` as the default for stages created without one; returns the previous tracer."""
+    global _default_tracer
+    previous = _default_tracer
+    _default_tracer = tracer if tracer is not None else Tracer()
+    return previous
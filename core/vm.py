@@ -1,250 +1,535 @@
+import asyncio
 import time
 
+from core.bytecode import (Bytecode, assemble, UNSET, OPNAMES, PUSH, LOAD, STORE, ADD, SUB, MUL, DIV, EQ, NEQ,
+                           LT, GT, LE, GE, PRINT, SHOUT, WHISPER, LAUGH, MURMUR, PANIC, PAUSE, SLEEP,
+                           INPUT, JMP, JZ, ADD_NUM, CONCAT, INC, INC_VAR, LOAD_PUSH, LOAD_LOAD, LT_JZ, GT_JZ,
+                           LE_JZ, GE_JZ, EQ_JZ, NEQ_JZ)
+from core.governor import UNLIMITED, Governor, repeated_length
+from core.profiler import Profile
+from core.threaded import ThreadedCode, traced_handlers
+from core.tiering import HotLoops
+from core.trace import get_tracer
+
+ENGINES = ("switch", "threaded")
+
+# Instructions run_async executes between two turns of the event loop
+YIELD_EVERY = 1000
+
+
+class SystemClock:
+    """PAUSE waits for real: blocking in run(), awaiting asyncio.sleep in run_async()."""
+    sleep = staticmethod(time.sleep)
+    sleep_async = staticmethod(asyncio.sleep)
+
+
+class VirtualClock:
+    """
+    Simulated time for batch and test runs: PAUSE adds to `now` and
+    returns at once (run_async still yields to the event loop).
+    """
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    async def sleep_async(self, seconds):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
 class VirtualMachine:
-    def __init__(self):
+    def __init__(self, tracer=None, tiering=True, clock=None):
+        self.tracer = tracer
+        self.tiering = tiering
+        self.clock = clock or SystemClock()
         self.stack = []
         self.variables = {}
-        self.labels = {}
         self.pc = 0
         self.output = []
+        self._threaded = None
+        self._suspending = None
+        self.hot_loops = None
+        self.governor = None
+        self.last_profile = None
 
-    def _is_float(self, value):
-        """Check if a string represents a valid float"""
-        try:
-            float(value)
-            return True
-        except ValueError:
-            return False
+    def execute(self, instructions, input_value=None, engine="switch"):
+        # Plain stack code is decoded once up front; the loop below only ever
+        # sees integer opcodes, pooled constants and resolved jump targets.
+        if isinstance(instructions, Bytecode):
+            program = instructions
+        else:
+            program = assemble(instructions)
+        return self.run(program, input_value, engine)
+
+    def run(self, program, input_value=None, engine="switch", sink=None, limits=None):
+        """
+        Execute an assembled program and return its output.
+
+        engine="switch" interprets the bytecode with a dispatch chain;
+        engine="threaded" runs it as pre-built per-instruction closures
+        (see core.threaded). Both produce identical results.
+
+        With tiering on, both engines hand loops that get hot over to
+        compiled Python functions (see core.tiering.HotLoops). Tracing
+        turns tiering off, since compiled loops report no instructions.
+
+        PAUSE sleeps on the VM's clock: for real (SystemClock) unless a
+        VirtualClock was given.
+
+        Output lines are collected and returned joined, unless a `sink` is
+        given (anything with an append(line) method, see core.sinks): then
+        each line goes to the sink as it is produced and run returns None.
+
+        `limits` (a core.governor.Limits) bounds the run's fuel, stack,
+        strings, output and wall time; going over one raises
+        core.governor.ResourceLimitExceeded. `self.governor` then holds the
+        counters of the last limited run.
+        """
+        if engine == "threaded":
+            return self._run_threaded(program, input_value, sink, limits)
+        if engine != "switch":
+            raise ValueError(f"Unknown engine: {engine}")
 
-    def execute(self, instructions, input_value=None):
         self.stack = []
+        self.frame = program.new_frame()
         self.variables = {}
-        self.labels = {}
         self.pc = 0
-        self.output = []
+        self.output = [] if sink is None else sink
         self.input_value = input_value if input_value else []
         self.input_index = 0
 
-        for i, instr in enumerate(instructions):
-            if instr.startswith("LABEL "):
-                label = instr.split()[1]
-                self.labels[label] = i
-
-        while self.pc < len(instructions):
-            instr = instructions[self.pc]
-            print(f"Executing instruction at PC {self.pc}: {instr}")
-
-            if instr.startswith('PUSH "'):
-                opcode = "PUSH"
-                end_quote = instr.rfind('"')
-                if end_quote == -1 or end_quote <= 5:
-                    raise ValueError(f"Malformed PUSH instruction: {instr}")
-                args = instr[5:end_quote+1]
-            elif instr.startswith('INPUT "'):
-                opcode = "INPUT"
-                end_quote = instr.rfind('"', 7, len(instr)-1)
-                if end_quote == -1:
-                    raise ValueError(f"Malformed INPUT instruction: {instr}")
-                prompt = instr[7:end_quote]
-                var = instr[end_quote+2:].strip()
-                args = f'"{prompt}" {var}'
-            elif instr.startswith('PANIC "'):
-                opcode = "PANIC"
-                args = instr[6:]
-            elif instr.startswith('JZ '):
-                opcode = "JZ"
-                # JZ now has format "JZ label"
-                parts = instr.split(maxsplit=1)
-                args = parts[1] if len(parts) > 1 else ""
-            else:
-                parts = instr.split(maxsplit=1)
-                opcode = parts[0]
-                args = parts[1] if len(parts) > 1 else ""
-
-            print(f"  Opcode: {opcode}, Args: {args}")
-
-            if opcode == "PUSH":
-                value = args
-                if value.isdigit():
-                    self.stack.append(int(value))
-                    print(f"  Pushed numeric value: {value}")
-                elif value.startswith('"') and value.endswith('"'):
-                    self.stack.append(value[1:-1])
-                    print(f"  Pushed string value: {value[1:-1]}")
-                else:
-                    raise ValueError(f"Invalid PUSH argument: {value}")
-            elif opcode == "LOAD":
-                var = args
-                if var not in self.variables:
-                    raise ValueError(f"Variable {var} not defined")
-                self.stack.append(self.variables[var])
-                print(f"  Loaded variable {var}: {self.variables[var]}")
-            elif opcode == "STORE":
-                var = args
-                if not self.stack:
-                    raise ValueError("Stack underflow on STORE")
-                self.variables[var] = self.stack.pop()
-                print(f"  Stored {self.variables[var]} in variable {var}")
-            elif opcode == "ADD":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on ADD")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                if isinstance(a, str) or isinstance(b, str):
-                    self.stack.append(str(a) + str(b))
-                    print(f"  Concatenated {a} + {b} = {self.stack[-1]}")
-                else:
-                    self.stack.append(a + b)
-                    print(f"  Added {a} + {b} = {self.stack[-1]}")
-            elif opcode == "SUB":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on SUB")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a - b)
-                print(f"  Subtracted {a} - {b} = {self.stack[-1]}")
-            elif opcode == "MUL":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on MUL")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(a * b)
-                print(f"  Multiplied {a} * {b} = {self.stack[-1]}")
-            elif opcode == "DIV":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on DIV")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                if b == 0:
-                    raise ValueError("Division by zero")
-                self.stack.append(a / b)
-                print(f"  Divided {a} / {b} = {self.stack[-1]}")
-            elif opcode == "EQ":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on EQ")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a == b else 0)
-                print(f"  Compared {a} == {b}: {self.stack[-1]}")
-            elif opcode == "NEQ":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on NEQ")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a != b else 0)
-                print(f"  Compared {a} != {b}: {self.stack[-1]}")
-            elif opcode == "LT":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on LT")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a < b else 0)
-                print(f"  Compared {a} < {b}: {self.stack[-1]}")
-            elif opcode == "GT":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on GT")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a > b else 0)
-                print(f"  Compared {a} > {b}: {self.stack[-1]}")
-            elif opcode == "LE":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on LE")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a <= b else 0)
-                print(f"  Compared {a} <= {b}: {self.stack[-1]}")
-            elif opcode == "GE":
-                if len(self.stack) < 2:
-                    raise ValueError("Stack underflow on GE")
-                b = self.stack.pop()
-                a = self.stack.pop()
-                self.stack.append(1 if a >= b else 0)
-                print(f"  Compared {a} >= {b}: {self.stack[-1]}")
-            elif opcode == "PRINT":
-                if not self.stack:
-                    raise ValueError("Stack underflow on PRINT")
-                value = self.stack.pop()
-                self.output.append(str(value))
-                print(f"  Printed: {value}")
-            elif opcode == "SHOUT":
-                if not self.stack:
-                    raise ValueError("Stack underflow on SHOUT")
-                value = self.stack.pop()
-                self.output.append(str(value).upper() + "!")
-                print(f"  Shouted: {self.output[-1]}")
-            elif opcode == "WHISPER":
-                if not self.stack:
-                    raise ValueError("Stack underflow on WHISPER")
-                value = self.stack.pop()
-                self.output.append(str(value).lower() + "...")
-                print(f"  Whispered: {self.output[-1]}")
-            elif opcode == "LAUGH":
-                if not self.stack:
-                    raise ValueError("Stack underflow on LAUGH")
-                value = self.stack.pop()
-                self.output.append(str(value) + "😂")
-                print(f"  Laughed: {self.output[-1]}")
-            elif opcode == "MURMUR":
-                if not self.stack:
-                    raise ValueError("Stack underflow on MURMUR")
-                value = self.stack.pop()
-                self.output.append(str(value).lower() + "... " + str(value).lower())
-                print(f"  Murmured: {self.output[-1]}")
-            elif opcode == "PANIC":
-                message = args
-                if message.startswith('"') and message.endswith('"'):
-                    message = message[1:-1]
-                raise ValueError(f"PANIC: {message}")
-            elif opcode == "PAUSE":
-                time.sleep(1)
-                print("  Paused for 1 second")
-            elif opcode == "SLEEP":
-                print("  Sleeping (program end)")
-                break
-            elif opcode == "INPUT":
-                prompt_end = args.rfind('"', 1)
-                prompt = args[1:prompt_end]
-                var = args[prompt_end+2:].strip()
-                if self.input_index < len(self.input_value):
-                    input_value = self.input_value[self.input_index]
-                    # Try to convert to number if it looks like a number
-                    if isinstance(input_value, str) and input_value.strip().isdigit():
-                        self.variables[var] = int(input_value.strip())
-                    elif isinstance(input_value, str) and self._is_float(input_value.strip()):
-                        self.variables[var] = float(input_value.strip())
+        ops = program.ops
+        args = program.args
+        constants = program.constants
+        names = program.names
+        operands = program.operands
+        stack = self.stack
+        frame = self.frame
+        output = self.output
+        push = stack.append
+        pop = stack.pop
+        sleep = self.clock.sleep
+        end = len(ops)
+        pc = 0
+        op = None
+        trace = self._trace()
+        tiered = self.tiering and not trace
+        governor = None
+        max_string = UNLIMITED
+        if limits is not None:
+            # The governor sees every backward jump in place of HotLoops, and all output
+            governor = loops = self._governor(program, tiered)
+            output = governor.start(limits, stack, output, sleep)
+            sleep = governor.sleep
+            max_string = governor.max_string
+        else:
+            loops = self._hot_loops(program) if tiered else None
+
+        try:
+            while pc < end:
+                op = ops[pc]
+                arg = args[pc]
+                if trace: trace(f"PC {pc}: {program.render(pc)}  stack={stack}")
+
+                if op == LOAD:
+                    value = frame[arg]
+                    if value is UNSET:
+                        raise ValueError(f"Variable {names[arg]} not defined")
+                    push(value)
+                elif op == PUSH:
+                    push(constants[arg])
+                elif op == STORE:
+                    frame[arg] = pop()
+                elif op == LOAD_PUSH:
+                    slot = operands[arg]
+                    value = frame[slot]
+                    if value is UNSET:
+                        raise ValueError(f"Variable {names[slot]} not defined")
+                    push(value)
+                    push(constants[operands[arg + 1]])
+                elif op == LT_JZ:
+                    b = pop()
+                    if not pop() < b:
+                        pc = arg if arg > pc or loops is None else loops.enter(arg, frame, output)
+                        continue
+                elif op == INC:
+                    slot = operands[arg]
+                    value = frame[slot]
+                    if value is UNSET:
+                        raise ValueError(f"Variable {names[slot]} not defined")
+                    frame[slot] = value + constants[operands[arg + 1]]
+                elif op == INC_VAR:
+                    slot = operands[arg]
+                    value = frame[slot]
+                    if value is UNSET:
+                        raise ValueError(f"Variable {names[slot]} not defined")
+                    other = frame[operands[arg + 1]]
+                    if other is UNSET:
+                        raise ValueError(f"Variable {names[operands[arg + 1]]} not defined")
+                    frame[slot] = value + other
+                elif op == LOAD_LOAD:
+                    slot = operands[arg]
+                    value = frame[slot]
+                    if value is UNSET:
+                        raise ValueError(f"Variable {names[slot]} not defined")
+                    push(value)
+                    slot = operands[arg + 1]
+                    value = frame[slot]
+                    if value is UNSET:
+                        raise ValueError(f"Variable {names[slot]} not defined")
+                    push(value)
+                elif op == JZ:
+                    condition = pop()
+                    if condition == 0:
+                        pc = arg if arg > pc or loops is None else loops.enter(arg, frame, output)
+                        continue
+                elif op == JMP:
+                    # A jump back to a loop header lets the loop run compiled once it is hot
+                    pc = arg if arg > pc or loops is None else loops.enter(arg, frame, output)
+                    continue
+                elif op == ADD_NUM:
+                    b = pop()
+                    push(pop() + b)
+                elif op == CONCAT:
+                    b = pop()
+                    value = str(pop()) + str(b)
+                    if len(value) > max_string:
+                        raise governor.exceeded("max_string", pc)
+                    push(value)
+                elif op == ADD:
+                    b = pop()
+                    a = pop()
+                    if isinstance(a, str) or isinstance(b, str):
+                        value = str(a) + str(b)
+                        if len(value) > max_string:
+                            raise governor.exceeded("max_string", pc)
+                        push(value)
                     else:
-                        self.variables[var] = input_value
-                    self.input_index += 1
-                    print(f"  Input {var} = {self.variables[var]}")
+                        push(a + b)
+                elif op == SUB:
+                    b = pop()
+                    a = pop()
+                    push(a - b)
+                elif op == MUL:
+                    b = pop()
+                    a = pop()
+                    if (isinstance(a, str) or isinstance(b, str)) and repeated_length(a, b) > max_string:
+                        raise governor.exceeded("max_string", pc)
+                    push(a * b)
+                elif op == DIV:
+                    b = pop()
+                    a = pop()
+                    if b == 0:
+                        raise ValueError("Division by zero")
+                    push(a / b)
+                elif op == LT:
+                    b = pop()
+                    a = pop()
+                    push(1 if a < b else 0)
+                elif op == GT:
+                    b = pop()
+                    a = pop()
+                    push(1 if a > b else 0)
+                elif op == EQ:
+                    b = pop()
+                    a = pop()
+                    push(1 if a == b else 0)
+                elif op == NEQ:
+                    b = pop()
+                    a = pop()
+                    push(1 if a != b else 0)
+                elif op == LE:
+                    b = pop()
+                    a = pop()
+                    push(1 if a <= b else 0)
+                elif op == GE:
+                    b = pop()
+                    a = pop()
+                    push(1 if a >= b else 0)
+                elif op == GT_JZ:
+                    b = pop()
+                    if not pop() > b:
+                        pc = arg if arg > pc or loops is None else loops.enter(arg, frame, output)
+                        continue
+                elif op == LE_JZ:
+                    b = pop()
+                    if not pop() <= b:
+                        pc = arg if arg > pc or loops is None else loops.enter(arg, frame, output)
+                        continue
+                elif op == GE_JZ:
+                    b = pop()
+                    if not pop() >= b:
+                        pc = arg if arg > pc or loops is None else loops.enter(arg, frame, output)
+                        continue
+                elif op == EQ_JZ:
+                    b = pop()
+                    if not pop() == b:
+                        pc = arg if arg > pc or loops is None else loops.enter(arg, frame, output)
+                        continue
+                elif op == NEQ_JZ:
+                    b = pop()
+                    if not pop() != b:
+                        pc = arg if arg > pc or loops is None else loops.enter(arg, frame, output)
+                        continue
+                elif op == PRINT:
+                    output.append(str(pop()))
+                elif op == SHOUT:
+                    output.append(str(pop()).upper() + "!")
+                elif op == WHISPER:
+                    output.append(str(pop()).lower() + "...")
+                elif op == LAUGH:
+                    output.append(str(pop()) + "😂")
+                elif op == MURMUR:
+                    value = str(pop()).lower()
+                    output.append(value + "... " + value)
+                elif op == PANIC:
+                    raise ValueError(f"PANIC: {constants[arg]}")
+                elif op == PAUSE:
+                    sleep(1)
+                elif op == SLEEP:
+                    break
+                elif op == INPUT:
+                    frame[arg] = self._next_input(names[arg])
                 else:
-                    raise ValueError(f"No input provided for INPUT {var}")
-            elif opcode == "JMP":
-                label = args
-                if label not in self.labels:
-                    raise ValueError(f"Label {label} not found")
-                self.pc = self.labels[label]
-                print(f"  Jumped to label {label} at PC {self.pc}")
-                continue
-            elif opcode == "JZ":
-                if not self.stack:
-                    raise ValueError("Stack underflow on JZ")
-                condition = self.stack.pop()
-                # The label is now directly in args
-                label = args
-                if label not in self.labels:
-                    raise ValueError(f"Label {label} not found")
-                if condition == 0:
-                    self.pc = self.labels[label]
-                    print(f"  Jumped on zero to label {label} at PC {self.pc}")
-                    continue
-                print(f"  JZ condition {condition}, no jump")
-            elif opcode == "LABEL":
-                print(f"  Label {args}")
-                pass
-            else:
-                raise ValueError(f"Unknown instruction: {instr}")
+                    raise ValueError(f"Unknown opcode: {op}")
+
+                pc += 1
+        except IndexError:
+            # Only the operand stack can run dry: ops/args are indexed by a PC
+            # that the assembler keeps in range.
+            raise ValueError(f"Stack underflow on {OPNAMES[op]}") from None
+        finally:
+            self.pc = pc
+            self.variables = program.variables(frame)
+            flush_sink(sink)
+
+        return "\n".join(self.output) if sink is None else None
+
+    def run_batch(self, program, inputs):
+        """
+        Run a program once per row of `inputs` (a row holds the values for
+        its INPUTs in order), vectorized over rows with NumPy; returns a
+        core.batch.RowResult per row. See core.batch.BatchVM.
+        """
+        # NumPy is only needed, and only imported, for batch runs
+        from core.batch import BatchVM
+        return BatchVM(self.clock).run(program, inputs)
 
-            self.pc += 1
+    async def run_async(self, program, input_value=None, sink=None, limits=None, yield_every=YIELD_EVERY):
+        """
+        Execute an assembled program as a coroutine and return its output.
 
-        return "\n".join(self.output)
\ No newline at end of file
+        PAUSE awaits the clock instead of blocking the thread, and control
+        goes back to the event loop every `yield_every` instructions, so
+        many scripts (one VirtualMachine each) can share one loop. Runs on
+        the threaded engine without tiering: a compiled loop could not yield.
+        Output goes to `sink` and `limits` apply as in run().
+        """
+        governor = self._governor(program, False) if limits is not None else None
+        out = governor.output if governor else sink
+        code = self._suspending
+        if code is None or code.program is not program or code.loops is not governor or code.sink is not out:
+            code = self._suspending = ThreadedCode(program, governor, suspend=True, sink=out)
+        handlers = self._start_threaded(code, input_value, governor, limits, sink)
+        sleep = self.clock.sleep_async
+        end = len(handlers)
+        pc = 0
+
+        try:
+            while pc < end:
+                for _ in range(yield_every):
+                    pc = handlers[pc]()
+                    if pc >= end:
+                        break
+                if pc > end:
+                    # A PAUSE suspended the run; it resumes at the instruction after it
+                    pc -= end + 1
+                    await sleep(1)
+                    if governor:
+                        governor.check_deadline()
+                elif pc < end:
+                    await asyncio.sleep(0)
+        except IndexError:
+            raise ValueError(f"Stack underflow on {OPNAMES[program.ops[pc]]}") from None
+        finally:
+            self.pc = pc
+            self.variables = program.variables(code.frame)
+            flush_sink(sink)
+
+        return "\n".join(self.output) if sink is None else None
+
+    def stream(self, program, input_value=None, limits=None, chunk=YIELD_EVERY):
+        """
+        Run a program as a generator of its output lines. Lines are handed
+        out after every `chunk` instructions, so at most that many are
+        ever held. Runs on the threaded engine without tiering: a compiled
+        loop could not stop to hand its lines out. `limits` apply as in run().
+        """
+        governor = self._governor(program, False) if limits is not None else None
+        out = governor.output if governor else None
+        code = self._threaded
+        if code is None or code.program is not program or code.loops is not governor or code.sink is not out:
+            code = self._threaded = ThreadedCode(program, governor, sink=out)
+        handlers = self._start_threaded(code, input_value, governor, limits)
+        output = self.output
+        end = len(handlers)
+        pc = 0
+
+        try:
+            while pc < end:
+                try:
+                    for _ in range(chunk):
+                        pc = handlers[pc]()
+                        if pc >= end:
+                            break
+                except Exception:
+                    # The lines printed before the error still reach the consumer
+                    yield from output[:]
+                    raise
+                if output:
+                    lines = output[:]
+                    output.clear()
+                    yield from lines
+        except IndexError:
+            raise ValueError(f"Stack underflow on {OPNAMES[program.ops[pc]]}") from None
+        finally:
+            self.pc = pc
+            self.variables = program.variables(code.frame)
+
+    def profile(self, program, input_value=None, sink=None):
+        """
+        Run a program like run() and return a core.profiler.Profile of how
+        often each instruction was dispatched and how long it took; its
+        by_line() and annotate() break that down by source line.
+
+        Profiling has a dispatch loop of its own on the threaded engine,
+        without tiering (a compiled loop would hide its instructions), so
+        run() pays nothing for it. The output is left in `self.output` (or
+        `sink`). `self.last_profile` keeps the profile even when the run
+        raises.
+        """
+        code = self._threaded
+        if code is None or code.program is not program or code.loops is not None or code.sink is not sink:
+            code = self._threaded = ThreadedCode(program, sink=sink)
+        handlers = self._start_threaded(code, input_value, sink=sink)
+        end = len(handlers)
+        counts = [0] * end
+        times = [0.0] * end
+        self.last_profile = Profile(program, counts, times)
+        clock = time.perf_counter
+        pc = 0
+
+        now = clock()
+        try:
+            while pc < end:
+                nxt = handlers[pc]()
+                then = now
+                now = clock()
+                counts[pc] += 1
+                times[pc] += now - then
+                pc = nxt
+        except BaseException as e:
+            # The instruction that raised is charged as well
+            counts[pc] += 1
+            times[pc] += clock() - now
+            if isinstance(e, IndexError):
+                raise ValueError(f"Stack underflow on {OPNAMES[program.ops[pc]]}") from None
+            raise
+        finally:
+            self.pc = pc
+            self.variables = program.variables(code.frame)
+            flush_sink(sink)
+
+        return self.last_profile
+
+    def _run_threaded(self, program, input_value, sink=None, limits=None):
+        tiered = self.tiering and not self._trace()
+        governor = self._governor(program, tiered) if limits is not None else None
+        loops = governor or (self._hot_loops(program) if tiered else None)
+        out = governor.output if governor else sink
+        # Closures are built once per program and reused by later runs
+        code = self._threaded
+        if code is None or code.program is not program or code.loops is not loops or code.sink is not out:
+            code = self._threaded = ThreadedCode(program, loops, sink=out)
+        handlers = self._start_threaded(code, input_value, governor, limits, sink)
+        end = len(handlers)
+        pc = 0
+
+        try:
+            while pc < end:
+                pc = handlers[pc]()
+        except IndexError:
+            raise ValueError(f"Stack underflow on {OPNAMES[program.ops[pc]]}") from None
+        finally:
+            self.pc = pc
+            self.variables = program.variables(code.frame)
+            flush_sink(sink)
+
+        return "\n".join(self.output) if sink is None else None
+
+    def _trace(self):
+        return (self.tracer or get_tracer()).channel("vm")
+
+    def _start_threaded(self, code, input_value, governor=None, limits=None, sink=None):
+        """Reset `code` for a new run by this VM and return the handlers to dispatch."""
+        code.reset()
+        code.read_input = self._next_input
+        code.sleep = self.clock.sleep
+        code.governor = governor
+        code.max_string = UNLIMITED
+        self.output = code.output
+        if governor:
+            governor.start(limits, code.stack, sink, self.clock.sleep)
+            code.sleep = governor.sleep
+            code.max_string = governor.max_string
+            self.output = governor.output.lines
+        self.stack = code.stack
+        self.frame = code.frame
+        self.variables = {}
+        self.input_value = input_value if input_value else []
+        self.input_index = 0
+        trace = self._trace()
+        if trace:
+            return traced_handlers(code, trace)
+        return code.handlers
+
+    def _governor(self, program, tiered):
+        """The Governor for limited runs of `program`, with compiled loops when `tiered`."""
+        governor = self.governor
+        if governor is None or governor.program is not program or (governor.loops is not None) != tiered:
+            governor = self.governor = Governor(program, HotLoops(program, metered=True) if tiered else None)
+        return governor
+
+    def _hot_loops(self, program):
+        loops = self.hot_loops
+        if loops is None or loops.program is not program:
+            loops = self.hot_loops = HotLoops(program)
+        return loops
+
+    def _next_input(self, var):
+        if self.input_index >= len(self.input_value):
+            raise ValueError(f"No input provided for INPUT {var}")
+        value = self.input_value[self.input_index]
+        self.input_index += 1
+        return convert_input(value)
+
+
+def flush_sink(sink):
+    """Push out whatever a buffering sink (a file, core.sinks.WriterSink) still holds."""
+    flush = getattr(sink, "flush", None)
+    if flush is not None:
+        flush()
+
+
+def convert_input(value):
+    """Turn a raw INPUT value into an int or float when it looks like a number."""
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    return value
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from core import vm as vm_module
+from core.compiler import compile_source
+from core.sinks import CallbackSink
+from core.vm import VirtualClock, VirtualMachine
+
+PROGRAMS = {
+    "loop": ('remember i = 0\nthink while i < 3000\n    update i = i + 1\nspeak "done " + i\n', []),
+    "pauses": ('remember i = 0\nthink while i < 5\n    pause\n    speak i\n    update i = i + 1\n', []),
+    "input": ('listen "n" n\nfeel n > 2\n    shout "big"\notherwise\n    whisper "SMALL"\n', ["7"]),
+    "panic": ('remember i = 0\nthink while i < 10\n    feel i == 4\n        panic "boom"\n    speak i\n'
+              '    update i = i + 1\n', []),
+    "missing-input": ('listen "n" n\nspeak n\n', []),
+}
+
+
+def outcome(run, source, inputs):
+    """Output, error and virtual time of running `source` with run(vm, program, inputs)."""
+    clock = VirtualClock()
+    vm = VirtualMachine(clock=clock)
+    try:
+        return run(vm, compile_source(source, 1).bytecode, list(inputs)), None, clock.now
+    except Exception as e:
+        return "\n".join(vm.output), f"{type(e).__name__}: {e}", clock.now
+
+
+@pytest.mark.parametrize("source, inputs", PROGRAMS.values(), ids=PROGRAMS.keys())
+@pytest.mark.parametrize("yield_every", [1, 7, 1000])
+def test_async_run_matches_run(source, inputs, yield_every):
+    expected = outcome(lambda vm, program, row: vm.run(program, row), source, inputs)
+    run_async = lambda vm, program, row: asyncio.run(vm.run_async(program, row, yield_every=yield_every))
+    assert outcome(run_async, source, inputs) == expected
+
+
+@pytest.mark.parametrize("yield_every", [1, 10, 250])
+def test_control_goes_back_to_the_loop_every_yield_every_instructions(monkeypatch, yield_every):
+    program = compile_source(PROGRAMS["loop"][0], 1).bytecode
+    profiler = VirtualMachine()
+    profiler.profile(program)
+    executed = profiler.last_profile.instructions
+
+    yields = []
+    original = asyncio.sleep
+
+    async def sleep(seconds):
+        yields.append(seconds)
+        await original(seconds)
+
+    monkeypatch.setattr(vm_module.asyncio, "sleep", sleep)
+    asyncio.run(VirtualMachine().run_async(program, yield_every=yield_every))
+    assert yields == [0] * (-(-executed // yield_every) - 1)
+
+
+def test_scripts_on_one_loop_take_turns():
+    lines = []
+    source = 'remember i = 0\nthink while i < 3\n    speak i\n    update i = i + 1\n'
+    program = compile_source(source, 1).bytecode
+
+    def script(name):
+        sink = CallbackSink(lambda line: lines.append(name + line))
+        return VirtualMachine().run_async(program, sink=sink, yield_every=1)
+
+    async def both():
+        await asyncio.gather(script("a"), script("b"))
+
+    asyncio.run(both())
+    assert lines[:2] in (["a0", "b0"], ["b0", "a0"])
+    assert sorted(lines) == ["a0", "a1", "a2", "b0", "b1", "b2"]
+
+
+def test_pause_advances_the_virtual_clock_without_sleeping():
+    source = 'remember i = 0\nthink while i < 1000\n    pause\n    update i = i + 1\nspeak "woke"\n'
+    clock = VirtualClock()
+    started = time.perf_counter()
+    output = asyncio.run(VirtualMachine(clock=clock).run_async(compile_source(source, 1).bytecode))
+    assert output == "woke"
+    assert clock.now == 1000
+    assert time.perf_counter() - started < 5
+
+
+def test_pauses_of_concurrent_scripts_overlap():
+    program = compile_source("pause\npause\nspeak 1\n", 1).bytecode
+
+    async def three():
+        return await asyncio.gather(*(VirtualMachine().run_async(program) for _ in range(3)))
+
+    started = time.perf_counter()
+    assert asyncio.run(three()) == ["1", "1", "1"]
+    # Three scripts pausing twice for a second each: about 2s together, not 6s one after another
+    assert time.perf_counter() - started < 4
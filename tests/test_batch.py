@@ -0,0 +1,99 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from core.batch import SAFE_INT, BatchVM, RowResult
+from core.compiler import compile_source
+from core.vm import VirtualClock, VirtualMachine
+
+OPT_LEVELS = (0, 1, 2)
+
+# Each row's values stay numbers, so every lane can stay vectorized
+ARITHMETIC = """listen "a" a
+listen "b" b
+remember total = 0
+remember i = 0
+think while i < a
+    update total = total + b * i - 1
+    update i = i + 1
+feel total > 100
+    speak "big " + total
+otherwise
+    whisper total / 4
+speak total * a
+"""
+
+# Doubling past SAFE_INT must carry on as Python ints
+DOUBLING = """listen "start" x
+remember i = 0
+think while i < 60
+    update x = x * 2
+    update i = i + 1
+speak x
+feel x > 9007199254740992
+    speak "past"
+"""
+
+DIVIDE = """listen "n" n
+listen "d" d
+feel n == 13
+    panic "unlucky"
+speak n / d
+"""
+
+PROGRAMS = {
+    "numeric": (ARITHMETIC, [[3, 5], [0, 1], [50, 7], [12, 2.5], [1, -8], [200, 0.125]]),
+    "strings": (ARITHMETIC, [["ab", 1], [2, "x"], ["0", "1"]]),
+    "mixed": (ARITHMETIC, [[3, 5], ["ab", 1], [7, 2.5], [4, "x"], [20, 3]]),
+    "overflow": (DOUBLING, [[1], [3], [-5], [0.5], [SAFE_INT], [2 ** 70]]),
+    "errors": (DIVIDE, [[10, 4], [7, 0], [13, 1], [1], [9, 3], [0, 0]]),
+}
+CASES = [pytest.param(source, rows, opt_level, id=f"{name}-O{opt_level}")
+         for name, (source, rows) in PROGRAMS.items() for opt_level in OPT_LEVELS]
+
+
+def scalar(program, row):
+    vm = VirtualMachine(clock=VirtualClock())
+    try:
+        return RowResult(vm.run(program, list(row)))
+    except Exception as e:
+        return RowResult("\n".join(vm.output), e)
+
+
+@pytest.mark.parametrize("source, rows, opt_level", CASES)
+def test_rows_match_scalar_runs(source, rows, opt_level):
+    program = compile_source(source, opt_level).bytecode
+    inputs = [[str(value) for value in row] for row in rows]
+    assert VirtualMachine(clock=VirtualClock()).run_batch(program, inputs) == \
+        [scalar(program, row) for row in inputs]
+
+
+def test_numeric_rows_stay_vectorized():
+    program = compile_source(ARITHMETIC, 1).bytecode
+    batch = BatchVM(VirtualClock())
+    batch.run(program, [[str(a), str(b)] for a, b in PROGRAMS["numeric"][1]])
+    assert batch.stats == {"rows": 6, "vectorized": 6, "fallback": 0}
+
+
+def test_only_failing_rows_fall_back():
+    program = compile_source(DIVIDE, 1).bytecode
+    batch = BatchVM(VirtualClock())
+    results = batch.run(program, [["10", "4"], ["7", "0"], ["13", "1"], ["9", "3"]])
+    assert batch.stats == {"rows": 4, "vectorized": 2, "fallback": 2}
+    assert [result.output for result in results] == ["2.5", "", "", "3.0"]
+    assert [str(result.error) if result.error else None for result in results] == [
+        None, "Division by zero", "PANIC: unlucky", None]
+
+
+def test_pause_sleeps_once_for_the_lanes_that_reach_it_together():
+    program = compile_source('listen "n" n\npause\nspeak n\n', 1).bytecode
+    clock = VirtualClock()
+    results = BatchVM(clock).run(program, [["1"], ["2"], ["3"]])
+    assert [result.output for result in results] == ["1", "2", "3"]
+    single = VirtualClock()
+    VirtualMachine(clock=single).run(program, ["1"])
+    assert clock.now == single.now
+
+
+def test_no_rows():
+    assert BatchVM().run(compile_source("speak 1\n", 1).bytecode, []) == []
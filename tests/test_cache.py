@@ -0,0 +1,81 @@
+import os
+
+from core import cache as cache_module
+from core.cache import CompileCache, cache_key
+from core.vm import VirtualMachine
+
+SOURCE = """remember a = 1
+think while a < 5
+    update a = a + 1
+speak a
+"""
+
+
+def pickles(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".pickle"))
+
+
+def test_key_depends_on_source_opt_level_and_compiler_version(monkeypatch):
+    key = cache_key(SOURCE, 1)
+    assert cache_key(SOURCE, 1) == key
+    assert cache_key(SOURCE + "\n", 1) != key
+    assert cache_key(SOURCE, 2) != key
+    monkeypatch.setattr(cache_module, "COMPILER_VERSION", "old")
+    assert cache_key(SOURCE, 1) != key
+
+
+def test_repeated_compile_is_a_hit():
+    cache = CompileCache()
+    first = cache.compile(SOURCE, 1)
+    assert cache.compile(SOURCE, 1) is first
+    assert cache.compile(SOURCE, 2) is not first
+    assert cache.stats() == {"entries": 2, "hits": 1, "disk_hits": 0, "misses": 2}
+
+
+def test_only_executable_parts_are_kept_by_default():
+    compiled = CompileCache().compile(SOURCE, 1)
+    assert (compiled.tokens, compiled.ast, compiled.tac) == (None, None, None)
+    assert CompileCache(keep_artifacts=True).compile(SOURCE, 1).ast is not None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CompileCache(capacity=2)
+    cache.compile("speak 1\n")
+    cache.compile("speak 2\n")
+    cache.compile("speak 1\n")
+    cache.compile("speak 3\n")
+    assert len(cache) == 2
+    assert cache.lookup("speak 1\n") is not None
+    assert cache.lookup("speak 2\n") is None
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    compiled = CompileCache(directory=str(tmp_path)).compile(SOURCE, 1)
+    assert pickles(tmp_path) == [cache_key(SOURCE, 1) + ".pickle"]
+
+    restarted = CompileCache(directory=str(tmp_path))
+    loaded = restarted.lookup(SOURCE, 1)
+    assert restarted.stats()["disk_hits"] == 1
+    assert VirtualMachine().run(loaded.bytecode) == VirtualMachine().run(compiled.bytecode) == "5"
+    assert restarted.lookup(SOURCE, 1) is loaded
+
+
+def test_corrupt_entry_is_dropped_and_recompiled(tmp_path):
+    CompileCache(directory=str(tmp_path)).compile(SOURCE, 1)
+    path = tmp_path / (cache_key(SOURCE, 1) + ".pickle")
+    path.write_bytes(path.read_bytes()[:20])
+
+    cache = CompileCache(directory=str(tmp_path))
+    assert cache.lookup(SOURCE, 1) is None
+    assert not path.exists()
+    assert VirtualMachine().run(cache.compile(SOURCE, 1).bytecode) == "5"
+    assert path.exists()
+
+
+def test_clear_can_empty_the_disk_tier(tmp_path):
+    cache = CompileCache(directory=str(tmp_path))
+    cache.compile(SOURCE, 1)
+    cache.clear()
+    assert len(cache) == 0 and pickles(tmp_path)
+    cache.clear(disk=True)
+    assert pickles(tmp_path) == []
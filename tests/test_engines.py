@@ -0,0 +1,115 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from core.compiler import compile_source
+from core.parallel import MIN_PIECE_SIZE, compile_parallel
+from core.vm import VirtualClock, VirtualMachine
+
+OPT_LEVELS = (0, 1, 2)
+
+# name: (source, input rows). Every loop comes round often enough to get hot
+# (core.tiering.HOT_LOOP_THRESHOLD); each input row is one run.
+PROGRAMS = {
+    # `step` goes from int to float to str between entries of the inner loop
+    "deopt": ('''remember step = 1
+remember total = 0
+remember outer = 0
+remember i = 0
+think while outer < 4
+    update i = 0
+    think while i < 300
+        update total = total + step
+        update i = i + 1
+    speak total
+    update step = step / 2
+    update outer = outer + 1
+update step = "x"
+update i = 0
+think while i < 300
+    update total = total + step
+    update i = i + 1
+speak total
+''', [[]]),
+    "panic": ('''remember i = 0
+think while i < 1000
+    feel i == 500
+        panic "boom"
+    speak i
+    update i = i + 1
+''', [[]]),
+    "input": ('''remember i = 0
+remember total = 0
+think while i < 400
+    listen "value" v
+    update total = total + v
+    update i = i + 1
+speak total
+''', [[str(k % 7) for k in range(400)], [str(k) + ".5" for k in range(400)], ["1"] * 399]),
+    "pause": ('''remember i = 0
+think while i < 400
+    feel i > 397
+        pause
+        speak i
+    update i = i + 1
+''', [[]]),
+}
+
+
+def outcome(program, inputs, engine="switch", tiering=False):
+    """Output, error and virtual time of one run; the output is what was produced up to the error."""
+    clock = VirtualClock()
+    vm = VirtualMachine(tiering=tiering, clock=clock)
+    try:
+        return vm.run(program, list(inputs), engine=engine), None, clock.now
+    except Exception as e:
+        return "\n".join(vm.output), f"{type(e).__name__}: {e}", clock.now
+
+
+CASES = [pytest.param(source, rows, opt_level, id=f"{name}-O{opt_level}")
+         for name, (source, rows) in PROGRAMS.items() for opt_level in OPT_LEVELS]
+
+
+@pytest.mark.parametrize("source, rows, opt_level", CASES)
+def test_threaded_matches_switch(source, rows, opt_level):
+    program = compile_source(source, opt_level).bytecode
+    for inputs in rows:
+        assert outcome(program, inputs, "threaded") == outcome(program, inputs)
+
+
+def large_source(blocks=700):
+    """Blocks with their own variables and a loop that gets hot each, well past parallel.MIN_PIECE_SIZE."""
+    return "".join(f'''remember v{n} = {n}
+remember i{n} = 0
+think while i{n} < 250
+    update v{n} = v{n} + i{n} * 2
+    update i{n} = i{n} + 1
+feel v{n} > 100
+    speak "big " + v{n}
+otherwise
+    whisper "small"
+''' for n in range(blocks))
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ProcessPoolExecutor(2) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize("opt_level", OPT_LEVELS)
+def test_parallel_compile_runs_like_sequential(executor, opt_level):
+    source = large_source()
+    assert len(source) > MIN_PIECE_SIZE
+    sequential = compile_source(source, opt_level).bytecode
+    parallel = compile_parallel(source, opt_level, executor=executor).bytecode
+    assert outcome(parallel, [], tiering=True) == outcome(sequential, [], tiering=True)
+
+
+def test_parallel_compile_reports_errors_like_sequential(executor):
+    source = large_source() + "speak missing\n"
+    with pytest.raises(Exception) as sequential:
+        compile_source(source, 1)
+    with pytest.raises(Exception) as parallel:
+        compile_parallel(source, 1, executor=executor)
+    assert (type(parallel.value), str(parallel.value)) == (type(sequential.value), str(sequential.value))
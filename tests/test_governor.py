@@ -0,0 +1,100 @@
+import pytest
+
+from core.compiler import compile_source
+from core.governor import Limits, ResourceLimitExceeded
+from core.vm import VirtualClock, VirtualMachine
+
+# (engine, tiering): the interpreter, the interpreter with hot loops compiled, and the threaded engine
+ENGINES = [pytest.param("switch", False, id="switch"),
+           pytest.param("switch", True, id="tiered"),
+           pytest.param("threaded", False, id="threaded")]
+
+FOREVER = """remember a = 1
+think while a > 0
+    update a = a + 1
+"""
+
+# Every iteration repeats "ab" once more, so t passes 1000 characters at i = 501, well after the loop is hot
+REPEAT_IN_LOOP = """remember s = "ab"
+remember i = 0
+remember t = ""
+think while i < 2000
+    update t = s * i
+    update i = i + 1
+speak "done"
+"""
+
+
+def run(source, limits, engine, tiering, inputs=()):
+    vm = VirtualMachine(tiering=tiering, clock=VirtualClock())
+    return vm, vm.run(compile_source(source, 1).bytecode, list(inputs), engine=engine, limits=limits)
+
+
+def exceeded(source, limits, engine, tiering):
+    with pytest.raises(ResourceLimitExceeded) as info:
+        run(source, limits, engine, tiering)
+    return info.value
+
+
+@pytest.mark.parametrize("engine, tiering", ENGINES)
+def test_limits_that_are_not_reached_change_nothing(engine, tiering):
+    source = REPEAT_IN_LOOP + "speak t\n"
+    _, expected = run(source, None, engine, tiering)
+    _, governed = run(source, Limits(max_instructions=10 ** 6, max_string=4000, max_output_lines=2), engine, tiering)
+    assert governed == expected
+
+
+@pytest.mark.parametrize("engine, tiering", ENGINES)
+def test_fuel_stops_an_endless_loop(engine, tiering):
+    error = exceeded(FOREVER, Limits(max_instructions=5000), engine, tiering)
+    assert (error.limit, error.value) == ("max_instructions", 5000)
+    assert 5000 < error.counters["instructions"] <= 5000 + len(compile_source(FOREVER, 1).bytecode.ops)
+
+
+@pytest.mark.parametrize("engine, tiering", ENGINES)
+def test_wall_time_stops_an_endless_loop(engine, tiering):
+    assert exceeded(FOREVER, Limits(wall_time=0.05), engine, tiering).limit == "wall_time"
+
+
+@pytest.mark.parametrize("engine, tiering", ENGINES)
+def test_concatenation_past_max_string_is_stopped(engine, tiering):
+    source = 'remember s = "x"\nthink while 1 > 0\n    update s = s + s\n'
+    assert exceeded(source, Limits(max_string=1000), engine, tiering).limit == "max_string"
+
+
+@pytest.mark.parametrize("engine, tiering", ENGINES)
+@pytest.mark.parametrize("product", ["s * n", "n * s"])
+def test_repeated_string_is_checked_before_it_is_built(engine, tiering, product):
+    source = f'remember s = "ab"\nremember n = 50000000\nremember t = {product}\nspeak "done"\n'
+    error = exceeded(source, Limits(max_string=100), engine, tiering)
+    assert (error.limit, error.value) == ("max_string", 100)
+
+
+@pytest.mark.parametrize("engine, tiering", ENGINES)
+def test_repeated_string_in_a_hot_loop_is_stopped(engine, tiering):
+    assert exceeded(REPEAT_IN_LOOP, Limits(max_string=1000), engine, tiering).limit == "max_string"
+
+
+def test_compiled_loop_checks_repeated_strings():
+    vm = VirtualMachine(tiering=True, clock=VirtualClock())
+    with pytest.raises(ResourceLimitExceeded):
+        vm.run(compile_source(REPEAT_IN_LOOP, 1).bytecode, [], limits=Limits(max_string=1000))
+    assert vm.governor.loops.compiled
+
+
+@pytest.mark.parametrize("engine, tiering", ENGINES)
+def test_output_limits(engine, tiering):
+    source = 'remember i = 0\nthink while i < 100\n    speak "line"\n    update i = i + 1\n'
+    error = exceeded(source, Limits(max_output_lines=10), engine, tiering)
+    assert (error.limit, error.counters["output_lines"]) == ("max_output_lines", 11)
+    # "line\n" is 5 bytes: the seventh line goes over 32
+    assert exceeded(source, Limits(max_output_bytes=32), engine, tiering).counters["output_bytes"] == 35
+
+
+@pytest.mark.parametrize("engine, tiering", ENGINES)
+def test_output_up_to_the_limit_is_kept(engine, tiering):
+    source = 'remember i = 0\nthink while i < 100\n    speak i\n    update i = i + 1\n'
+    vm = VirtualMachine(tiering=tiering, clock=VirtualClock())
+    with pytest.raises(ResourceLimitExceeded):
+        vm.run(compile_source(source, 1).bytecode, [], engine=engine, limits=Limits(max_output_lines=3))
+    assert list(vm.output) == ["0", "1", "2"]
@@ -0,0 +1,163 @@
+import copy
+import random
+
+import pytest
+
+from core.incremental import IncrementalFrontEnd
+from core.lexer import tokenize
+from core.parser import Parser
+from core.semantic_analyzer import SemanticAnalyzer
+
+STATEMENTS = [
+    "remember {a} = {n}\n",
+    "update {a} = {b} + {n}\n",
+    'speak "{a} is " + {a}\n',
+    'listen "value" {a}\n',
+    "feel {a} > {n}\n    speak {b}\notherwise\n    update {a} = {a} - 1\n",
+    "think while {a} < {n}\n    update {a} = {a} + 1\n    # counting\n    shout {a}\n",
+    "pause\n",
+    "\n",
+    "# a comment\n",
+    # Broken statements: a lexer error, a parser error and an undeclared name
+    "remember {a} = {n} @\n",
+    "feel {a} >\n",
+    "speak missing_{n}\n",
+]
+NAMES = ("a", "b", "c")
+
+
+def statement(rng):
+    return rng.choice(STATEMENTS).format(a=rng.choice(NAMES), b=rng.choice(NAMES), n=rng.randint(0, 99))
+
+
+def shape(node):
+    """Every field of every node, source positions included."""
+    if isinstance(node, list):
+        return [shape(item) for item in node]
+    if hasattr(node, "__slots__"):
+        return type(node).__name__, tuple(shape(getattr(node, field)) for field in node.__slots__)
+    return node
+
+
+def error(e):
+    return type(e).__name__, str(e)
+
+
+def listed(tokens):
+    return list(tokens), list(tokens.offsets)
+
+
+def full(source):
+    """Tokens, AST and first error of the whole-buffer front end."""
+    try:
+        tokens = tokenize(source)
+    except Exception as e:
+        return None, None, error(e)
+    try:
+        program = Parser(tokens).parse()
+    except Exception as e:
+        return listed(tokens), None, error(e)
+    try:
+        SemanticAnalyzer().analyze(program)
+    except Exception as e:
+        return listed(tokens), shape(program), error(e)
+    return listed(tokens), shape(program), None
+
+
+def incremental(front_end, source):
+    try:
+        tokens = front_end.tokenize(source)
+    except Exception as e:
+        return None, None, error(e)
+    try:
+        program = front_end.parse()
+    except Exception as e:
+        return listed(tokens), None, error(e)
+    try:
+        front_end.analyze()
+    except Exception as e:
+        return listed(tokens), shape(program), error(e)
+    return listed(tokens), shape(program), None
+
+
+def edits(rng, statements):
+    """Insert, delete, replace or duplicate one statement."""
+    statements = list(statements)
+    kind = rng.randrange(4) if statements else 0
+    at = rng.randrange(len(statements) + 1)
+    if kind == 0:
+        statements.insert(at, statement(rng))
+    elif kind == 1:
+        del statements[at % len(statements)]
+    elif kind == 2:
+        statements[at % len(statements)] = statement(rng)
+    else:
+        statements.insert(at, statements[at % len(statements)])
+    return statements
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_edit_sequences_match_the_full_front_end(seed):
+    rng = random.Random(seed)
+    front_end = IncrementalFrontEnd()
+    statements = ["remember a = 1\n", "remember b = 2\n", "remember c = 3\n"]
+    for _ in range(30):
+        statements = edits(rng, statements)
+        source = "".join(statements)
+        assert incremental(front_end, source) == full(source), source
+
+
+def big_program(count):
+    return "".join(f"remember v{n} = {n}\nfeel v{n} > 5\n    speak v{n}\n" for n in range(count // 2))
+
+
+def test_one_line_edit_redoes_one_statement():
+    front_end = IncrementalFrontEnd()
+    source = big_program(6000)
+    front_end.tokenize(source)
+    front_end.parse()
+    front_end.analyze()
+    assert front_end.stats == {"statements": 6000, "relexed": 6000, "reparsed": 6000, "rechecked": 6000}
+
+    edited = source.replace("remember v1500 = 1500\n", "remember v1500 = 15\n")
+    front_end.tokenize(edited)
+    program = front_end.parse()
+    front_end.analyze()
+    assert front_end.stats == {"statements": 6000, "relexed": 1, "reparsed": 1, "rechecked": 1}
+    assert shape(program) == shape(Parser(tokenize(edited)).parse())
+
+
+def test_moved_statements_are_reused_with_shifted_positions():
+    front_end = IncrementalFrontEnd()
+    source = big_program(100)
+    front_end.tokenize(source)
+    front_end.parse()
+    front_end.analyze()
+
+    edited = "remember first = 0\n" + source
+    front_end.tokenize(edited)
+    program = front_end.parse()
+    front_end.analyze()
+    assert front_end.stats == {"statements": 101, "relexed": 1, "reparsed": 1, "rechecked": 1}
+    assert shape(program) == shape(Parser(tokenize(edited)).parse())
+
+
+def test_copied_ast_keeps_its_positions():
+    front_end = IncrementalFrontEnd()
+    source = big_program(10)
+    front_end.tokenize(source)
+    kept = copy.deepcopy(front_end.parse())
+    positions = shape(kept)
+
+    front_end.tokenize("remember first = 0\n" + source)
+    front_end.parse()
+    assert shape(kept) == positions
+
+
+def test_fixing_a_lexer_error_reuses_the_statements_around_it():
+    front_end = IncrementalFrontEnd()
+    good = big_program(20)
+    with pytest.raises(RuntimeError):
+        front_end.tokenize(good + "remember z = 1 @\n")
+    front_end.tokenize(good + "remember z = 1\n")
+    assert front_end.stats["relexed"] == 1
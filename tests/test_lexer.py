@@ -0,0 +1,60 @@
+import pytest
+
+from core.lexer import KEYWORD_VALUES, TokenStream, split_statements, tokenize
+
+SOURCE = 'remember a = 1\nfeel a > 0\n    speak "hi" # note\n\nspeak a + 2\n'
+
+
+def test_tokens_and_offsets():
+    tokens = tokenize(SOURCE)
+    assert list(tokens) == [
+        ("KEYWORD", "remember"), ("IDENT", "a"), ("ASSIGN", "="), ("NUMBER", 1), ("NEWLINE", "\n"),
+        ("KEYWORD", "feel"), ("IDENT", "a"), ("OP", ">"), ("NUMBER", 0), ("NEWLINE", "\n"),
+        ("INDENT", 1), ("KEYWORD", "speak"), ("STRING", "hi"), ("NEWLINE", "\n"), ("NEWLINE", "\n"),
+        ("DEDENT", 0), ("KEYWORD", "speak"), ("IDENT", "a"), ("OP", "+"), ("NUMBER", 2), ("NEWLINE", "\n"),
+        ("EOF", None),
+    ]
+    assert [SOURCE[offset:offset + 4] for offset in tokens.offsets[:3]] == ["reme", "a = ", "= 1\n"]
+    assert tokens.offsets[-1] == len(SOURCE)
+
+
+def test_stream_indexes_slices_and_compares_like_a_list():
+    tokens = tokenize(SOURCE)
+    assert tokens[1] == ("IDENT", "a")
+    assert isinstance(tokens[:5], TokenStream) and tokens[:5] == list(tokens)[:5]
+    assert tokens == tokenize(SOURCE) and tokens != tokenize("speak 1\n")
+    assert TokenStream.from_tuples(list(tokens)) == tokens
+    assert len(tokens) == len(list(tokens))
+
+
+def test_keywords_are_interned():
+    assert tokenize("remember x = 1\n").values[0] is KEYWORD_VALUES["remember"]
+
+
+def test_otherwise_closes_the_then_block():
+    tokens = list(tokenize('feel 1 > 0\n    speak 1\notherwise\n    speak 2\n'))
+    assert tokens[tokens.index(("KEYWORD", "otherwise")) - 1] == ("DEDENT", 0)
+
+
+@pytest.mark.parametrize("source, message", [
+    ("remember a = 1 @\n", "Illegal character @ at position 15"),
+    ('speak "open\n', 'Illegal character " at position 6'),
+    ("feel 1 > 0\n        speak 1\n    speak 2\n", "Inconsistent indentation at position 27"),
+])
+def test_error_positions(source, message):
+    with pytest.raises(RuntimeError, match=f"^{message}$"):
+        tokenize(source)
+
+
+def test_part_of_a_buffer():
+    statements = list(split_statements(SOURCE))
+    assert [SOURCE[start:end] for start, end in statements] == [
+        "remember a = 1\n", 'feel a > 0\n    speak "hi" # note\n\n', "speak a + 2\n"]
+    start, end = statements[2]
+    part = tokenize(SOURCE, start=start, end=end)
+    assert list(part) == list(tokenize(SOURCE[start:end]))
+    assert list(part.offsets) == [offset + start for offset in tokenize(SOURCE[start:end]).offsets]
+    # `base` moves offsets and error positions on, for a buffer that is itself a piece of the source
+    assert tokenize("speak 1\n", base=100).offsets[0] == 100
+    with pytest.raises(RuntimeError, match="position 106"):
+        tokenize("speak @\n", base=100)
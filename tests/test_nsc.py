@@ -0,0 +1,74 @@
+import struct
+
+import pytest
+
+from core import nsc
+from core.bytecode import JUMP_OPS, PUSH, STORE
+from core.compiler import compile_source
+from core.vm import VirtualMachine
+
+SOURCE = """remember a = 1
+think while a < 5
+    update a = a + 1
+    speak a
+speak "done"
+"""
+
+
+def compiled():
+    return nsc.dumps(compile_source(SOURCE, 0).bytecode)
+
+
+def header(data):
+    fields = nsc.HEADER.unpack_from(data)
+    return {"n": fields[4], "args_at": fields[10], "jumps_at": fields[13], "ops_at": fields[15]}
+
+
+def patched(data, offset, fmt, value):
+    data = bytearray(data)
+    struct.pack_into(fmt, data, offset, value)
+    return data
+
+
+def first_pc(data, ops):
+    layout = header(data)
+    return next(pc for pc in range(layout["n"]) if data[layout["ops_at"] + pc] in ops)
+
+
+@pytest.mark.parametrize("source", [
+    SOURCE,
+    "remember a = 1\nthink while a < 5\n    update a = a + 1\n",
+    "remember a = 1\nfeel a > 0\n    speak 1\n",
+], ids=["ends-in-speak", "ends-in-loop", "ends-in-feel"])
+@pytest.mark.parametrize("opt_level", [0, 1, 2])
+def test_round_trip_runs_the_same(source, opt_level):
+    program = compile_source(source, opt_level).bytecode
+    assert VirtualMachine().run(nsc.loads(nsc.dumps(program))) == VirtualMachine().run(program)
+
+
+@pytest.mark.parametrize("ops", [(PUSH,), (STORE,), JUMP_OPS])
+def test_argument_out_of_range_is_rejected(ops):
+    data = compiled()
+    pc = first_pc(data, ops)
+    with pytest.raises(nsc.NSCFormatError):
+        nsc.loads(patched(data, header(data)["args_at"] + 4 * pc, "<i", 999))
+
+
+def test_unknown_opcode_is_rejected():
+    data = compiled()
+    with pytest.raises(nsc.NSCFormatError):
+        nsc.loads(patched(data, header(data)["ops_at"], "<B", 200))
+
+
+def test_jump_table_outside_the_program_is_rejected():
+    data = compiled()
+    with pytest.raises(nsc.NSCFormatError):
+        nsc.loads(patched(data, header(data)["jumps_at"], "<I", 999))
+
+
+def test_truncated_source_map_is_rejected():
+    data = compiled()
+    # Point the source map at the last four bytes of the file: one entry instead of one per instruction
+    map_at = struct.calcsize("<4sHH32s6II")
+    with pytest.raises(nsc.NSCFormatError, match="Truncated"):
+        nsc.loads(patched(data, map_at, "<I", len(data) - 4))
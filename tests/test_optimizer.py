@@ -0,0 +1,148 @@
+import pytest
+
+from core.compiler import compile_source
+from core.lexer import tokenize
+from core.optimizer import Optimizer, fold
+from core.parser import Parser
+from core.vm import VirtualClock, VirtualMachine
+
+
+def tree(node):
+    """Every field of every node except source positions."""
+    if isinstance(node, list):
+        return [tree(item) for item in node]
+    if hasattr(node, "__slots__"):
+        return type(node).__name__, tuple(tree(getattr(node, field)) for field in node.__slots__ if field != "pos")
+    return node
+
+
+def parsed(source):
+    return tree(Parser(tokenize(source)).parse())
+
+
+def optimized(source):
+    return tree(Optimizer().optimize(Parser(tokenize(source)).parse()))
+
+
+@pytest.mark.parametrize("op, a, b, expected", [
+    ("+", 1, 2, 3),
+    ("+", "a", 1, "a1"),
+    ("+", 1, "a", "1a"),
+    ("-", 1, 3, -2),
+    ("*", 4, 5, 20),
+    ("/", 7, 2, 3.5),
+    ("<", 1, 2, 1),
+    (">=", 1, 2, 0),
+    ("<", "a", "b", 1),
+    ("==", "1", 1, 0),
+    ("!=", "a", 1, 1),
+])
+def test_fold(op, a, b, expected):
+    result = fold(op, a, b)
+    assert result == expected and type(result) is type(expected)
+
+
+@pytest.mark.parametrize("op, a, b", [
+    ("/", 1, 0),
+    ("/", 1.5, 0.0),
+    ("<", "a", 1),
+    ("-", "a", 1),
+    ("*", "ab", 3),
+    ("*", 1e308, 10),
+])
+def test_run_time_errors_and_overflow_are_not_folded(op, a, b):
+    assert fold(op, a, b) is None
+
+
+def test_constants_propagate_through_straight_line_code():
+    assert optimized('remember a = 2\nremember b = a * 3\nspeak "b=" + b\n') == \
+        parsed('remember a = 2\nremember b = 6\nspeak "b=6"\n')
+
+
+def test_branches_keep_only_the_constants_they_agree_on():
+    source = """listen "n" n
+remember same = 1
+remember differ = 1
+feel n > 0
+    update same = 2
+    update differ = 3
+otherwise
+    update same = 2
+speak same
+speak differ
+"""
+    assert optimized(source) == parsed(source.replace("speak same", "speak 2"))
+
+
+def test_branch_that_panics_does_not_spoil_the_constants():
+    source = 'listen "n" n\nremember a = 1\nfeel n > 0\n    update a = 5\n    panic "no"\nspeak a\n'
+    assert optimized(source) == parsed(source.replace("speak a", "speak 1"))
+
+
+def test_constant_conditions_prune_branches_and_loops():
+    source = """remember a = 3
+feel a > 2
+    speak "yes"
+otherwise
+    speak "no"
+think while a < 0
+    speak "never"
+"""
+    assert optimized(source) == parsed('remember a = 3\nspeak "yes"\n')
+
+
+def test_variables_assigned_in_a_loop_are_not_propagated():
+    source = """remember i = 0
+remember step = 2
+think while i < 10
+    update i = i + step
+speak i
+"""
+    assert optimized(source) == parsed(source.replace("i + step", "i + 2"))
+
+
+def test_assignments_in_the_loop_body_are_unknown_at_its_top():
+    source = """remember i = 0
+remember x = 1
+think while i < 3
+    speak x
+    update x = 5
+    update i = i + 1
+speak x
+"""
+    assert optimized(source) == parsed(source)
+
+
+@pytest.mark.parametrize("stop", ["sleep", 'panic "stop"'])
+def test_statements_after_sleep_or_panic_are_dropped(stop):
+    source = f"""listen "n" n
+feel n > 0
+    speak 1
+    {stop}
+    speak 2
+speak 3
+{stop}
+speak 4
+"""
+    assert optimized(source) == parsed(source.replace("    speak 2\n", "").replace("speak 4\n", ""))
+
+
+def test_code_after_a_branch_that_always_stops_is_dropped():
+    source = 'listen "n" n\nfeel n > 0\n    sleep\notherwise\n    panic "no"\nspeak 1\n'
+    assert optimized(source) == parsed(source.replace("speak 1\n", ""))
+
+
+@pytest.mark.parametrize("source, message", [
+    ("remember zero = 0\nspeak 1 / zero\n", "Division by zero"),
+    ('remember s = "a"\nfeel s < 1\n    speak 1\n', None),
+])
+def test_failing_expressions_still_fail_at_run_time(source, message):
+    assert "BinaryOperation" in str(optimized(source))
+    errors = []
+    for opt_level in (0, 2):
+        with pytest.raises(Exception) as raised:
+            VirtualMachine(clock=VirtualClock()).run(compile_source(source, opt_level).bytecode)
+        errors.append((type(raised.value), str(raised.value)))
+    assert errors[0] == errors[1]
+    if message:
+        assert errors[0][1] == message
@@ -0,0 +1,64 @@
+import pytest
+
+from core.bytecode import assemble
+from core.compiler import compile_source
+from core.peephole import RULES, PeepholeOptimizer
+from core.vm import VirtualMachine
+
+# A temporary stored and loaded right away, a jump to the next instruction,
+# labels nothing jumps to, a jump landing on another jump and dead code after it
+CODE = [
+    "PUSH 1", "STORE t0", "LOAD t0", "STORE a",
+    "JMP L0", "LABEL L0", "LABEL L9",
+    "LOAD a", "JZ L1", "JMP L2",
+    "PUSH 5", "PRINT",
+    "LABEL L1", "JMP L3",
+    "LABEL L2", "PUSH 2", "PRINT",
+    "LABEL L3",
+]
+
+EXPECTED = {
+    0: ({rule: 0 for rule in RULES}, 0),
+    1: ({"store_load": 2, "jump_to_next": 1, "dead_label": 2, "threaded_jump": 0, "unreachable": 0}, 5),
+    2: ({"store_load": 2, "jump_to_next": 2, "dead_label": 4, "threaded_jump": 1, "unreachable": 3}, 11),
+}
+
+
+@pytest.mark.parametrize("level", sorted(EXPECTED))
+def test_rule_counts_per_level(level):
+    peephole = PeepholeOptimizer(level)
+    code = peephole.optimize(CODE)
+    assert (peephole.stats, peephole.removed) == EXPECTED[level]
+    assert len(code) == len(CODE) - peephole.removed
+
+
+@pytest.mark.parametrize("level", sorted(EXPECTED))
+def test_optimized_code_runs_the_same(level):
+    assert VirtualMachine().run(assemble(PeepholeOptimizer(level).optimize(CODE))) == "2"
+
+
+def test_level_two_threads_the_jump_and_drops_dead_code():
+    assert PeepholeOptimizer(2).optimize(CODE) == ["PUSH 1", "STORE a", "LOAD a", "JZ L3", "PUSH 2", "PRINT",
+                                                   "LABEL L3"]
+
+
+def test_positions_follow_the_instructions_that_are_left():
+    peephole = PeepholeOptimizer(2)
+    peephole.optimize(CODE, positions=range(len(CODE)))
+    # The retargeted JZ keeps the position of the JZ L1 it came from
+    assert peephole.positions == [0, 3, 7, 8, 15, 16, 17]
+
+
+def test_temporary_read_twice_is_kept():
+    code = ["PUSH 1", "STORE t0", "LOAD t0", "LOAD t0", "ADD", "PRINT"]
+    peephole = PeepholeOptimizer(2)
+    assert peephole.optimize(code) == code
+    assert peephole.stats["store_load"] == 0
+
+
+def test_compiler_reports_the_statistics():
+    source = 'remember a = 1\nfeel a > 0\n    speak "yes"\notherwise\n    speak "no"\n'
+    stats = {level: compile_source(source, level).peephole_stats for level in (0, 1, 2)}
+    assert stats[0] == dict.fromkeys(RULES, 0) | {"removed": 0}
+    assert stats[1]["removed"] > 0 and stats[1]["threaded_jump"] == stats[1]["unreachable"] == 0
+    assert "fused" in stats[1] and "fused" not in stats[0]
@@ -0,0 +1,69 @@
+import pytest
+
+from core.compiler import compile_source
+from core.profiler import SourceLines, main
+from core.vm import VirtualClock, VirtualMachine
+
+SOURCE = """remember a = 0
+think while a < 10
+    update a = a + 1
+speak a
+"""
+
+
+def profiled(source, opt_level, inputs=()):
+    vm = VirtualMachine(clock=VirtualClock())
+    vm.profile(compile_source(source, opt_level).bytecode, list(inputs))
+    return vm, vm.last_profile
+
+
+def counts_by_line(profile, source):
+    return {entry.line: entry.instructions for entry in profile.by_line(source)}
+
+
+def test_source_lines():
+    lines = SourceLines(SOURCE)
+    assert len(lines) == 4
+    assert [lines.line(offset) for offset in (0, 14, 15, len(SOURCE) - 1)] == [1, 1, 2, 4]
+    assert lines.line(-1) == 0
+
+
+def test_every_instruction_is_charged_to_its_line():
+    vm, profile = profiled(SOURCE, 0)
+    assert list(vm.output) == ["10"]
+    # The condition runs 11 times (6 instructions) plus 10 jumps back; the body 10 times (6 instructions)
+    assert counts_by_line(profile, SOURCE) == {1: 2, 2: 76, 3: 60, 4: 2}
+    assert profile.instructions == sum(profile.counts) == 140
+    assert profile.seconds == pytest.approx(sum(entry.seconds for entry in profile.by_line(SOURCE)))
+
+
+@pytest.mark.parametrize("opt_level", [1, 2])
+def test_positions_survive_optimization(opt_level):
+    counts = counts_by_line(profiled(SOURCE, opt_level)[1], SOURCE)
+    assert set(counts) == {1, 2, 3, 4}
+    assert counts[1] == counts[4] == 2
+    assert sum(counts.values()) < 140
+
+
+def test_folded_constants_keep_their_line():
+    source = "remember a = 2 * 3\nremember b = a + 1\nspeak b\n"
+    counts = counts_by_line(profiled(source, 2)[1], source)
+    assert 0 not in counts and all(counts.values())
+
+
+def test_profile_is_kept_when_the_run_raises():
+    source = 'remember a = 1\nspeak a\npanic "boom"\n'
+    vm = VirtualMachine()
+    with pytest.raises(Exception):
+        vm.profile(compile_source(source, 1).bytecode)
+    assert counts_by_line(vm.last_profile, source)[3] >= 1
+
+
+def test_annotate_lists_every_line(tmp_path, capsys):
+    path = tmp_path / "loop.ns"
+    path.write_text(SOURCE, encoding="utf-8")
+    main([str(path), "-O", "0", "--virtual-clock"])
+    rows = capsys.readouterr().out.splitlines()
+    assert rows[0].split() == ["line", "instructions", "time", "(ms)", "time", "source"]
+    assert [row.split()[:2] for row in rows[1:5]] == [["1", "2"], ["2", "76"], ["3", "60"], ["4", "2"]]
+    assert rows[-1].startswith("140 instructions in ")
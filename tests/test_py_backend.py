@@ -0,0 +1,106 @@
+import pytest
+
+from core.compiler import compile_source
+from core.py_backend import PythonProgram, compile_to_python
+from core.vm import VirtualClock, VirtualMachine
+
+OPT_LEVELS = (0, 1, 2)
+
+PROGRAMS = {
+    "arithmetic": ('''remember a = 7
+remember b = 2
+speak a - b * 3
+speak a / b
+remember s = "x" + a
+shout s
+whisper "LOUD"
+laugh a
+murmur "Hum"
+''', [[]]),
+    "branches": ('''listen "n" n
+feel n > 10
+    speak "big"
+otherwise
+    speak n + 1
+feel n == 3
+    speak "three"
+''', [["20"], ["3"], ["-1"], ["2.5"], ["word"]]),
+    "loop-pause": ('''remember i = 0
+think while i < 5
+    feel i == 2
+        pause
+    speak i
+    update i = i + 1
+pause
+''', [[]]),
+    "panic": ('''remember i = 0
+think while i < 10
+    feel i == 4
+        panic "stop"
+    speak i
+    update i = i + 1
+''', [[]]),
+    "sleep": ('speak "before"\nsleep\nspeak "after"\n', [[]]),
+    "undefined": ('''listen "n" n
+feel n > 0
+    remember late = 1
+speak late
+''', [["1"], ["0"]]),
+    "errors": ('''listen "d" d
+speak 1 / d
+''', [["0"], ["4"], []]),
+}
+CASES = [pytest.param(source, rows, opt_level, id=f"{name}-O{opt_level}")
+         for name, (source, rows) in PROGRAMS.items() for opt_level in OPT_LEVELS]
+
+
+def outcome(run):
+    """Output, error and virtual time of run(clock, output)."""
+    clock = VirtualClock()
+    output = []
+    try:
+        return run(clock, output), None, clock.now
+    except Exception as e:
+        return "\n".join(output), f"{type(e).__name__}: {e}", clock.now
+
+
+def on_vm(program, inputs):
+    def run(clock, output):
+        vm = VirtualMachine(clock=clock)
+        vm.output = output
+        try:
+            return vm.run(program, list(inputs))
+        finally:
+            output[:] = vm.output
+    return run
+
+
+def on_python(compiled, inputs):
+    return lambda clock, output: compiled.run(list(inputs), clock=clock)
+
+
+@pytest.mark.parametrize("source, rows, opt_level", CASES)
+def test_python_backend_matches_the_vm(source, rows, opt_level):
+    compiled = compile_source(source, opt_level)
+    python = compile_to_python(compiled.ast)
+    for inputs in rows:
+        expected = outcome(on_vm(compiled.bytecode, inputs))
+        output, error, now = outcome(on_python(python, inputs))
+        # The code object's output is only returned at the end, so an error drops it
+        assert (error, now) == expected[1:]
+        if error is None:
+            assert output == expected[0]
+
+
+def test_pause_sleeps_on_the_given_clock():
+    program = compile_to_python(compile_source("pause\npause\nspeak 1\n", 1).ast)
+    clock = VirtualClock()
+    assert program.run(clock=clock) == "1"
+    assert clock.now == 2
+
+
+def test_code_object_survives_serialization():
+    source = PROGRAMS["branches"][0]
+    program = compile_to_python(compile_source(source, 1).ast)
+    copy = PythonProgram.from_bytes(program.to_bytes())
+    assert [copy.run([value]) for value in ("20", "3", "5")] == ["big", "4\nthree", "6"]
@@ -0,0 +1,80 @@
+from core import nsc, runner
+from core.compiler import compile_source
+from core.runner import discover, run_jobs
+
+
+def write(directory, name, text=""):
+    (directory / name).write_text(text, encoding="utf-8")
+
+
+def test_discover_leaves_inputs_of_longer_script_names_alone(tmp_path):
+    write(tmp_path, "a.ns", 'speak "a"\n')
+    write(tmp_path, "a.b.ns", "listen x\nspeak x\n")
+    write(tmp_path, "a.b.in", "1\n")
+
+    jobs = {(job.script, job.input_path) for job in discover(str(tmp_path))}
+
+    assert jobs == {(str(tmp_path / "a.ns"), None),
+                    (str(tmp_path / "a.b.ns"), str(tmp_path / "a.b.in"))}
+
+
+def test_discover_gives_each_input_to_the_longest_script_name(tmp_path):
+    write(tmp_path, "a.ns", 'speak "a"\n')
+    write(tmp_path, "a.b.ns", 'speak "b"\n')
+    write(tmp_path, "a.b.x.in", "1\n")
+    write(tmp_path, "a.y.in", "2\n")
+
+    jobs = {(job.script, job.input_path) for job in discover(str(tmp_path))}
+
+    assert jobs == {(str(tmp_path / "a.ns"), str(tmp_path / "a.y.in")),
+                    (str(tmp_path / "a.b.ns"), str(tmp_path / "a.b.x.in"))}
+
+
+def test_discover_pairs_labelled_inputs(tmp_path):
+    write(tmp_path, "a.ns", "listen x\nspeak x\n")
+    write(tmp_path, "a.in", "1\n")
+    write(tmp_path, "a.second.in", "2\n")
+
+    jobs = [(job.input_path, job.inputs) for job in discover(str(tmp_path))]
+
+    assert jobs == [(str(tmp_path / "a.in"), ["1"]), (str(tmp_path / "a.second.in"), ["2"])]
+
+
+def test_run_jobs_runs_scripts_end_to_end(tmp_path):
+    write(tmp_path, "count.ns", "remember a = 1\nthink while a < 3\n    update a = a + 1\n")
+    write(tmp_path, "echo.ns", "listen \"value\" x\nfeel x > 0\n    speak x\n")
+    write(tmp_path, "echo.in", "7\n")
+    write(tmp_path, "broken.ns", "speak missing\n")
+
+    records, stats = run_jobs(discover(str(tmp_path)), workers=1)
+
+    assert [(record["status"], record["output"]) for record in records] == [
+        ("compile_error", ""), ("ok", ""), ("ok", "7")]
+    assert stats.statuses == {"compile_error": 1, "ok": 2}
+
+
+def test_run_task_reports_a_program_that_does_not_load():
+    runner.init_worker([b"not an nsc file"], timeout=None)
+
+    index, status, output, error, _, _ = runner.run_task((3, 0, []))
+
+    assert (index, status, output) == (3, "error", "")
+    assert error.startswith("NSCFormatError")
+
+
+def test_run_task_keeps_the_result_of_a_run_the_alarm_fires_right_after(monkeypatch):
+    monkeypatch.setattr(runner.signal, "signal", lambda signum, handler: None)
+    runner.init_worker([nsc.dumps(compile_source("speak 42\n", 1).bytecode)], timeout=5)
+    vm = runner._worker["vm"]
+    real_setitimer = runner.signal.setitimer
+
+    def setitimer(which, seconds):
+        real_setitimer(which, seconds)
+        if seconds == 0:
+            raise runner.ScriptTimeout()  # as if SIGALRM arrived just before the timer was disarmed
+
+    monkeypatch.setattr(runner.signal, "setitimer", setitimer)
+    index, status, output, error, _, _ = runner.run_task((0, 0, []))
+
+    assert (index, status, output, error) == (0, "ok", "42", None)
+    assert runner._worker["vm"] is vm
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+from core.compiler import compile_source
+from core.governor import Limits, ResourceLimitExceeded
+from core.sinks import CallbackSink, RingBufferSink, WriterSink
+from core.vm import VirtualMachine
+
+ENGINES = ("switch", "threaded")
+
+COUNT = """remember i = 0
+think while i < 500
+    speak i
+    update i = i + 1
+"""
+
+LINES = [str(i) for i in range(500)]
+
+
+def program(source=COUNT):
+    return compile_source(source, 1).bytecode
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_callback_sees_every_line_and_run_returns_none(engine):
+    lines = []
+    assert VirtualMachine().run(program(), engine=engine, sink=CallbackSink(lines.append)) is None
+    assert lines == LINES
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_writer_writes_in_batches_and_flushes_the_rest(engine):
+    writes = []
+
+    class File(io.StringIO):
+        def write(self, text):
+            writes.append(text)
+            return super().write(text)
+
+    file = File()
+    VirtualMachine().run(program(), engine=engine, sink=WriterSink(file, buffer_lines=64))
+    assert file.getvalue() == "\n".join(LINES) + "\n"
+    assert [text.count("\n") for text in writes] == [64] * 7 + [500 - 64 * 7]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_writer_is_flushed_when_the_run_fails(engine):
+    file = io.StringIO()
+    with pytest.raises(Exception):
+        VirtualMachine().run(program('speak "before"\npanic "boom"\n'), engine=engine, sink=WriterSink(file))
+    assert file.getvalue() == "before\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_ring_buffer_keeps_the_last_lines(engine):
+    sink = RingBufferSink(3)
+    VirtualMachine().run(program(), engine=engine, sink=sink)
+    assert sink.text() == "497\n498\n499"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_limits_apply_to_a_sink(engine):
+    lines = []
+    with pytest.raises(ResourceLimitExceeded):
+        VirtualMachine().run(program(), engine=engine, sink=CallbackSink(lines.append),
+                             limits=Limits(max_output_lines=5))
+    assert lines == LINES[:5]
+
+
+def test_stream_hands_out_lines_in_chunks():
+    vm = VirtualMachine()
+    stream = vm.stream(program(), chunk=100)
+    first = next(stream)
+    assert first == "0" and len(vm.output) < 100
+    assert [first, *stream] == LINES
+
+
+def test_stream_hands_out_the_lines_before_an_error():
+    stream = VirtualMachine().stream(program('speak "before"\npanic "boom"\n'))
+    assert next(stream) == "before"
+    with pytest.raises(Exception):
+        next(stream)
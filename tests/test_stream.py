@@ -0,0 +1,79 @@
+import io
+import random
+
+import pytest
+
+from core.bytecode import assemble
+from core.compiler import compile_source, compile_stream
+from core.lexer import TokenStream, tokenize, tokenize_file
+from core.vm import VirtualClock, VirtualMachine
+
+STATEMENTS = [
+    "remember {a} = {n}\n",
+    "update {a} = {b} + {n} * {b}\n",
+    'speak "{a} is a fairly long string literal, " + {a}\n',
+    "speak {a} / {m}\n",
+    "feel {a} > {n}\n    speak {b}\notherwise\n    update {a} = {a} - 1\n",
+    "think while {a} < {n}\n    update {a} = {a} + 1\n\n    # counting\n    feel {a} == {b}\n        shout {a}\n",
+    "pause\n",
+    "\n",
+    "# a comment at the top level\n",
+]
+NAMES = ("a", "b", "total")
+
+
+def program(seed, count=40):
+    rng = random.Random(seed)
+    lines = [f"remember {name} = 0\n" for name in NAMES]
+    for _ in range(count):
+        lines.append(rng.choice(STATEMENTS).format(a=rng.choice(NAMES), b=rng.choice(NAMES),
+                                                   n=rng.randint(0, 20), m=rng.randint(1, 9)))
+    return "".join(lines)
+
+
+def streamed(source, chunk_size):
+    return list(compile_stream(io.StringIO(source), chunk_size=chunk_size))
+
+
+def generic(stack_code):
+    """Stack code with the type-specialized additions turned back into ADD."""
+    return [line.replace("ADD_NUM", "ADD").replace("CONCAT", "ADD") for line in stack_code]
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+def test_stream_matches_the_whole_program_compiler(seed, chunk_size):
+    source = program(seed)
+    assert streamed(source, chunk_size) == generic(compile_source(source, 0).stack_code)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_streamed_code_runs_like_the_whole_program(seed):
+    source = program(seed)
+    expected = VirtualMachine(clock=VirtualClock()).run(compile_source(source, 0).bytecode)
+    assert VirtualMachine(clock=VirtualClock()).run(assemble(streamed(source, 5))) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 10, 1 << 16])
+def test_file_streams_join_to_the_whole_file_tokens(chunk_size):
+    source = program(0)
+    joined = TokenStream()
+    for stream in tokenize_file(io.StringIO(source), chunk_size=chunk_size):
+        joined.extend(stream)
+    whole = tokenize(source)
+    assert joined == whole
+    assert list(joined.offsets) == list(whole.offsets)
+
+
+@pytest.mark.parametrize("broken", [
+    "remember c = 1 @\n",
+    'speak "never closed\n',
+    "feel a > 0\n        speak 1\n    speak 2\n",
+])
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 16])
+def test_lexer_errors_point_at_the_same_position(broken, chunk_size):
+    source = program(1, count=10) + broken + "speak 1\n"
+    with pytest.raises(RuntimeError) as whole:
+        tokenize(source)
+    with pytest.raises(RuntimeError, match=f"^{whole.value}$"):
+        streamed(source, chunk_size)
@@ -0,0 +1,107 @@
+import pytest
+
+from core.bytecode import CONSTANT_OPERAND_OPS, INC, INC_VAR, LOAD_LOAD, LOAD_PUSH, OPERAND_OPS, assemble
+from core.compiler import compile_source
+from core.superinstructions import SuperinstructionFuser, expand
+from core.vm import VirtualMachine
+
+CODE = [
+    "PUSH 0", "STORE i",
+    "PUSH 2", "STORE step",
+    "PUSH 0", "STORE total",
+    "LABEL L0",
+    "LOAD i", "PUSH 10", "LT", "JZ L1",
+    "LOAD total", "LOAD i", "ADD_NUM", "STORE total",
+    "LOAD i", "PUSH 1", "ADD_NUM", "STORE i",
+    "LOAD total", "LOAD step", "ADD_NUM", "STORE t0",
+    "LOAD t0", "PUSH 3", "GT", "JZ L0",
+    "LOAD i", "LABEL L2", "PUSH 1", "ADD_NUM", "PRINT",
+    "LOAD total", "PRINT",
+    "JMP L0",
+    "LABEL L1",
+    "LOAD total", "PRINT",
+]
+
+FUSED = [
+    "PUSH 0", "STORE i",
+    "PUSH 2", "STORE step",
+    "PUSH 0", "STORE total",
+    "LABEL L0",
+    "LOAD_PUSH i 10", "LT_JZ L1",
+    "INC_VAR total i",
+    "INC i 1",
+    # The result goes to a temporary, and temporaries are never fused
+    "LOAD_LOAD total step", "ADD_NUM", "STORE t0",
+    "LOAD t0", "PUSH 3", "GT_JZ L0",
+    # A label in the middle keeps the sequence apart
+    "LOAD i", "LABEL L2", "PUSH 1", "ADD_NUM", "PRINT",
+    "LOAD total", "PRINT",
+    "JMP L0",
+    "LABEL L1",
+    "LOAD total", "PRINT",
+]
+
+
+def test_fused_code():
+    fuser = SuperinstructionFuser()
+    assert fuser.fuse(CODE) == FUSED
+    assert fuser.stats == {"LOAD_PUSH": 1, "LT_JZ": 1, "INC_VAR": 1, "INC": 1, "LOAD_LOAD": 1, "GT_JZ": 1}
+    assert fuser.positions is None
+
+
+def test_expand_undoes_the_fusion():
+    assert expand(FUSED) == CODE
+
+
+def test_fused_code_runs_the_same():
+    # The loop exits through GT_JZ as soon as total + step > 3
+    assert VirtualMachine().run(assemble(FUSED)) == VirtualMachine().run(assemble(CODE))
+
+
+def test_fused_instructions_take_the_position_of_their_first_part():
+    positions = list(range(100, 100 + len(CODE)))
+    fuser = SuperinstructionFuser()
+    fused = fuser.fuse(CODE, positions)
+    assert len(fuser.positions) == len(fused)
+    assert fuser.positions[7:12] == [107, 109, 111, 115, 119]
+    assert fuser.positions[:7] == positions[:7]
+    assert fuser.positions[-3:] == positions[-3:]
+
+
+def test_positions_survive_into_the_bytecode():
+    source = "remember i = 0\nthink while i < 5\n    update i = i + 1\nspeak i\n"
+    program = compile_source(source, 1).bytecode
+    inc = program.ops.index(INC)
+    assert source[program.positions[inc]:].startswith("update i = i + 1")
+    assert len(program.positions) == len(program.ops)
+
+
+def test_operand_table_layout():
+    program = assemble(FUSED)
+    slot = {name: n for n, name in enumerate(program.names)}
+    fused = {op: program.args[pc] for pc, op in enumerate(program.ops) if op in OPERAND_OPS}
+    assert sorted(fused.values()) == list(range(0, 2 * len(fused), 2))
+    assert len(program.operands) == 2 * len(fused)
+
+    def operands(op):
+        return program.operands[fused[op]], program.operands[fused[op] + 1]
+
+    assert set(CONSTANT_OPERAND_OPS) == {INC, LOAD_PUSH}
+    # Slot then constant index for INC and LOAD_PUSH, two slots for INC_VAR and LOAD_LOAD
+    assert operands(LOAD_PUSH) == (slot["i"], program.constants.index(10))
+    assert operands(INC) == (slot["i"], program.constants.index(1))
+    assert operands(INC_VAR) == (slot["total"], slot["i"])
+    assert operands(LOAD_LOAD) == (slot["total"], slot["step"])
+    assert [program.render(pc) for pc, op in enumerate(program.ops) if op in OPERAND_OPS] == \
+        ["LOAD_PUSH i 10", "INC_VAR total i", "INC i 1", "LOAD_LOAD total step"]
+
+
+@pytest.mark.parametrize("code", [
+    ["LOAD i", "PUSH 1", "ADD_NUM", "STORE j"],
+    ["LOAD i", "PUSH 1", "ADD", "STORE i"],
+    ['LOAD s', 'PUSH "x"', "ADD_NUM", "STORE s"],
+])
+def test_near_misses_are_not_fused_to_inc(code):
+    fused = SuperinstructionFuser().fuse(code)
+    assert not any(instr.startswith("INC") for instr in fused)
+    assert expand(fused) == code
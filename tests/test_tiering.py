@@ -0,0 +1,137 @@
+import pytest
+
+from core.bytecode import assemble
+from core.compiler import compile_source
+from core.tiering import HOT_LOOP_THRESHOLD, MAX_DEOPTS, HotLoops, LoopCompiler, Uncompilable
+from core.vm import VirtualMachine
+
+
+def counting(iterations):
+    return f"remember i = 0\nthink while i < {iterations}\n    update i = i + 1\nspeak i\n"
+
+
+def run(program, tiering, inputs=()):
+    vm = VirtualMachine(tiering=tiering)
+    output = vm.run(program, list(inputs))
+    return vm, output
+
+
+def compare(source, opt_level=1, inputs=()):
+    """Run `source` with and without tiering; both must print the same. Returns the tiered VM."""
+    program = compile_source(source, opt_level).bytecode
+    tiered, output = run(program, True, inputs)
+    assert output == run(program, False, inputs)[1]
+    return tiered
+
+
+def test_loop_is_compiled_on_its_threshold_th_jump_back():
+    assert HOT_LOOP_THRESHOLD == 200
+    assert compare(counting(199)).hot_loops.stats["compiled"] == 0
+    vm = compare(counting(200))
+    assert vm.hot_loops.stats == {"compiled": 1, "entries": 1, "deopts": 0, "rejected": 0}
+
+
+def test_threshold_can_be_lowered():
+    program = compile_source(counting(10), 1).bytecode
+    loops = HotLoops(program, threshold=5)
+    vm = VirtualMachine()
+    vm.hot_loops = loops
+    assert vm.run(program) == "10"
+    assert loops.stats["compiled"] == 1
+
+
+# The inner loop gets hot while x holds one type; the outer loop then changes it
+CHANGING_TYPE = """remember round = 0
+remember flag = 0
+remember x = 0
+remember i = 0
+think while round < {rounds}
+    update i = 0
+    think while i < 300
+        update x = x + 1
+        update i = i + 1
+    speak x
+    feel flag == 0
+        update x = "s"
+    feel flag == 1
+        update x = 0
+    update flag = 1 - flag
+    update round = round + 1
+"""
+
+
+@pytest.mark.parametrize("opt_level", [0, 1, 2])
+def test_failed_type_guard_deoptimizes_and_recompiles(opt_level):
+    stats = compare(CHANGING_TYPE.format(rounds=2), opt_level).hot_loops.stats
+    assert stats["deopts"] == 1
+    assert stats["compiled"] == 2
+
+
+def test_loop_stays_interpreted_after_max_deopts():
+    vm = compare(CHANGING_TYPE.format(rounds=10))
+    loops = vm.hot_loops
+    assert MAX_DEOPTS == 3
+    assert loops.stats["deopts"] == MAX_DEOPTS
+    assert loops.stats["compiled"] == MAX_DEOPTS
+    assert len(loops.rejected) == 1 and not loops.compiled
+
+
+# Stack code no compiler stage emits: the loop body leaves a value on the stack across a jump
+CROSSING_STACK = [
+    "PUSH 0", "STORE i",
+    "LABEL L0",
+    "LOAD i", "PUSH 300", "LT", "JZ L1",
+    "LOAD i", "JMP L2",
+    "LABEL L2",
+    "PUSH 1", "ADD", "STORE i",
+    "JMP L0",
+    "LABEL L1",
+    "LOAD i", "PRINT",
+]
+
+
+def test_uncompilable_loop_falls_back_to_the_interpreter():
+    program = assemble(CROSSING_STACK)
+    vm, output = run(program, True)
+    assert output == "300"
+    assert vm.hot_loops.stats == {"compiled": 0, "entries": 0, "deopts": 0, "rejected": 1}
+    header = next(iter(vm.hot_loops.rejected))
+    with pytest.raises(Uncompilable):
+        LoopCompiler(program, header, vm.frame).compile()
+
+
+def test_frame_after_a_compiled_loop_matches_the_interpreter():
+    source = """listen "n" n
+remember total = 0
+remember text = ""
+remember ratio = 0
+remember i = 0
+think while i < 1000
+    update total = total + i * 2
+    update ratio = total / 7
+    update text = "#" + i
+    update i = i + 1
+remember after = total - 1
+"""
+    program = compile_source(source, 1).bytecode
+    tiered, output = run(program, True, ["4"])
+    interpreted, expected = run(program, False, ["4"])
+    assert tiered.hot_loops.stats["compiled"] == 1
+    assert output == expected
+    assert tiered.variables == interpreted.variables
+    assert tiered.frame[:program.global_count] == interpreted.frame[:program.global_count]
+
+
+def test_compiled_loop_hands_panic_back_to_the_interpreter():
+    source = """remember i = 0
+think while i < 500
+    feel i == 450
+        panic "late"
+    update i = i + 1
+"""
+    program = compile_source(source, 1).bytecode
+    vm = VirtualMachine(tiering=True)
+    with pytest.raises(ValueError, match="PANIC: late"):
+        vm.run(program)
+    assert vm.hot_loops.stats["compiled"] == 1
+    assert vm.variables["i"] == 450
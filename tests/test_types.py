@@ -0,0 +1,117 @@
+import pytest
+
+from core.bytecode import ADD, ADD_NUM, CONCAT
+from core.compiler import compile_source
+from core.lexer import tokenize
+from core.parser import Parser
+from core.semantic_analyzer import SemanticAnalyzer, ValueType, infer_types, join
+from core.vm import VirtualMachine
+
+INT, FLOAT, STR, NUMBER, DYNAMIC = (ValueType.INT, ValueType.FLOAT, ValueType.STR, ValueType.NUMBER,
+                                    ValueType.DYNAMIC)
+
+
+def types(source):
+    return infer_types(Parser(tokenize(source)).parse())
+
+
+def additions(source):
+    """The ADD, ADD_NUM and CONCAT instructions of the program compiled without optimizations, in order."""
+    ops = compile_source(source, 0).bytecode.ops
+    return [op for op in ops if op in (ADD, ADD_NUM, CONCAT)]
+
+
+def test_join():
+    assert join(None, INT) == INT
+    assert join(INT, INT) == INT
+    assert join(INT, FLOAT) == NUMBER
+    assert join(NUMBER, INT) == NUMBER
+    assert join(INT, STR) == DYNAMIC
+    assert join(STR, None) == STR
+
+
+def test_numeric_variables():
+    assert types("""remember i = 0
+remember x = 3 / 2
+remember half = i / 2
+remember big = i > 3
+remember sum = i + x
+think while i < 10
+    update i = i + 1
+""") == {"i": INT, "x": FLOAT, "half": FLOAT, "big": INT, "sum": FLOAT}
+
+
+def test_string_variables():
+    assert types('remember s = "a"\nremember t = s + 1\nremember u = 2 + t\n') == {"s": STR, "t": STR, "u": STR}
+
+
+def test_mixed_variables():
+    assert types('remember v = 1\nupdate v = "one"\nremember w = v + 1\nremember p = v * 2\n') == \
+        {"v": DYNAMIC, "w": DYNAMIC, "p": DYNAMIC}
+
+
+def test_branches_join_their_assignments():
+    source = """remember n = 1
+remember m = 1
+remember s = 1
+feel n > 0
+    update n = 5 / 2
+    update s = "many"
+otherwise
+    update m = 2
+"""
+    assert types(source) == {"n": NUMBER, "m": INT, "s": DYNAMIC}
+
+
+def test_loops_settle_on_a_fixed_point():
+    source = """remember a = 1
+remember b = 1
+think while a < 10
+    update b = a
+    update a = b / 2
+"""
+    assert types(source) == {"a": NUMBER, "b": NUMBER}
+
+
+def test_listen_values_are_dynamic():
+    assert types('listen "n" n\nremember m = listen "m"\nremember k = n + 1\n') == \
+        {"n": DYNAMIC, "m": DYNAMIC, "k": DYNAMIC}
+
+
+def test_analyzer_keeps_the_types():
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(Parser(tokenize('remember s = "a"\nremember i = 2\n')).parse())
+    assert analyzer.types == {"s": STR, "i": INT}
+
+
+def test_specialized_additions():
+    source = """remember i = 0
+remember s = "x"
+remember v = 1
+listen "n" n
+update i = i + 1
+update s = s + i
+update v = v + n
+"""
+    assert additions(source) == [ADD_NUM, CONCAT, ADD]
+
+
+def test_numbers_and_strings_joined_in_a_branch_keep_the_generic_add():
+    source = 'remember a = 1\nfeel a > 0\n    update a = "x"\nremember b = a + 1\nremember c = 2 + 7 / 2\n'
+    assert additions(source) == [ADD, ADD_NUM]
+
+
+@pytest.mark.parametrize("inputs, expected", [(["3"], "4\nx3\n4"), (["word"], "word1\nxword\nword1")])
+def test_specialized_code_runs_like_the_generic_add(inputs, expected):
+    source = """listen "n" n
+remember a = n + 1
+remember s = "x" + n
+remember i = 0
+think while i < 3
+    update i = i + 1
+speak a
+speak s
+feel i == 3
+    speak n + 1
+"""
+    assert VirtualMachine().run(compile_source(source, 1).bytecode, inputs) == expected
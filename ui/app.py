@@ -1,14 +1,19 @@
+import copy
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import streamlit as st
-from core.lexer import tokenize
-from core.parser import Parser
-from core.semantic_analyzer import SemanticAnalyzer
+from core.optimizer import Optimizer
 from core.tac_generator import TACGenerator
 from core.code_generator import CodeGenerator
-from core.vm import VirtualMachine
+from core.compiler import OPT_LEVELS, CompiledProgram, optimize_stack_code
+from core.cache import CompileCache
+from core.incremental import IncrementalFrontEnd
+from core.semantic_analyzer import infer_types
+from core.bytecode import assemble
+from core.vm import VirtualMachine, ENGINES
+from core.py_backend import compile_to_python
 from core.utils import capture_output, pretty_print_tac, pretty_print_stack
 
 def show_documentation():
@@ -125,6 +130,11 @@ sleep
     st.markdown("---")
     st.markdown("*Ready to start coding? Click the back button or refresh to return to the compiler!*")
 
+@st.cache_resource
+def get_compile_cache():
+    # Shared by every session; set NEUROSCRIPT_CACHE_DIR to keep compilations across restarts
+    return CompileCache(capacity=256, directory=os.environ.get("NEUROSCRIPT_CACHE_DIR"), keep_artifacts=True)
+
 # Debug: Log when the app starts
 print("App started at 01:47 AM IST on Tuesday, May 27, 2025")
 
@@ -170,6 +180,9 @@ if st.button("View Documentation"):
 if "vm_output" not in st.session_state:
     st.session_state.vm_output = ""
     print("Session state initialized: vm_output set to empty string")
+if "front_end" not in st.session_state:
+    # Keeps tokens, AST and semantic summaries of the last compile so edits only redo what changed
+    st.session_state.front_end = IncrementalFrontEnd()
 
 
 
@@ -177,18 +190,31 @@ if "vm_output" not in st.session_state:
 
 # Text area with no default code
 code = st.text_area("Enter your NeuroScript code:", height=250, value="")
+engine = st.selectbox("Execution engine", ENGINES + ("python",))
+profile_lines = st.checkbox("Profile source lines", help="count the instructions and time each line costs")
+opt_level = st.selectbox("Optimization level", OPT_LEVELS,
+                         format_func=lambda level: ["0 – none", "1 – peephole + superinstructions",
+                                                    "2 – constant folding + peephole with jump threading "
+                                                    "+ superinstructions"][level])
 
 # Debug: Log when the button is clicked
 if st.button("Run NeuroScript"):
     print("Run NeuroScript button clicked")
     st.session_state.vm_output = ""
 
+    compile_cache = get_compile_cache()
+    front_end = st.session_state.front_end
+    compiled = compile_cache.lookup(code, opt_level)
+    if compiled is not None:
+        print("Compile cache hit")
+        st.caption("Compiled program served from the compile cache")
+
     with st.expander("Lexical Analysis – Tokens"):
         try:
             print("Starting lexical analysis")
-            tokens = tokenize(code)
+            tokens = compiled.tokens if compiled else front_end.tokenize(code)
             print(f"Lexical analysis completed: {len(tokens)} tokens generated")
-            st.code(tokens, language='json')
+            st.code(str(tokens), language='json')
         except Exception as e:
             print(f"Lexical analysis failed: {str(e)}")
             st.error(f"Lexical Error: {str(e)}")
@@ -197,9 +223,10 @@ if st.button("Run NeuroScript"):
     with st.expander("Syntax Analysis – AST"):
         try:
             print("Starting syntax analysis")
-            parser = Parser(tokens)
-            print("Parser initialized")
-            ast = parser.parse()
+            if compiled:
+                ast = compiled.ast
+            else:
+                ast = front_end.parse()
             print("Syntax analysis completed")
             st.code(str(ast), language='json')
         except Exception as e:
@@ -210,8 +237,11 @@ if st.button("Run NeuroScript"):
     with st.expander("Semantic Analysis"):
         try:
             print("Starting semantic analysis")
-            analyzer = SemanticAnalyzer()
-            analyzer.analyze(ast)
+            if not compiled:
+                front_end.analyze()
+                stats = front_end.stats
+                st.caption(f"Re-lexed {stats['relexed']}, re-parsed {stats['reparsed']} and re-checked "
+                           f"{stats['rechecked']} of {stats['statements']} top-level statements")
             print("Semantic analysis completed")
             st.success("Semantic checks passed")
         except Exception as e:
@@ -219,11 +249,27 @@ if st.button("Run NeuroScript"):
             st.error(f"Semantic Error: {str(e)}")
             st.stop()
 
+    if opt_level >= 2:
+        with st.expander("Optimization – Optimized AST"):
+            try:
+                print("Starting optimization")
+                if not compiled:
+                    ast = Optimizer().optimize(ast)
+                print("Optimization completed")
+                st.code(str(ast), language='json')
+            except Exception as e:
+                print(f"Optimization failed: {str(e)}")
+                st.error(f"Optimization Error: {str(e)}")
+                st.stop()
+
     with st.expander("TAC – Three Address Code"):
         try:
             print("Starting TAC generation")
-            tac_gen = TACGenerator()
-            tac = tac_gen.generate(ast)
+            if compiled:
+                tac = compiled.tac
+            else:
+                tac_gen = TACGenerator(infer_types(ast))
+                tac = tac_gen.generate(ast)
             print(f"TAC generation completed: {len(tac)} instructions")
             st.code(pretty_print_tac(tac), language='text')
         except Exception as e:
@@ -234,9 +280,18 @@ if st.button("Run NeuroScript"):
     with st.expander("Stack Code – Code Generator"):
         try:
             print("Starting code generation")
-            cg = CodeGenerator()
-            stack_code = cg.generate(tac)
+            if not compiled:
+                cg = CodeGenerator()
+                stack_code, positions, stats = optimize_stack_code(cg.generate(tac), opt_level, cg.positions)
+                # The front end shifts the positions of the AST nodes it reuses in place on later edits,
+                # so the cache, which every session shares, gets a copy of its own
+                compiled = compile_cache.store(CompiledProgram(code, opt_level, tokens, copy.deepcopy(ast), tac,
+                                                               stack_code, assemble(stack_code, positions), stats))
+            stack_code = compiled.stack_code
             print(f"Code generation completed: {len(stack_code)} instructions")
+            if opt_level >= 1:
+                st.caption(f"Peephole optimizer removed {compiled.peephole_stats['removed']} instructions, "
+                           f"{compiled.peephole_stats['fused']} superinstructions fused")
             st.code(pretty_print_stack(stack_code), language='text')
         except Exception as e:
             print(f"Code generation failed: {str(e)}")
@@ -246,13 +301,39 @@ if st.button("Run NeuroScript"):
     with st.expander("Virtual Machine – Output"):
         try:
             print("Starting VM execution")
-            vm = VirtualMachine()
-            print("VM initialized")
-            # Directly execute and capture output
-            vm_output = vm.execute(stack_code, input_value=["Alice", "5"])
+            if engine == "python":
+                # Native backend: runs the AST compiled to a Python code object
+                vm_output = compile_to_python(ast).run(input_value=["Alice", "5"])
+            else:
+                vm = VirtualMachine()
+                print("VM initialized")
+                if profile_lines:
+                    vm.profile(compiled.bytecode, input_value=["Alice", "5"])
+                    vm_output = "\n".join(vm.output)
+                else:
+                    # Directly execute and capture output
+                    vm_output = vm.run(compiled.bytecode, input_value=["Alice", "5"], engine=engine)
             print(f"VM execution completed: output = {vm_output}")
             st.session_state.vm_output = vm_output if vm_output else "(no output)"
             st.code(st.session_state.vm_output, language='text')
+            if engine != "python" and vm.hot_loops is not None and vm.hot_loops.stats["compiled"]:
+                st.caption(f"{vm.hot_loops.stats['compiled']} hot loops ran as compiled Python functions")
         except Exception as e:
             print(f"VM execution failed: {str(e)}")
-            st.error(f"VM Error: {str(e)}")
\ No newline at end of file
+            st.error(f"VM Error: {str(e)}")
+
+    if profile_lines and engine != "python" and vm.last_profile is not None:
+        with st.expander("Profiler – Cost per Source Line", expanded=True):
+            profile = vm.last_profile
+            lines = profile.by_line(code)
+            total = profile.seconds or 1.0
+            code_col, cost_col = st.columns([0.6, 0.4])
+            with code_col:
+                st.code(profile.annotate(code), language='text')
+            with cost_col:
+                st.caption("Hottest lines first")
+                st.dataframe([{"line": entry.line, "instructions": entry.instructions,
+                               "time (ms)": round(entry.seconds * 1000, 3),
+                               "time %": round(100 * entry.seconds / total, 1)}
+                              for entry in sorted(lines, key=lambda entry: -entry.seconds) if entry.instructions],
+                             hide_index=True)
\ No newline at end of file